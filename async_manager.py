@@ -0,0 +1,301 @@
+# standard python package
+import asyncio
+import configparser
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# global imports
+import aiohttp
+
+# local packages
+import concurrency_controller
+import metrics
+import politeness
+from crawler import FetchedPage, WebCrawler
+from fetcher import LinkFetcher
+from parse_pool import ParsePool
+
+
+class CachedResolver(aiohttp.abc.AbstractResolver):
+    """ Resolver of aiohttp which looks up hosts through DNS cache of process, so only downloads of crawler use it. """
+    def __init__(self, dns):
+        """
+        Initializer for CachedResolver object.
+
+        Parameters:
+            dns(DNSCache): Cache which resolves hosts.
+        """
+        self.dns = dns
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        # a lookup which isn't cached blocks, so it runs in default executor of loop like aiohttp's own resolver
+        addresses = await asyncio.get_running_loop().run_in_executor(
+            None, self.dns.getaddrinfo, host, port, family, socket.SOCK_STREAM
+        )
+        return [
+            {"hostname": host, "host": address[0], "port": address[1], "family": address_family, "proto": protocol,
+             "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV}
+            for address_family, socket_type, protocol, canonical_name, address in addresses
+        ]
+
+    async def close(self):
+        pass
+
+
+class AsyncManager:
+    """
+    Crawl engine which runs all downloads over a single asyncio event loop. Concurrent requests are limited by a
+    semaphore instead of by count of threads, and blocking work (parsing, file writes and database queries) is handed
+    over to a small pool of threads.
+    """
+    def __init__(self):
+        """ Constructor for Async Manager of Web Crawler. """
+        self.config = AsyncManager.__read_config()
+        self.crawler = WebCrawler()
+        self.fetcher = LinkFetcher()
+        self.concurrency = self.config["async_concurrency"]
+        self.sleep_interval = self.config["sleep_interval"]
+        self.executor = ThreadPoolExecutor(max_workers=self.config["parallel_thread_count"])
+        # downloads of robots.txt block for up to ROBOTS_TIMEOUT, so they don't hold threads of database and parsing
+        self.robots_executor = ThreadPoolExecutor(max_workers=politeness.read_config()["robots_workers"],
+                                                  thread_name_prefix="robots")
+        self.drain_secs = self.config["drain_secs"]
+        self.semaphore = None
+        self.stopping = None
+        self.tasks = set()
+        self.metrics = metrics.get_metrics()
+        # count of requests in flight is adapted at runtime within it's bounds, if adaptive concurrency is enabled
+        self.controller = concurrency_controller.create_controller("async", self.concurrency)
+        if self.controller is not None:
+            self.concurrency = self.controller.max_limit
+
+    @staticmethod
+    def __read_config():
+        """ Reads Configuration values from file. """
+        config = dict()
+        config_parser = configparser.ConfigParser()
+        config_parser.read("config.cfg")
+        for key, val in config_parser.items('manager'):
+            try:
+                config.update({key: int(val)})
+            except ValueError:
+                config.update({key: val})
+        return config
+
+    async def crawl(self):
+        """
+        Main coroutine which dispatches links until SIGINT or SIGTERM is received. Then visits in progress are given
+        DRAIN_SECS to finish and the rest are cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop, signum)
+        timeout = aiohttp.ClientTimeout(total=self.crawler.timeout)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.crawler.config['pool_maxsize'],
+            force_close=not self.crawler.config['keep_alive'],
+            # hosts are cached by DNS cache of process if it's enabled
+            use_dns_cache=self.crawler.dns is None,
+            resolver=CachedResolver(self.crawler.dns) if self.crawler.dns is not None else None
+        )
+        self.fetcher.start(self.sleep_interval)
+        if self.controller is not None:
+            self.controller.start(demand=self.fetcher.count)
+        trace_configs = [self.__create_trace_config()] if self.metrics.enabled else []
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector, trace_configs=trace_configs) as session:
+            dispatcher = asyncio.create_task(self.dispatch(session))
+            # an error of dispatcher stops crawling too
+            dispatcher.add_done_callback(lambda task: self.stopping.set())
+            await self.stopping.wait()
+            dispatcher.cancel()
+            if self.tasks:
+                done, pending = await asyncio.wait(set(self.tasks), timeout=self.drain_secs)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            error, = await asyncio.gather(dispatcher, return_exceptions=True)
+            if error is not None and not isinstance(error, asyncio.CancelledError):
+                raise error
+
+    async def dispatch(self, session):
+        """ Keeps on dispatching links from fetcher's queue as long as a slot is free. """
+        while True:
+            await self.semaphore.acquire()
+            while self.controller is not None and len(self.tasks) >= self.controller.limit:
+                await asyncio.sleep(0.05)                           # waits for limit of concurrency
+            link = self.fetcher.get()                               # takes one link from fetcher
+            while link is None:
+                await asyncio.sleep(0.05)                           # waits for fetcher to refill queue
+                link = self.fetcher.get()
+            task = asyncio.create_task(self.visit(session, link))
+            self.tasks.add(task)                                    # keeps reference until task is done
+            task.add_done_callback(self.tasks.discard)
+
+    def stop(self, signum):
+        """
+        Handler of SIGINT and SIGTERM which stops crawling gracefully. Handlers are removed, so that a second signal
+        terminates process right away.
+        """
+        print(f"Stopping crawl on signal {signal.Signals(signum).name}, a second signal terminates right away")
+        loop = asyncio.get_running_loop()
+        for handled_signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(handled_signum)
+        self.stopping.set()
+
+    def __create_trace_config(self):
+        """ Creates tracing of requests which records time taken by resolution of hosts and by new connections. """
+        def start_stage(stage):
+            async def on_start(session, context, params):
+                setattr(context, stage, time.perf_counter())
+            return on_start
+
+        def end_stage(stage):
+            async def on_end(session, context, params):
+                self.metrics.observe("stage_seconds", time.perf_counter() - getattr(context, stage), stage=stage)
+            return on_end
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_dns_resolvehost_start.append(start_stage("dns"))
+        trace_config.on_dns_resolvehost_end.append(end_stage("dns"))
+        trace_config.on_connection_create_start.append(start_stage("connect"))
+        trace_config.on_connection_create_end.append(end_stage("connect"))
+        return trace_config
+
+    def execute(self):
+        """ Main method for execution of asynchronous crawling. """
+        WebCrawler.fetcher = self.fetcher
+        if self.config["parse_workers"] > 0:
+            WebCrawler.parse_pool = ParsePool(self.config["parse_workers"])
+        self.metrics.gauge("queue_depth", self.fetcher.count)
+        metrics.start()
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """
+        Stops fetcher and saves state of crawl. Buffered visits are written, a checkpoint is saved and leases of links
+        which weren't visited are released for other crawling processes.
+        """
+        if self.controller is not None:
+            self.controller.stop()
+        self.fetcher.stop()
+        self.robots_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.crawler.db_handler.flush_visits()
+        link_rows = self.fetcher.drain()
+        WebCrawler.save_checkpoint(link_rows, self.fetcher.db_handler)
+        self.fetcher.release(link_rows)
+        self.metrics.stop()
+        if WebCrawler.parse_pool is not None:
+            WebCrawler.parse_pool.close()
+
+    async def get_page(self, session, link_row):
+        """
+        Downloads a html webpage from provided hyperlink without blocking the event loop. Body is streamed in chunks
+        and download is aborted early for a webpage which isn't html or exceeds MAX_BODY_BYTES.
+
+        Parameters:
+            session(aiohttp.ClientSession): A session shared by all downloads.
+            link_row(dict): a row from table links with column name as keys.
+
+        Returns:
+            (page, None): If successfully downloads a webpage, where page is a FetchedPage.
+            (None, resp_status): If any failure occurs during download, where resp_status is a status to be stored.
+            (None, None): If link is skipped and it's status is already saved.
+        """
+        loop = asyncio.get_running_loop()
+        link = link_row['link']
+        try:
+            headers = {
+                "Accept-Encoding": "identity",
+                "User-Agent": self.crawler.robots.user_agent,
+                **WebCrawler.conditional_headers(link_row)
+            }
+            start = time.perf_counter()
+            async with session.get(link, headers=headers) as response:
+                # time until headers are received, including resolution of host and connection
+                self.metrics.observe("stage_seconds", time.perf_counter() - start, stage="ttfb")
+                print("visited:", link)
+                allowed = await loop.run_in_executor(
+                    self.executor, self.crawler.check_headers, link_row, response.status, response.headers
+                )
+                if not allowed:
+                    return None, None
+                content = bytearray()
+                if response.status == 200:
+                    start = time.perf_counter()
+                    async for chunk in response.content.iter_chunked(self.crawler.chunk_size):
+                        content.extend(chunk)
+                        if len(content) > self.crawler.max_body_bytes:
+                            await loop.run_in_executor(self.executor, self.crawler.record_failure, link_row, 413)
+                            return None, None
+                    self.metrics.observe("stage_seconds", time.perf_counter() - start, stage="download")
+                page = FetchedPage(str(response.url), response.status, response.headers, bytes(content),
+                                   response.charset)
+                return page, None
+        except (aiohttp.InvalidURL, ValueError):
+            return None, 404
+        except aiohttp.TooManyRedirects:
+            return None, 502
+        except aiohttp.ClientConnectionError:
+            return None, 502
+        except asyncio.TimeoutError:
+            return None, 408
+        except aiohttp.ClientError:
+            return None, 502
+
+    async def visit(self, session, link_row):
+        """
+        Downloads a link and then processes the downloaded webpage in the thread pool. It releases the slot acquired
+        by dispatcher when done.
+
+        Parameters:
+            session(aiohttp.ClientSession): A session shared by all downloads.
+            link_row(dict): A row value from a database table of hyperlinks.
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        cancelled = False
+        self.metrics.add_gauge("active_workers", 1)
+        try:
+            if self.crawler.dns is not None and self.crawler.dns.is_unresolvable(link_row['link']):
+                # host failed to resolve recently, so neither robots.txt nor webpage can be downloaded
+                await loop.run_in_executor(self.executor, self.crawler.record_failure, link_row, 502)
+                return
+            allowed = self.crawler.robots.cached_allowed(link_row['link'])
+            if allowed is None:
+                allowed = await loop.run_in_executor(self.robots_executor, self.crawler.robots.allowed,
+                                                     link_row['link'])
+            if not allowed:
+                await loop.run_in_executor(self.executor, self.crawler.record_failure, link_row, 403)
+                return
+            page, resp_status = await self.get_page(session, link_row)
+            if resp_status is not None:
+                await loop.run_in_executor(self.executor, self.crawler.record_failure, link_row, resp_status)
+            elif page is not None:
+                await loop.run_in_executor(self.executor, self.crawler.process_response, link_row, page)
+        except asyncio.CancelledError:
+            # visit is interrupted on shutdown, row is released with the rest of unvisited rows
+            cancelled = True
+            raise
+        except Exception as err:
+            # row stays leased and is handed out again after lease expires
+            self.metrics.inc("visit_errors_total")
+            print("Error while visiting:", link_row['link'], err)
+        finally:
+            self.metrics.add_gauge("active_workers", -1)
+            if not cancelled:
+                self.metrics.observe("stage_seconds", time.perf_counter() - start, stage="visit")
+                self.metrics.inc("pages_total")
+            self.fetcher.done(link_row, finished=not cancelled)
+            self.semaphore.release()
@@ -0,0 +1,298 @@
+# standard python package
+import argparse
+import configparser
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# directory of crawler, whose main.py is benchmarked
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS = ("crawler", "link", "page", "graph", "server", "index", "frontier", "fetch", "parse", "store", "query", "host")
+
+
+class SyntheticWebGraph:
+    """
+    A generated web graph of pages on a single host. Every page is derived from seed and it's number, so the same
+    arguments always produce the same graph.
+    """
+    def __init__(self, pages, fanout, error_rate, page_kb, seed):
+        """
+        Initializer for SyntheticWebGraph object.
+
+        Parameters:
+            pages(int): Count of pages in graph.
+            fanout(int): Count of links on every page.
+            error_rate(float): Fraction of pages which respond with an error status instead of html.
+            page_kb(int): Approximate size of every html page in KB.
+            seed(int): Seed of generated graph.
+        """
+        self.pages = pages
+        self.fanout = fanout
+        self.error_rate = error_rate
+        self.page_kb = page_kb
+        self.seed = seed
+
+    def page(self, number):
+        """
+        Generates a page.
+
+        Parameters:
+            number(int): Number of page.
+
+        Returns:
+            (status, links, padding): Status of response, numbers of pages linked from it and filler text.
+        """
+        generator = random.Random(self.seed * 1000003 + number)
+        if number != 0 and generator.random() < self.error_rate:
+            return generator.choice((404, 500)), [], ""
+        # next page is always linked, so the whole graph is reachable unless an error page breaks the chain
+        links = [(number + 1) % self.pages] + [generator.randrange(self.pages) for _ in range(self.fanout - 1)]
+        # words are numbered, so that text of every page is distinct and pages aren't near-duplicates of each other
+        padding = " ".join(f"{generator.choice(WORDS)}{generator.randrange(1000)}"
+                           for _ in range(self.page_kb * 1024 // 10))
+        return 200, links, padding
+
+    def render(self, number):
+        """ Returns status and html of a page. """
+        status, links, padding = self.page(number)
+        if status != 200:
+            return status, f"<html><body>Error {status}</body></html>"
+        anchors = "\n".join(f'<li><a href="/page/{link}">Page {link}</a></li>' for link in links)
+        return status, f"<html><head><title>Page {number}</title></head><body><h1>Page {number}</h1>" \
+                       f"<ul>\n{anchors}\n</ul><p>{padding}</p></body></html>"
+
+    def reachable(self):
+        """ Returns count of pages which are visited when crawling starts at page 0, including error pages. """
+        visited = {0}
+        queue = deque([0])
+        while queue:
+            for link in self.page(queue.popleft())[1]:
+                if link not in visited:
+                    visited.add(link)
+                    queue.append(link)
+        return len(visited)
+
+
+def serve(graph, latency_ms):
+    """
+    Starts a local HTTP server of a web graph in a background thread.
+
+    Parameters:
+        graph(SyntheticWebGraph): A generated web graph.
+        latency_ms(int): Delay of every response in milliseconds.
+
+    Returns:
+        server(ThreadingHTTPServer): A running server, whose port is server.server_port.
+    """
+    class GraphHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            if self.path == "/robots.txt":
+                status, body = 200, "User-agent: *\nAllow: /\n"
+                content_type = "text/plain"
+            elif self.path.startswith("/page/") and self.path[6:].isdigit() and int(self.path[6:]) < graph.pages:
+                status, body = graph.render(int(self.path[6:]))
+                content_type = "text/html; charset=utf-8"
+            else:
+                status, body = 404, "Not Found"
+                content_type = "text/plain"
+            body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_config(work_dir, base_url, args):
+    """
+    Writes configuration of crawler for benchmark into a working directory. It's based on configuration of project,
+    with a fresh local database and page store and politeness limits lifted for the single local host.
+
+    Returns:
+        config_path(str): Path of written configuration file.
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read(os.path.join(PROJECT_DIR, "config.cfg"))
+    overrides = {
+        "setting": {
+            "base_url": base_url,
+            "html_dir_name": os.path.join(work_dir, "html_pgs"),
+            "max_link_limit": args.pages,
+            # exact filter, so that no link is skipped and every run visits same pages
+            "seen_filter": "set",
+        },
+        "database": {"backend": args.db, "sqlite_path": os.path.join(work_dir, "crawler.db")},
+        "politeness": {"host_max_concurrency": 100000, "host_requests_per_sec": 100000, "host_burst": 100000},
+        "manager": {"engine": args.engine, "parallel_thread_count": args.threads},
+        "metrics": {"enabled": 1, "http_port": 0, "log_interval_secs": 1},
+        # every page of graph shares a single pattern and long chains of pages, which aren't a trap here
+        "admission": {"max_depth": 0, "pattern_budget": 0},
+    }
+    for section, values in overrides.items():
+        for key, value in values.items():
+            config_parser.set(section, key, str(value))
+    config_path = os.path.join(work_dir, "config.cfg")
+    with open(config_path, "w") as config_file:
+        config_parser.write(config_file)
+    return config_path
+
+
+def parse_snapshot(snapshot):
+    """ Groups metrics of a JSON line of crawler by their name and label Eg. {"stages": {"parse": {...}}} """
+    groups = {"stage_seconds": "stages", "db_query_seconds": "db_queries", "responses_total": "responses"}
+    result = {group: dict() for group in groups.values()}
+    for key, value in snapshot.items():
+        name, _, label = key.partition("{")
+        if name in groups:
+            result[groups[name]][label.split('"')[1]] = value
+    return result
+
+
+def git_revision():
+    """ Returns commit of project being benchmarked, if it's a git repository. """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, verbose=False):
+    """
+    Runs crawler over a generated web graph until all reachable pages are visited or timeout.
+
+    Parameters:
+        args(argparse.Namespace): Arguments of benchmark.
+        verbose(bool): Should output of crawler be printed?.
+
+    Returns:
+        result(dict): Throughput, latencies per stage, CPU and memory usage of crawler.
+    """
+    graph = SyntheticWebGraph(args.pages, args.fanout, args.error_rate, args.page_kb, args.seed)
+    expected = graph.reachable()
+    server = serve(graph, args.latency_ms)
+    revision = git_revision()
+    work_dir = tempfile.mkdtemp(prefix="crawler-bench-")
+    write_config(work_dir, f"http://127.0.0.1:{server.server_port}/page/0", args)
+    print(f"Crawling {expected} reachable pages of {args.pages} from port {server.server_port} in {work_dir}")
+
+    last_snapshot = dict()
+    last_lines = deque(maxlen=20)
+    finished = threading.Event()
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", os.path.join(PROJECT_DIR, "main.py")], cwd=work_dir,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    def read_output():
+        for line in process.stdout:
+            if line.startswith("metrics: "):
+                try:
+                    last_snapshot.update(json.loads(line[len("metrics: "):]))
+                except ValueError:
+                    # a line printed by another crawling thread got mixed into snapshot, next snapshot replaces it
+                    continue
+                if last_snapshot.get("pages_total", 0) >= expected:
+                    finished.set()
+            else:
+                last_lines.append(line)
+                if verbose:
+                    print(line, end="")
+        finished.set()                                      # crawler exited
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    completed = finished.wait(args.timeout) and process.poll() is None
+    elapsed = time.perf_counter() - start
+    if process.poll() is not None and not verbose:
+        print("Crawler exited early:", "".join(last_lines), sep="\n")
+    process.terminate()
+    process.wait()
+    reader.join()
+    server.shutdown()
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_secs = (usage.ru_utime - usage_before.ru_utime) + (usage.ru_stime - usage_before.ru_stime)
+    pages = last_snapshot.get("pages_total", 0)
+    return {
+        "revision": revision,
+        "arguments": vars(args),
+        "completed": completed and pages >= expected,
+        "pages": pages,
+        "expected_pages": expected,
+        "elapsed_secs": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3),
+        "cpu_secs": round(cpu_secs, 3),
+        "cpu_percent": round(100 * cpu_secs / elapsed, 1),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        **parse_snapshot(last_snapshot),
+    }
+
+
+def compare(old, new):
+    """ Prints change of throughput and latencies of stages between two results. """
+    def change(before, after):
+        if not before or after is None:
+            return "n/a"
+        return f"{(after - before) / before * 100:+.1f}%"
+
+    print(f"pages/sec: {old['pages_per_sec']} -> {new['pages_per_sec']} "
+          f"({change(old['pages_per_sec'], new['pages_per_sec'])})")
+    print(f"peak RSS MB: {old['peak_rss_mb']} -> {new['peak_rss_mb']}")
+    for group in ("stages", "db_queries"):
+        for name, summary in new[group].items():
+            before = old[group].get(name, {})
+            print(f"{group} {name} p99: {before.get('p99')} -> {summary['p99']} "
+                  f"({change(before.get('p99'), summary['p99'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks crawler against a generated local web graph.")
+    parser.add_argument("--pages", type=int, default=2000, help="count of pages in graph")
+    parser.add_argument("--fanout", type=int, default=10, help="count of links on every page")
+    parser.add_argument("--latency-ms", type=int, default=20, help="delay of every response")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="fraction of pages responding with error")
+    parser.add_argument("--page-kb", type=int, default=20, help="approximate size of every page")
+    parser.add_argument("--seed", type=int, default=1, help="seed of generated graph")
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread")
+    parser.add_argument("--threads", type=int, default=5, help="count of crawling threads")
+    parser.add_argument("--db", choices=("sqlite", "mysql"), default="sqlite",
+                        help="mysql uses database of config.cfg, which should be empty")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds after which crawl is stopped")
+    parser.add_argument("--output", help="path of JSON file of results")
+    parser.add_argument("--compare", help="path of JSON file of a previous result to compare with")
+    parser.add_argument("--verbose", action="store_true", help="prints output of crawler")
+    args = parser.parse_args()
+    output, previous, verbose = args.output, args.compare, args.verbose
+    del args.output, args.compare, args.verbose
+    result = run(args, verbose)
+    print(json.dumps(result, indent=2))
+    if output:
+        with open(output, "w") as result_file:
+            json.dump(result, result_file, indent=2)
+    if previous:
+        with open(previous) as result_file:
+            compare(json.load(result_file), result)
+
+
+if __name__ == "__main__":
+    main()
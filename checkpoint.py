@@ -0,0 +1,109 @@
+# standard python package
+import configparser
+import os
+import pickle
+import tempfile
+import time
+
+# format of checkpoint file, a checkpoint of another format is ignored
+VERSION = 2
+
+_state = None
+_loaded = False
+
+
+def read_config():
+    """
+    Reads path of checkpoint file.
+
+    Returns:
+        path(str): A path of checkpoint file, empty if checkpoints are disabled.
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    return config_parser.get("manager", "checkpoint_file", fallback="").strip()
+
+
+def mismatch(saved, current):
+    """
+    Checks whether a checkpoint was saved on links table of current crawl. Rows are never deleted, so row count and
+    maximum id of table only grow, Eg. by other crawling processes while this one was stopped.
+
+    Parameters:
+        saved(dict): Identity of links table saved with checkpoint.
+        current(dict): Identity of current links table.
+
+    Returns:
+        mismatch(str): Description of first mismatch, None if checkpoint matches the table.
+    """
+    for key in ("backend", "location", "table_name", "schema_version"):
+        if saved.get(key) != current[key]:
+            return f"{key} was {saved.get(key)}, now {current[key]}"
+    for key in ("row_count", "max_id"):
+        if current[key] < saved.get(key, 0):
+            return f"{key} was {saved.get(key)}, now {current[key]}"
+    return None
+
+
+def load(db_handler):
+    """
+    Loads checkpoint file once per process. File is removed after it's loaded, so that a stale checkpoint isn't loaded
+    again if process crashes before saving a new one. A checkpoint of another database or links table Eg. after
+    BACKEND, SQLITE_PATH or TABLE_NAME was changed or table was replaced by migrate_schema.py is discarded, as ids of
+    it's frontier and count of links don't belong to current table.
+
+    Parameters:
+        db_handler(CrawlerDBHandler): A handler of current database.
+
+    Returns:
+        state(dict): State saved by save function or None if there is no usable checkpoint.
+    """
+    global _state, _loaded
+    if _loaded:
+        return _state
+    _loaded = True
+    path = read_config()
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as checkpoint_file:
+            state = pickle.load(checkpoint_file)
+    except (OSError, EOFError, pickle.UnpicklingError) as err:
+        print("Checkpoint couldn't be loaded:", err)
+        return None
+    if type(state) != dict or state.get("version") != VERSION:
+        print("Checkpoint of unknown version is ignored:", path)
+        return None
+    os.remove(path)
+    difference = mismatch(state.get("database", dict()), db_handler.identity())
+    if difference is not None:
+        print(f"Checkpoint of another links table is discarded: {path}, {difference}")
+        return None
+    _state = state
+    print(f"Checkpoint loaded: {path}, saved {time.ctime(state['saved_at'])}")
+    return state
+
+
+def save(state, db_handler):
+    """
+    Saves state of crawler into checkpoint file, if checkpoints are enabled. File is replaced atomically, so a crash
+    while saving never leaves a partial checkpoint. Identity of links table is saved along with state.
+
+    Parameters:
+        state(dict): State of crawler Eg. link count, seen filter and frontier.
+        db_handler(CrawlerDBHandler): A handler of current database.
+
+    Returns:
+        path(str): A path of saved checkpoint file, None if checkpoints are disabled.
+    """
+    path = read_config()
+    if not path:
+        return None
+    state = dict(state, version=VERSION, saved_at=time.time(), database=db_handler.identity())
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, "wb") as checkpoint_file:
+        pickle.dump(state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    print("Checkpoint saved:", path)
+    return path
@@ -0,0 +1,223 @@
+# standard python package
+import configparser
+import threading
+
+# local packages
+import metrics
+
+# statuses of overloaded servers or of requests which timed out or failed to connect, as recorded by crawler
+ERROR_STATUSES = (408, 429, 502, 503, 504)
+
+
+def read_config():
+    """
+    Reads configuration of adaptive concurrency.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("concurrency"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+class ConcurrencyController:
+    """
+    Adapts count of visits in flight to what network, servers and database can take, by additive increase and
+    multiplicative decrease (AIMD). Every interval, it compares latencies to first byte, rate of error statuses and
+    time spent waiting on database during that interval with their limits:
+
+    - Limit is decreased by backoff_percent if error rate exceeds error_rate_percent, database waits exceed
+      db_wait_limit_ms at p90, or p90 latency exceeds it's baseline by more than latency_tolerance_percent.
+    - Otherwise it's increased by increase_percent of max_limit, as long as links are waiting in frontier.
+
+    Baseline of latency is the lowest p90 latency of an interval, which drifts up slowly so that a lasting change of
+    network is accepted after a while. Intervals with fewer than min_samples visits don't change the limit.
+
+    Signals are read from metrics of process, so metrics have to be enabled.
+    """
+    def __init__(self, initial, min_limit, max_limit, interval_secs=5, min_samples=20, latency_tolerance_percent=100,
+                 error_rate_percent=5, db_wait_limit_ms=100, increase_percent=5, backoff_percent=25):
+        """
+        Initializer for ConcurrencyController object.
+
+        Parameters:
+            initial(int): Count of visits in flight to start with.
+            min_limit(int): Lowest count of visits in flight.
+            max_limit(int): Highest count of visits in flight.
+            interval_secs(int): Seconds between adjustments.
+            min_samples(int): Count of visits needed in an interval to adjust limit.
+            latency_tolerance_percent(int): Growth of p90 latency over it's baseline which is tolerated.
+            error_rate_percent(int): Percent of visits which may fail with an error status.
+            db_wait_limit_ms(int): Tolerated p90 of time of database queries and waits for a pooled connection.
+            increase_percent(int): Percent of max_limit added to limit, at least 1.
+            backoff_percent(int): Percent of limit removed on overload, at least 1.
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.interval_secs = interval_secs
+        self.min_samples = min_samples
+        self.latency_tolerance = 1 + latency_tolerance_percent / 100
+        self.error_rate_limit = error_rate_percent / 100
+        self.db_wait_limit = db_wait_limit_ms / 1000
+        self.increase = max(1, self.max_limit * increase_percent // 100)
+        self.backoff = backoff_percent / 100
+        self.baseline = None
+        self.metrics = metrics.get_metrics()
+        self.previous = None
+        self.demand = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, engine, initial):
+        """
+        Creates controller configured from configuration file.
+
+        Parameters:
+            engine(str): Crawl engine, whose bounds of concurrency are used Eg. thread or async.
+            initial(int): Configured count of threads or of concurrent requests of engine.
+        """
+        config = read_config()
+        max_limit = config[f"{engine}_max"]
+        if engine == "thread":
+            max_limit = ConcurrencyController.bound_by_pool(max_limit)
+        return cls(
+            initial=initial,
+            min_limit=config[f"{engine}_min"],
+            max_limit=max_limit,
+            interval_secs=config["interval_secs"],
+            min_samples=config["min_samples"],
+            latency_tolerance_percent=config["latency_tolerance_percent"],
+            error_rate_percent=config["error_rate_percent"],
+            db_wait_limit_ms=config["db_wait_limit_ms"],
+            increase_percent=config["increase_percent"],
+            backoff_percent=config["backoff_percent"]
+        )
+
+    @staticmethod
+    def bound_by_pool(max_threads):
+        """
+        Lowers count of crawling threads to what pool of database connections can serve. Crawling threads of mysql
+        backend share POOL_SIZE connections with fetcher, and more threads would only wait for a connection. Threads of
+        sqlite backend have a connection each.
+
+        Parameters:
+            max_threads(int): Configured maximum count of crawling threads.
+
+        Returns:
+            max_threads(int): Maximum count of crawling threads.
+        """
+        config_parser = configparser.ConfigParser()
+        config_parser.read("config.cfg")
+        if config_parser.get("database", "backend", fallback="mysql") != "mysql":
+            return max_threads
+        bound = max(config_parser.getint("database", "pool_size") - 1, 1)
+        if max_threads > bound:
+            print(f"Maximum count of crawling threads lowered from {max_threads} to {bound}, by POOL_SIZE of database")
+            return bound
+        return max_threads
+
+    def __sample(self):
+        """ Returns current totals of signals, which are subtracted from later totals for an interval. """
+        return {
+            "latency": self.metrics.histogram("stage_seconds", stage="ttfb"),
+            "db_query": self.metrics.histogram("db_query_seconds"),
+            "db_pool_wait": self.metrics.histogram("db_pool_wait_seconds"),
+            "visits": self.metrics.counter("pages_total"),
+            "errors": sum(self.metrics.counter("responses_total", status=status) for status in ERROR_STATUSES)
+            + self.metrics.counter("visit_errors_total"),
+        }
+
+    def update(self):
+        """
+        Adjusts limit from signals observed since previous update.
+
+        Returns:
+            limit(int): Count of visits in flight allowed from now on.
+        """
+        sample = self.__sample()
+        previous, self.previous = self.previous, sample
+        if previous is None:
+            return self.limit
+        visits = sample["visits"] - previous["visits"]
+        if visits < self.min_samples:
+            return self.limit
+        latency = sample["latency"].since(previous["latency"]).quantile(0.9)
+        error_rate = (sample["errors"] - previous["errors"]) / visits
+        db_wait = max(sample[name].since(previous[name]).quantile(0.9) or 0.0 for name in ("db_query", "db_pool_wait"))
+        if latency is not None:
+            # baseline follows lowest latency, and drifts towards higher latency by 2% per interval
+            self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.02)
+
+        if error_rate > self.error_rate_limit:
+            reason = "errors"
+        elif db_wait > self.db_wait_limit:
+            reason = "db_wait"
+        elif latency is not None and latency > self.baseline * self.latency_tolerance:
+            reason = "latency"
+        elif self.demand is None or self.demand() > 0:
+            reason = "increase"
+        else:
+            # frontier is empty, more workers would only wait
+            return self.limit
+        if reason == "increase":
+            limit = min(self.limit + self.increase, self.max_limit)
+        else:
+            limit = max(min(int(self.limit * (1 - self.backoff)), self.limit - 1), self.min_limit)
+        if limit != self.limit:
+            print(f"Concurrency {self.limit} -> {limit} ({reason}): p90 latency "
+                  f"{latency * 1000 if latency is not None else 0:.0f} ms, baseline "
+                  f"{self.baseline * 1000 if self.baseline is not None else 0:.0f} ms, error rate "
+                  f"{error_rate * 100:.1f}%, db wait p90 {db_wait * 1000:.0f} ms")
+            self.metrics.inc("concurrency_changes_total", reason=reason)
+            self.limit = limit
+        return self.limit
+
+    def start(self, demand=None):
+        """
+        Starts adjusting limit every interval in a background thread.
+
+        Parameters:
+            demand(function): Returns count of links waiting to be visited, limit isn't increased while it's 0.
+        """
+        if not self.metrics.enabled:
+            print("Adaptive concurrency needs metrics to be enabled, concurrency stays at", self.limit)
+            return
+        self.demand = demand
+        self.metrics.gauge("concurrency_limit", lambda: self.limit)
+        self.previous = self.__sample()
+        self.thread = threading.Thread(target=self.__run, name="concurrency", daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        """ Adjusts limit every interval until stopped. """
+        while not self.stopped.wait(self.interval_secs):
+            try:
+                self.update()
+            except Exception as err:
+                print("Error while adjusting concurrency:", err)
+
+    def stop(self):
+        """ Stops adjusting limit. """
+        self.stopped.set()
+
+
+def create_controller(engine, initial):
+    """
+    Creates controller of concurrency of a crawl engine, or None if adaptive concurrency is disabled.
+
+    Parameters:
+        engine(str): Crawl engine Eg. thread or async.
+        initial(int): Configured count of threads or of concurrent requests of engine.
+    """
+    if not read_config()["enabled"]:
+        return None
+    return ConcurrencyController.from_config(engine, initial)
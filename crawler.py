@@ -1,30 +1,124 @@
 # global imports
-import bs4
 import configparser
+import hashlib
 import os
-import random
-import re
-import requests
-import string
 import time
+import requests
+from threading import Condition
+from urllib3.util.retry import Retry
 
 # relative local imports
+import checkpoint
 import db
+import dns_cache
+import frontier_admission
+import frontier_priority
+import link_extractor
+import metrics
+import near_duplicate
+import page_store
+import politeness
+import recrawl_scheduler
+import seen_filter
+import url_normalizer
+
+
+class FetchedPage:
+    """
+    A downloaded webpage exposing the same attributes as requests.models.Response which are used by WebCrawler. Body
+    of a webpage is read in chunks within a byte budget by either crawl engine and kept here.
+    """
+    def __init__(self, url, status_code, headers, content, encoding=None):
+        """ Initializer for FetchedPage object. """
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        """ Returns content of webpage decoded into text. """
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
 
 
 class WebCrawler:
+    # count of links in database shared by all crawlers, to avoid counting rows for every new link
+    link_count = None
+    # count of links being inserted by crawlers, which are reserved against the limit until their insert completes
+    reserved_count = 0
+    link_count_condition = Condition()
+    # pool of parsing processes shared by all crawlers, webpages are parsed in crawling thread if it's not set
+    parse_pool = None
+    # fetcher of crawl engine, which defers hosts asking to retry later
+    fetcher = None
+
     def __init__(self):
         """ Initializes configuration of Web Crawler. """
         self.config = self.__class__.__read_config()
-        self.db_handler = db.CrawlerDBHandler()
+        self.db_handler = db.create_handler()
+        self.metrics = metrics.get_metrics()
         self.save_limit_reached = False
+        self.scheduler = recrawl_scheduler.RecrawlScheduler.from_config()
         self.timeout = self.config['request_timeout']
+        self.max_body_bytes = self.config['max_body_bytes']
+        self.chunk_size = self.config['chunk_size']
+        self.allowed_types = tuple(
+            content_type.strip().lower() for content_type in self.config['allowed_content_types'].split(",")
+        )
+        self.robots = politeness.get_robots_cache()
+        self.dns = dns_cache.get_dns_cache()
+        self.near_duplicates = near_duplicate.get_detector()
+        self.admission = frontier_admission.get_admission()
+        self.session = self.__create_session()
 
     def __add_base_url(self):
         """ Adds the starting url into database from configuration file. """
         if self.db_handler.row_count() == 0:
-            link = self.config['base_url']
-            self.db_handler.insert_unvisited(link, 'NA')
+            link = url_normalizer.get_normalizer().normalize(self.config['base_url'])
+            self.db_handler.insert_unvisited(link)
+
+    def __warm_seen_filter(self):
+        """ Creates filter of links already present in the database, which is shared by all crawlers. """
+        links_filter = seen_filter.create_filter(
+            self.config['seen_filter'],
+            capacity=self.config['max_link_limit'],
+            error_rate=float(self.config['seen_filter_error_rate'])
+        )
+        self.db_handler.warm_seen_filter(links_filter)
+        print("Seen filter warmed:", len(links_filter), "links,",
+              links_filter.memory_bytes(), "bytes, false positive rate", links_filter.false_positive_rate())
+
+    def __create_session(self):
+        """
+        Creates a HTTP session which keeps a pool of alive connections per host and retries failed requests with
+        backoff, so links of same site reuse connections.
+
+        Returns:
+            session(requests.Session): A session to download webpages with.
+        """
+        retry = Retry(
+            total=self.config['max_retries'],
+            backoff_factor=float(self.config['retry_backoff_factor']),
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+            # a crawler doesn't sleep for Retry-After, it's host is deferred by fetcher instead
+            respect_retry_after_header=False
+        )
+        # hosts of downloads are resolved through DNS cache if it's enabled, and resolution and connection are timed
+        adapter = dns_cache.DNSCacheAdapter(
+            self.dns,
+            pool_connections=self.config['pool_connections'],
+            pool_maxsize=self.config['pool_maxsize'],
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Accept-Encoding": None, "User-Agent": self.robots.user_agent})
+        if not self.config['keep_alive']:
+            session.headers.update({"Connection": "close"})
+        return session
 
     def __create_html_dir(self):
         """ Creates directory for storing html files. """
@@ -47,127 +141,298 @@ class WebCrawler:
             config.update({k: v})
         return config
 
-    def add_new_links(self, html_text, html_url):
+    def add_new_links(self, html_text, html_url, depth=0, parent_id=None):
         """
-        Finds new links and adds them into the database.
+        Finds new links and adds them into the database with their priority. Links are added until MAX_LINK_LIMIT rows
+        are counted, which are rows present when crawling started and rows inserted by this process since then. The
+        limit is kept by every process on it's own, so processes sharing a database can insert beyond it together.
 
         Parameters:
             html_text(str): text content of html page.
             html_url(str): visited url from where html page was downloaded.
+            depth(int): Count of links followed from base url to reach visited url.
+            parent_id(int): Primary key of row of visited url, links are recorded as it's edges.
 
         Returns:
             None
         """
         # print("Insert query:", html_url)
         if not self.save_limit_reached:
-            new_links = WebCrawler.scrape(html_text, html_url)
-            for new_link in new_links:
-                row_count = self.db_handler.row_count()
-                if row_count < self.config["max_link_limit"]:
-                    self.db_handler.insert_unvisited(
-                        link=new_link, src_link=html_url
-                    )
+            with self.metrics.timer("stage_seconds", stage="parse"):
+                if WebCrawler.parse_pool is not None:
+                    new_links, metadata = WebCrawler.parse_pool.scrape(html_text, html_url)
+                    # parse stage includes waiting for a worker, so time of parsing alone tells how busy the pool is
+                    self.metrics.observe("stage_seconds", metadata["parse_secs"], stage="parse_worker")
                 else:
+                    new_links = WebCrawler.scrape(html_text, html_url)
+            score = frontier_priority.get_scorer()
+            priorities = {new_link: score(new_link, depth + 1, html_url) for new_link in new_links}
+            # links with best priority are kept if limit is about to be reached
+            new_links = sorted(priorities, key=priorities.get)
+            # links known to be in database don't take slots of the limit
+            if db.CrawlerDBHandler.seen_filter is not None:
+                new_links = [link for link in new_links if link not in db.CrawlerDBHandler.seen_filter]
+            # links of crawler traps are rejected before they take slots of the limit
+            if self.admission is not None:
+                new_links = self.admission.admit(new_links, depth + 1)
+            # reserves slots for new links, so that parallel crawlers can't exceed the limit
+            limit = self.config["max_link_limit"]
+            if WebCrawler.link_count is None:
+                # rows are counted without holding the lock, as counting a large table is slow and other crawlers
+                # only need the count once it's known
+                row_count = self.db_handler.row_count()
+                with WebCrawler.link_count_condition:
+                    if WebCrawler.link_count is None:
+                        WebCrawler.link_count = row_count
+            with WebCrawler.link_count_condition:
+                # links reserved by other crawlers may turn out to be present already, so their inserts are waited for
+                # instead of dropping links which would still fit
+                while WebCrawler.reserved_count > 0 and \
+                        WebCrawler.link_count + WebCrawler.reserved_count + len(new_links) > limit:
+                    WebCrawler.link_count_condition.wait()
+                free_slots = limit - WebCrawler.link_count - WebCrawler.reserved_count
+                new_links = new_links[:max(free_slots, 0)]
+                WebCrawler.reserved_count += len(new_links)
+            row_count, inserted = 0, []
+            try:
+                row_count, inserted = self.db_handler.insert_unvisited_many(
+                    new_links, parent_id=parent_id, depth=depth + 1, priorities=priorities
+                )
+            finally:
+                # releases reserved slots, only newly inserted links are counted
+                with WebCrawler.link_count_condition:
+                    WebCrawler.reserved_count -= len(new_links)
+                    WebCrawler.link_count += row_count
+                    WebCrawler.link_count_condition.notify_all()
+            if self.admission is not None:
+                # budgets are spent only by links which made it into database
+                self.admission.commit(inserted)
+            if self.dns is not None and len(new_links) > 0:
+                # hosts are resolved while links wait in database, so their visits don't wait for a lookup
+                self.dns.prefetch(new_links)
+            with WebCrawler.link_count_condition:
+                if WebCrawler.link_count >= limit:
                     self.save_limit_reached = True
                     print("Maximum limit reached")
-                    break
+
+    def check_headers(self, link_row, status_code, headers):
+        """
+        Checks Content-Type and Content-Length of a response before it's body is downloaded. Status of a link whose
+        webpage isn't html or is larger than MAX_BODY_BYTES is saved, as 415 or 413 respectively.
+
+        Parameters:
+            link_row(dict): a row from table links with column name as keys.
+            status_code(int): Status of response.
+            headers(dict): Headers of response.
+
+        Returns:
+            is_allowed(bool): True if body should be downloaded, else False.
+        """
+        if status_code in (429, 503) and headers.get('Retry-After'):
+            self.defer_host(link_row['link'], headers['Retry-After'])
+        if status_code != 200:
+            return True
+        content_type = headers.get('Content-Type', "")
+        content_len = headers.get('Content-Length')
+        if content_type and content_type.split(";")[0].strip().lower() not in self.allowed_types:
+            self.record_failure(link_row, resp_status=415)
+            return False
+        if content_len is not None and content_len.isdigit() and int(content_len) > self.max_body_bytes:
+            self.record_failure(link_row, resp_status=413)
+            return False
+        return True
+
+    def defer_host(self, link, retry_after):
+        """
+        Defers further requests to host of a link by Retry-After of it's response, up to MAX_RETRY_AFTER_SECS.
+
+        Parameters:
+            link(str): A visited link.
+            retry_after(str): Value of Retry-After header.
+        """
+        seconds = politeness.parse_retry_after(retry_after)
+        if seconds is None or WebCrawler.fetcher is None:
+            return
+        seconds = min(seconds, self.config['max_retry_after_secs'])
+        WebCrawler.fetcher.defer(link, seconds)
+        self.metrics.inc("hosts_deferred_total")
 
     def get_page(self, link_row):
         """
-        Downloads a html webpage from provided hyperlink.
+        Downloads a html webpage from provided hyperlink. Body is streamed in chunks and download is aborted early for
+        a webpage which isn't html or exceeds MAX_BODY_BYTES, so memory used per crawler stays bounded.
 
         Parameters:
             link_row(dict): a row from table links with column name as keys.
 
         Returns:
-            response(requests.models.Response): If successfully downloads a webpage
+            page(FetchedPage): If successfully downloads a webpage
             None: If any failure occurs during download.
+            False: If link is skipped and it's status is already saved.
         """
         try:
             link = link_row['link']
         except ValueError:
             return False
+        if self.dns is not None and self.dns.is_unresolvable(link):
+            # host failed to resolve recently, so neither robots.txt nor webpage can be downloaded
+            self.record_failure(link_row, resp_status=502)
+            return False
+        if not self.robots.allowed(link):
+            # disallowed by robots.txt of host
+            self.record_failure(link_row, resp_status=403)
+            return False
         try:
-            response = requests.get(link, timeout=self.timeout, headers={"Accept-Encoding": None})
-            print("visited:", link)
-            return response
+            headers = WebCrawler.conditional_headers(link_row)
+            start = time.perf_counter()
+            with self.session.get(link, timeout=self.timeout, headers=headers, stream=True) as response:
+                # time until headers are received, including resolution of host and connection
+                self.metrics.observe("stage_seconds", time.perf_counter() - start, stage="ttfb")
+                print("visited:", link)
+                if not self.check_headers(link_row, response.status_code, response.headers):
+                    return False
+                content = bytearray()
+                if response.status_code == 200:
+                    start = time.perf_counter()
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        content.extend(chunk)
+                        if len(content) > self.max_body_bytes:
+                            self.record_failure(link_row, resp_status=413)
+                            return False
+                    self.metrics.observe("stage_seconds", time.perf_counter() - start, stage="download")
+                return FetchedPage(response.url, response.status_code, response.headers, bytes(content),
+                                   response.encoding)
         except requests.exceptions.MissingSchema:
             # print("MissingSchema", link)
-            self.db_handler.update_visit(row_id=link_row['id'], resp_status=404)
+            self.record_failure(link_row, resp_status=404)
         except requests.exceptions.InvalidSchema:
             # print("InvalidSchema", link)
-            self.db_handler.update_visit(row_id=link_row['id'], resp_status=404)
+            self.record_failure(link_row, resp_status=404)
         except requests.exceptions.ConnectionError:
             # print("ConnectionError:", link)
-            time.sleep(10)                                 # to avoid infinite looping in case of network failure
-            self.db_handler.update_visit(row_id=link_row['id'], resp_status=502)
+            # session has already retried with backoff, so link is given up without stalling the worker
+            self.record_failure(link_row, resp_status=502)
         except requests.exceptions.TooManyRedirects:
             # print("Too Many Redirects:", link)
-            self.db_handler.update_visit(row_id=link_row['id'], resp_status=502)
+            self.record_failure(link_row, resp_status=502)
         except requests.exceptions.Timeout:
             # print("Timeout:", link)
-            self.db_handler.update_visit(row_id=link_row['id'], resp_status=408)
+            self.record_failure(link_row, resp_status=408)
+        except requests.exceptions.RequestException:
+            # broken body of response Eg. ChunkedEncodingError
+            self.record_failure(link_row, resp_status=502)
         return None
 
+    @staticmethod
+    def conditional_headers(link_row):
+        """
+        Builds headers of a conditional GET request for a link which was already downloaded, so that server can reply
+        with 304 Not Modified instead of whole webpage.
+
+        Parameters:
+            link_row(dict): a row from table links with column name as keys.
+
+        Returns:
+            headers(dict): Request headers, empty for a link which wasn't downloaded before.
+        """
+        headers = dict()
+        if link_row.get('is_crawled') and link_row.get('file_path'):
+            if link_row.get('etag'):
+                headers["If-None-Match"] = link_row['etag']
+            if link_row.get('last_modified'):
+                headers["If-Modified-Since"] = link_row['last_modified']
+        return headers
+
     @staticmethod
     def get_valid_link(link, src_link):
         """
-        Checks if link is valid or not.
+        Checks if link is valid or not and converts it into canonical absolute form, which is also the key used for
+        detecting duplicate links in the database.
 
         Parameters:
             link(str): a unvalidated link.
             src_link(str): a hyperlink of webpage from which above link was extracted.
 
         Returns:
-            link(str): a validated/corrected link
-        """
-        if link.startswith("/") or link.startswith("./") or link.startswith("../"):
-            # converts relative to absolute link
-            link = requests.compat.urljoin(src_link, link)
-            return link
-        has_proto = False
-        protocols = ["https://", "http://"]
-        for proto in protocols:
-            if link.startswith(proto):
-                has_proto = True
-        has_domain = re.search(pattern=r"[\w]\.[\w]", string=link)
-        if has_proto and has_domain:
-            return link
-        else:
-            return None
+            link(str): a validated/corrected link or None if link is invalid.
+        """
+        return url_normalizer.get_normalizer().normalize(link, src_link)
+
+    def record_failure(self, link_row, resp_status):
+        """
+        Saves status of a link which couldn't be downloaded successfully. It's visited again after it's current
+        recrawl interval. Stored webpage and validators of a previous visit are kept, so a refresh which fails doesn't
+        lose them.
+
+        Parameters:
+            link_row(dict): a row from table links with column name as keys.
+            resp_status(int): Value of response for a visited link Eg. 408 for timeout.
+
+        Returns:
+            None
+        """
+        self.metrics.inc("responses_total", status=resp_status)
+        recrawl_interval = self.scheduler.next_interval(link_row.get('recrawl_interval'), changed=None)
+        self.db_handler.update_failure(link_row['id'], resp_status=resp_status, recrawl_interval=recrawl_interval)
 
     def setup(self):
         """ It does one time work of setup if not done. """
         # initialization methods
+        self.db_handler.upgrade_table()
         self.__add_base_url()
         self.__create_html_dir()
+        state = checkpoint.load(self.db_handler)
+        if state is None:
+            self.__warm_seen_filter()
+        else:
+            # resumes from checkpoint instead of counting and scanning all rows of database
+            WebCrawler.link_count = state['link_count']
+            db.CrawlerDBHandler.seen_filter = state['seen_filter']
+            print("Seen filter restored from checkpoint:", len(state['seen_filter']), "links")
+            if self.admission is not None and state.get('admission') is not None:
+                self.admission.restore(state['admission'])
+        # filter is read when metrics are exposed, as it's replaced when restored from checkpoint
+        self.metrics.gauge("seen_filter_links", lambda: len(db.CrawlerDBHandler.seen_filter))
+        self.metrics.gauge("seen_filter_bytes", lambda: db.CrawlerDBHandler.seen_filter.memory_bytes())
+        self.metrics.gauge("seen_filter_false_positive_rate",
+                           lambda: db.CrawlerDBHandler.seen_filter.false_positive_rate())
         self.db_handler.print_connect()
 
-    @staticmethod
-    def save_page(html_dir, page_text, file_path=None):
+    @classmethod
+    def save_checkpoint(cls, link_rows, db_handler):
+        """
+        classmethod: Saves state shared by all crawlers into checkpoint file, so that next run resumes from it.
+
+        Parameters:
+            link_rows(list): Rows of frontier which weren't visited.
+            db_handler(CrawlerDBHandler): A handler of database of crawl.
+
+        Returns:
+            path(str): A path of saved checkpoint file, None if checkpoints are disabled.
         """
-        It uses specified file_path or else generates random name to save a webpage.
+        with cls.link_count_condition:
+            link_count = cls.link_count
+        return checkpoint.save({
+            "link_count": link_count,
+            "seen_filter": db.CrawlerDBHandler.seen_filter,
+            "admission": frontier_admission.get_admission(),
+            "frontier": [link_row['id'] for link_row in link_rows],
+        }, db_handler)
+
+    def save_page(self, content, content_hash=None):
+        """
+        Saves a webpage into page store of html directory. Webpages are addressed by hash of their content, so an
+        identical webpage is stored only once.
 
         Parameters:
-            html_dir(str): A path or name of directory where html page should be stored.
-            page_text(str): A text content of html webpage.
-            file_path(str): A file path if a html file is already stored for the currently visited link.
+            content(bytes): A content of html webpage.
+            content_hash(str): SHA-256 hex digest of content if it's already computed.
 
         Returns:
-            file_path(str): A file path where html content is stored. For storing it in the database.
-        """
-        # generates random name
-        if file_path is None:
-            while True:
-                file_name = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-                file_path = os.path.join(html_dir, file_name)
-                if not os.path.exists(file_path):
-                    break
-        # saves a webpage
-        html_page = open(file_path, 'w')
-        html_page.write(page_text)
-        html_page.close()
-        return file_path
+            file_path(str): A location in page store where html content is stored. For storing it in the database.
+        """
+        with self.metrics.timer("stage_seconds", stage="store"):
+            return page_store.get_store(self.config['html_dir_name']).put(content, content_hash)
 
     @staticmethod
     def scrape(webpage, src_link):
@@ -182,32 +447,49 @@ class WebCrawler:
             links(list): A list of valid scraped links from the passed webpage.
         """
         links = []
-        soup = bs4.BeautifulSoup(webpage, "html.parser")
-        for a_tag in soup.find_all("a"):
-            # relative
-            try:
-                link = a_tag["href"]
-            except KeyError:
-                continue
-            link = WebCrawler.get_valid_link(link, src_link)
+        for link, base_link in link_extractor.get_extractor().extract(webpage, src_link):
+            link = WebCrawler.get_valid_link(link, base_link)
             if link is not None:
                 links.append(link)
         return links
 
-    def update_row(self, row_id, response, file_path=None):
+    def find_near_duplicate(self, row_id, webpage):
+        """
+        Finds a recently stored webpage which is a near-duplicate of a downloaded webpage, otherwise webpage is
+        remembered for comparison with later webpages.
+
+        Parameters:
+            row_id(int): A primary key of the row of downloaded webpage.
+            webpage(str): A text content of downloaded html page.
+
+        Returns:
+            duplicate_of(int): A primary key of the row of near-duplicate webpage, or None if there's none.
+        """
+        if self.near_duplicates is None:
+            return None
+        with self.metrics.timer("stage_seconds", stage="near_duplicate"):
+            duplicate_of = self.near_duplicates.check(row_id, webpage)
+        if duplicate_of is not None:
+            self.metrics.inc("near_duplicates_total")
+        return duplicate_of
+
+    def update_row(self, row_id, response, file_path=None, content_hash=None, recrawl_interval=None):
         """
         Saves updated data of link in corresponding row of database.
 
         Parameters:
             row_id(int): A primary key of the row at which links is stored in the database table.
-            response(requests.models.Response): A GET Response value of the URL visited by requests.
+            response(FetchedPage): A GET Response value of the URL visited.
             file_path(str): A path of the file where currently downloaded webpage is stored.
+            content_hash(str): SHA-256 hex digest of the downloaded webpage.
+            recrawl_interval(int): Seconds after which link should be visited again.
 
         Returns:
              None
         """
+        self.metrics.inc("responses_total", status=response.status_code)
         if response.status_code == 200:
-            content_type = response.headers['Content-Type']
+            content_type = response.headers.get('Content-Type')
             try:
                 content_len = response.headers['Content-Length']
             except KeyError:
@@ -216,10 +498,13 @@ class WebCrawler:
                                          resp_status=response.status_code,
                                          content_type=content_type,
                                          content_len=content_len,
-                                         file_path=file_path)
+                                         file_path=file_path,
+                                         etag=response.headers.get('ETag'),
+                                         last_modified=response.headers.get('Last-Modified'),
+                                         content_hash=content_hash,
+                                         recrawl_interval=recrawl_interval)
         else:
-            self.db_handler.update_visit(row_id=row_id,
-                                         resp_status=response.status_code)
+            self.db_handler.update_failure(row_id, resp_status=response.status_code, recrawl_interval=recrawl_interval)
 
     def visit(self, **link_row):
         """
@@ -233,23 +518,57 @@ class WebCrawler:
             None
         """
         # print("Crawling:", link_row["link"])
-        response = self.get_page(link_row)
-        if response is not None and response.status_code == 200:
+        with self.metrics.timer("stage_seconds", stage="visit"):
+            response = self.get_page(link_row)
+            if response is not False:                       # False if link was skipped without download
+                self.process_response(link_row, response)
+        self.metrics.inc("pages_total")
+
+    def process_response(self, link_row, response):
+        """
+        Scrapes, stores and records a downloaded webpage. It is shared by every crawl engine, so the engine only needs
+        to download the page.
+
+        Parameters:
+            link_row(dict): A row value from a database table of hyperlinks.
+            response(FetchedPage): A GET Response of the visited link or None if download failed.
+
+        Returns:
+            None
+        """
+        recrawl_interval = link_row.get('recrawl_interval')
+        if response is not None and response.status_code == 304:
+            # refreshed webpage isn't modified since last visit
+            self.metrics.inc("responses_total", status=response.status_code)
+            self.db_handler.update_unchanged(link_row["id"], resp_status=response.status_code,
+                                             recrawl_interval=self.scheduler.next_interval(recrawl_interval, False))
+        elif response is not None and response.status_code == 200:
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            if link_row['is_crawled'] and link_row.get('file_path') and link_row.get('content_hash') == content_hash:
+                # refreshed webpage is identical to stored one
+                self.metrics.inc("responses_total", status=response.status_code)
+                self.db_handler.update_unchanged(link_row["id"], resp_status=response.status_code,
+                                                 recrawl_interval=self.scheduler.next_interval(recrawl_interval, False))
+                return
+            # change is known only if a hash of previous visit is available
+            changed = True if link_row['is_crawled'] and link_row.get('content_hash') else None
+            duplicate_of = self.find_near_duplicate(link_row["id"], response.text)
+            if duplicate_of is not None:
+                # links of stored webpage are already followed, so neither links nor copy of near-duplicate are kept,
+                # and a refreshed link keeps it's stored file and validators
+                self.metrics.inc("responses_total", status=response.status_code)
+                recrawl_interval = self.scheduler.next_interval(recrawl_interval, changed)
+                self.db_handler.update_duplicate(link_row["id"], resp_status=response.status_code,
+                                                 content_hash=content_hash, duplicate_of=duplicate_of,
+                                                 recrawl_interval=recrawl_interval)
+                return
             if not self.save_limit_reached:
-                self.add_new_links(response.text, response.url)
-            if link_row['is_crawled']:
-                try:
-                    file_path = WebCrawler.save_page(
-                        self.config['html_page_dir'],
-                        response.text,
-                        file_path=link_row['file_path']
-                    )
-                except KeyError:
-                    file_path = WebCrawler.save_page(self.config['html_dir_name'], response.text)
-            else:
-                file_path = WebCrawler.save_page(self.config['html_dir_name'], response.text)
-            self.update_row(link_row["id"], response, file_path)
+                self.add_new_links(response.text, response.url, depth=link_row.get('depth', 0),
+                                   parent_id=link_row['id'])
+            file_path = self.save_page(response.content, content_hash)
+            self.update_row(link_row["id"], response, file_path, content_hash,
+                            recrawl_interval=self.scheduler.next_interval(recrawl_interval, changed))
         elif response is not None:
-            self.db_handler.update_visit(link_row["id"], resp_status=response.status_code)
+            self.record_failure(link_row, resp_status=response.status_code)
         else:
-            self.db_handler.update_visit(link_row["id"], resp_status=204)
+            self.record_failure(link_row, resp_status=204)
@@ -1,56 +1,739 @@
 import configparser
+import os
+import sqlite3
+import uuid
+import zlib
 
 from datetime import datetime, timedelta
-from mysql import connector
-from mysql.connector import errorcode
-from threading import Lock
+from threading import Lock, Timer, local
+
+import metrics
+import politeness
+import seen_filter as seen_filters
+
+try:
+    from mysql import connector
+    from mysql.connector import errorcode
+    import db_pool
+except ImportError:
+    connector = None
+
+# version of schema of links table created by handlers, an older table is converted by migrate_schema.py
+SCHEMA_VERSION = 2
 
 
 class CrawlerDBHandler:
+    """
+    Interface of storage backends of links table. Queries shared by backends are written with %s placeholders, and
+    every backend implements connection, execution of queries, schema of table and batched writes.
+    """
+    # filter of links known to be in database, shared by all handlers so that known links never hit the database
+    seen_filter = None
+    # statement which inserts a row unless it's link is already present
+    INSERT_IGNORE = "INSERT IGNORE"
+    # indexes of links table with their columns, other than primary key and unique hash of link
+    INDEXES = {
+        "idx_next_crawl_at": "(next_crawl_at)",
+        "idx_frontier": "(is_crawled, priority, id)",
+        "idx_last_crawl_dt": "(last_crawl_dt)",
+        "idx_lease_token": "(lease_token)",
+    }
+    # columns of new links, in order of tuples of insert_links
+    LINK_COLUMNS = ("link_hash", "link", "created_at", "depth", "priority", "host_hash")
+    # columns of rows handed out to crawlers, other columns are only written
+    FRONTIER_COLUMNS = ("id", "link", "is_crawled", "file_path", "etag", "last_modified", "content_hash",
+                        "recrawl_interval", "depth", "priority")
+
+    def __init__(self, config):
+        """
+        Initializes values of CrawlerDBHandler common to all backends.
+
+        Parameters:
+            config(dict): Configuration of database.
+        """
+        self.TABLE_NAME = config['table_name']
+        # links found on a webpage are recorded as edges from it's row to their rows
+        self.EDGE_TABLE_NAME = f"{self.TABLE_NAME}_edges"
+        self.MAX_ROW_LIMIT = int(config['max_row_read'])
+        self.UPDATE_BATCH_SIZE = int(config['update_batch_size'])
+        self.UPDATE_FLUSH_MS = int(config['update_flush_ms'])
+        self.metrics = metrics.get_metrics()
+        # buffered visit updates with row id as key
+        self.visit_buffer = dict()
+        self.buffer_lock = Lock()
+        self.flush_timer = None
+
+    def __claim(self, condition, values, order, limit, lease_expiry, worker_id, partition):
+        """
+        Claims rows for a crawler atomically. Rows are marked with a new lease token by a single UPDATE query, and then
+        rows of that token are read. Crawlers of other processes or machines sharing the database never claim the same
+        row, as a leased row doesn't match the condition until it's lease expires.
+
+        Parameters:
+            condition(str): Condition of claimable rows, other than lease.
+            values(tuple): Parameters of condition.
+            order(str): Columns by which rows are claimed.
+            limit(int): Maximum count of rows to claim.
+            lease_expiry(datetime): Datetime after which rows can be claimed again.
+            worker_id(str): Identifier of crawling process which claims rows.
+            partition(tuple): Index and count of partitions, if rows are partitioned among processes by their host.
+
+        Returns:
+            rows(list): Claimed rows from the database.
+        """
+        limit = self.MAX_ROW_LIMIT if limit is None else min(limit, self.MAX_ROW_LIMIT)
+        if limit <= 0:
+            return list()
+        token = uuid.uuid4().hex
+        condition = f"{condition} AND (lease_expiry IS NULL OR lease_expiry <= %s)"
+        values = (lease_expiry, worker_id, token, *values, self.__now())
+        if partition is not None and partition[1] > 1:
+            # links inserted before partitioning have no hash of host and belong to first partition
+            condition += f" AND COALESCE(host_hash, 0) % {int(partition[1])} = {int(partition[0])}"
+        claim_rows = self.claim_query(condition, order, limit)
+        if not self.execute(query=claim_rows, values=values, count=True):
+            return list()
+        get_claimed = f'''SELECT {", ".join(self.FRONTIER_COLUMNS)} FROM {self.TABLE_NAME}
+        WHERE lease_token=%s ORDER BY {order};'''
+        result = self.execute(query=get_claimed, values=(token,), fetch=True)
+        return result if type(result) == list else list()
+
+    def claim_ids(self, row_ids, lease_expiry, worker_id, partition=None):
+        """
+        Claims rows by their primary keys, Eg. frontier of a checkpoint. Rows leased by another crawler, visited since
+        and not yet due for a refresh, or of another partition are skipped.
+
+        Parameters:
+            row_ids(list): Primary keys of rows.
+            lease_expiry(datetime): Datetime after which rows can be claimed again.
+            worker_id(str): Identifier of crawling process which claims rows.
+            partition(tuple): Index and count of partitions, if rows are partitioned among processes by their host.
+
+        Returns:
+            rows(list): Claimed rows from the database.
+        """
+        rows = list()
+        for start in range(0, len(row_ids), self.MAX_ROW_LIMIT):
+            batch = tuple(row_ids[start:start + self.MAX_ROW_LIMIT])
+            placeholders = ", ".join(["%s"] * len(batch))
+            condition = f"id IN ({placeholders}) AND (is_crawled=0 OR next_crawl_at <= %s)"
+            rows += self.__claim(condition, (*batch, self.__now()), "priority, id", len(batch), lease_expiry,
+                                 worker_id, partition)
+        return rows
+
+    def claim_query(self, condition, order, limit):
+        """
+        Builds UPDATE query which leases first rows matching a condition by an order.
+
+        Parameters:
+            condition(str): Condition of claimable rows.
+            order(str): Columns by which rows are claimed.
+            limit(int): Maximum count of rows to claim.
+
+        Returns:
+            query(str): An UPDATE query with parameters of lease expiry, worker id and lease token followed by
+                        parameters of condition.
+        """
+        raise NotImplementedError
+
+    def claim_unrefreshed(self, lease_expiry, worker_id, limit=None, partition=None):
+        """
+        Claims visited links which are due for a refresh, in order of their due datetime.
+
+        Parameters:
+            lease_expiry(datetime): Datetime after which rows can be claimed again.
+            worker_id(str): Identifier of crawling process which claims rows.
+            limit(int): Maximum count of rows to claim. By default, it's set to MAX_ROW_READ.
+            partition(tuple): Index and count of partitions, if rows are partitioned among processes by their host.
+        """
+        return self.__claim("next_crawl_at <= %s", (self.__now(),), "next_crawl_at", limit, lease_expiry,
+                            worker_id, partition)
+
+    def claim_unvisited(self, lease_expiry, worker_id, limit=None, partition=None):
+        """
+        Claims unvisited links in order of their priority.
+
+        Parameters:
+            lease_expiry(datetime): Datetime after which rows can be claimed again.
+            worker_id(str): Identifier of crawling process which claims rows.
+            limit(int): Maximum count of rows to claim. By default, it's set to MAX_ROW_READ.
+            partition(tuple): Index and count of partitions, if rows are partitioned among processes by their host.
+        """
+        return self.__claim("is_crawled=0", (), "priority, id", limit, lease_expiry, worker_id, partition)
+
+    def close(self):
+        """ Closes connections with the database. """
+        raise NotImplementedError
+
+    def connect(self):
+        """ Makes connection with the database and detects the connection is live. """
+        raise NotImplementedError
+
+    def create_table(self, table_name=None):
+        """
+        Creates Table links along with it's indexes and table of edges between links if does not exists.
+
+        Parameters:
+            table_name(str): Name of links table, TABLE_NAME if not given Eg. a new table while migrating.
+        """
+        raise NotImplementedError
+
+    def drop_index(self, index):
+        """ Drops an index of links table. """
+        raise NotImplementedError
+
+    def execute(self, query, values=None, fetch=False, count=False, prepared=False):
+        """ Executes query with a cursor.
+
+            Parameters:
+                query (str): SQL query for execution.
+                values (list/tuple): Parameters in case of insert query.
+                fetch (bool): Is this a select query?.
+                count (bool): Return count of affected rows instead of boolean value for query with values?.
+                prepared (bool): Prepare query on server and reuse it for later executions of same query?.
+
+            Output:
+                If fetch is set to true then
+                    it returns a boolean value and list of experiments.
+                Else if count is set to true then
+                    it returns count of affected rows.
+                Else then
+                    it returns a boolean value based on success/failure.
+        """
+        raise NotImplementedError
+
+    def flush_visits(self):
+        """
+        Writes all buffered visit updates into the database in a single batch.
+
+        Returns:
+            None
+        """
+        with self.buffer_lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            visits = list(self.visit_buffer.values())
+            self.visit_buffer.clear()
+        if len(visits) == 0:
+            return
+        self.write_visits(visits)
+
+    def get_columns(self):
+        """ Returns names of columns of links table, empty if table doesn't exist. """
+        raise NotImplementedError
+
+    def get_indexes(self):
+        """ Returns names of indexes of links table. """
+        raise NotImplementedError
+
+    @staticmethod
+    def host_hash(link):
+        """ Returns hash of host of a link, which is stable across processes, for partitioning links by host. """
+        return zlib.crc32(politeness.get_host(link).encode())
+
+    def identity(self):
+        """
+        Returns identity of links table, which is saved with a checkpoint so that it isn't resumed on another table.
+
+        Returns:
+            identity(dict): Backend, location of database, table name, schema version, row count and maximum id.
+        """
+        result = self.execute(f"SELECT MAX(id) AS max_id FROM {self.TABLE_NAME};", fetch=True)
+        max_id = result[0]['max_id'] if type(result) == list and len(result) > 0 else None
+        return {
+            "backend": self.BACKEND,
+            "location": self.location(),
+            "table_name": self.TABLE_NAME,
+            "schema_version": self.schema_version(),
+            "row_count": self.row_count(),
+            "max_id": max_id or 0,
+        }
+
+    def insert_edges(self, parent_id, link_hashes):
+        """
+        Records links found on a webpage as edges from it's row to rows of links, ignoring edges already present.
+
+        Parameters:
+            parent_id(int): Primary key of row of webpage.
+            link_hashes(list): Hashes of links found on webpage, whose rows are already inserted.
+
+        Returns:
+            row_count(int): Count of newly inserted edges.
+        """
+        row_count = 0
+        # older SQLite versions allow up to 999 parameters in a query
+        for start in range(0, len(link_hashes), 500):
+            batch = link_hashes[start:start + 500]
+            placeholders = ", ".join(["%s"] * len(batch))
+            insert_edges = f'''{self.INSERT_IGNORE} INTO {self.EDGE_TABLE_NAME}(parent_id, child_id)
+            SELECT %s, id FROM {self.TABLE_NAME} WHERE link_hash IN ({placeholders});'''
+            row_count += self.execute(query=insert_edges, values=(parent_id, *batch), count=True)
+        return row_count
+
+    def existing_hashes(self, link_hashes):
+        """
+        Looks up which links are already present in database.
+
+        Parameters:
+            link_hashes(list): Hashes of links.
+
+        Returns:
+            hashes(set): Hashes of links which have a row.
+        """
+        hashes = set()
+        # older SQLite versions allow up to 999 parameters in a query
+        for start in range(0, len(link_hashes), 500):
+            batch = link_hashes[start:start + 500]
+            placeholders = ", ".join(["%s"] * len(batch))
+            get_hashes = f"SELECT link_hash FROM {self.TABLE_NAME} WHERE link_hash IN ({placeholders});"
+            result = self.execute(query=get_hashes, values=batch, fetch=True)
+            if type(result) == list:
+                hashes.update(bytes(row['link_hash']) for row in result)
+        return hashes
+
+    def insert_links(self, new_links):
+        """
+        Inserts rows of new links in a single batch, ignoring links already present in database.
+
+        Parameters:
+            new_links(list): Tuples of values of LINK_COLUMNS.
+
+        Returns:
+            row_count(int): Count of newly inserted links.
+        """
+        return self.insert_rows(self.TABLE_NAME, CrawlerDBHandler.LINK_COLUMNS, new_links)
+
+    def insert_rows(self, table_name, columns, rows):
+        """
+        Inserts rows into a table in a single batch, ignoring rows whose unique key is already present.
+
+        Parameters:
+            table_name(str): Name of table.
+            columns(tuple): Names of columns.
+            rows(list): Tuples of values of columns.
+
+        Returns:
+            row_count(int): Count of newly inserted rows.
+        """
+        raise NotImplementedError
+
+    def insert_unvisited(self, link, parent_id=None, depth=0, priority=0):
+        """ Inserts unvisited links in database with current datetime. Links known to seen filter are skipped. """
+        seen_filter = CrawlerDBHandler.seen_filter
+        if seen_filter is not None and link in seen_filter:
+            return False
+        insert_link = '''INSERT INTO {}(link_hash, link, created_at, depth, priority, host_hash)
+        VALUES(%s, %s, %s, %s, %s, %s);'''.format(self.TABLE_NAME)
+        link_hash = seen_filters.url_digest(link)
+        new_link = (link_hash, link, datetime.now(), depth, priority, CrawlerDBHandler.host_hash(link))
+        # print("Insert query:", insert_link, new_link)
+        result = self.execute(query=insert_link, values=new_link, prepared=True)
+        if parent_id is not None:
+            self.insert_edges(parent_id, [link_hash])
+        if seen_filter is not None and result:
+            seen_filter.add(link, link_hash)
+        return result
+
+    def insert_unvisited_many(self, links, parent_id=None, depth=0, priorities=None):
+        """
+        Inserts unvisited links scraped from a webpage in database with a single batch. Links known to seen filter
+        are skipped, and links already present in database are looked up when there's no seen filter. Links are added
+        into seen filter only once they're in database. Links inserted meanwhile by another crawler are ignored by
+        database, but they may still be returned in inserted links.
+
+        Parameters:
+            links(list): Links scraped from a webpage.
+            parent_id(int): Primary key of row of webpage from which links were scraped.
+            depth(int): Count of links followed from base url to reach these links.
+            priorities(dict): Link as key and it's priority as value. Lower priority is crawled first.
+
+        Returns:
+            row_count(int): Count of newly inserted links.
+            inserted(list): Newly inserted links, which may include links inserted concurrently by another crawler.
+        """
+        seen_filter = CrawlerDBHandler.seen_filter
+        links = list(dict.fromkeys(links))
+        if seen_filter is not None:
+            links = [link for link in links if link not in seen_filter]
+        if len(links) == 0:
+            return 0, []
+        created_at = datetime.now()
+        priorities = priorities or dict()
+        link_hashes = [seen_filters.url_digest(link) for link in links]
+        new_links = [
+            (link_hash, link, created_at, depth, priorities.get(link, 0), CrawlerDBHandler.host_hash(link))
+            for link_hash, link in zip(link_hashes, links)
+        ]
+        if seen_filter is None:
+            existing = self.existing_hashes(link_hashes)
+            new_links = [new_link for new_link in new_links if new_link[0] not in existing]
+        inserted = new_links
+        row_count = 0
+        # hashes of links present in database after insert, None if all of them are
+        present = None
+        if new_links:
+            row_count = self.insert_links(new_links)
+            if row_count < len(new_links):
+                # some rows were ignored or insert failed, so only links present in database now are counted
+                present = self.existing_hashes([new_link[0] for new_link in new_links])
+                inserted = [new_link for new_link in new_links if new_link[0] in present]
+        if parent_id is not None:
+            self.insert_edges(parent_id, link_hashes)
+        if seen_filter is not None:
+            # links whose insert failed aren't added, so that they're inserted when they're found again
+            for link_hash, link in zip(link_hashes, links):
+                if present is None or link_hash in present:
+                    seen_filter.add(link, link_hash)
+        return row_count, [new_link[1] for new_link in inserted]
+
+    @staticmethod
+    def __now():
+        """ Returns current datetime formatted for a query. """
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def location(self):
+        """ Returns location of database Eg. it's server and name or path of it's file. """
+        raise NotImplementedError
+
+    def print_connect(self):
+        """ Prints connect message. """
+        raise NotImplementedError
+
+    @staticmethod
+    def query_type(query):
+        """ Returns type of a query by it's first keyword Eg. SELECT, for metrics of queries by their type. """
+        return query.split(None, 1)[0].upper()
+
+    @staticmethod
+    def read_config():
+        """
+        Reads parameters for database configuration.
+
+        Returns:
+            config(dict): A configurations name as key and it's value.
+        """
+        config_parser = configparser.ConfigParser()
+        config_parser.read("config.cfg")
+        config = {}
+        for k, v in config_parser.items(section="database"):
+            config.update({k: v})
+        return config
+
+    def release(self, row_ids, worker_id):
+        """
+        Releases leases of rows claimed by a crawler but not visited, Eg. on shutdown, so any crawler can claim them
+        again right away. Rows which were meanwhile claimed by another crawler are left as they are.
+
+        Parameters:
+            row_ids(list): Primary keys of rows.
+            worker_id(str): Identifier of crawling process which claimed rows.
+
+        Returns:
+            row_count(int): Count of released rows.
+        """
+        row_count = 0
+        for start in range(0, len(row_ids), self.MAX_ROW_LIMIT):
+            batch = tuple(row_ids[start:start + self.MAX_ROW_LIMIT])
+            placeholders = ", ".join(["%s"] * len(batch))
+            release_rows = f'''UPDATE {self.TABLE_NAME}
+            SET lease_expiry=NULL, lease_owner=NULL, lease_token=NULL
+            WHERE lease_owner=%s AND id IN ({placeholders});'''
+            row_count += self.execute(query=release_rows, values=(worker_id, *batch), count=True)
+        return row_count
+
+    def rename_table(self, table_name, new_name):
+        """ Renames a table Eg. links table replaced by migration. """
+        return self.execute(f"ALTER TABLE {table_name} RENAME TO {new_name};")
+
+    def renew(self, row_ids, lease_expiry, worker_id):
+        """
+        Extends leases of rows claimed by a crawler which are still waiting in it's queue or being visited, so they
+        aren't claimed by another crawler meanwhile. Rows whose lease was lost to another crawler are left as they are.
+
+        Parameters:
+            row_ids(list): Primary keys of rows.
+            lease_expiry(datetime): New datetime after which rows can be claimed again.
+            worker_id(str): Identifier of crawling process which claimed rows.
+
+        Returns:
+            row_count(int): Count of renewed rows.
+        """
+        row_count = 0
+        for start in range(0, len(row_ids), self.MAX_ROW_LIMIT):
+            batch = tuple(row_ids[start:start + self.MAX_ROW_LIMIT])
+            placeholders = ", ".join(["%s"] * len(batch))
+            renew_rows = f'''UPDATE {self.TABLE_NAME} SET lease_expiry=%s
+            WHERE lease_owner=%s AND id IN ({placeholders});'''
+            row_count += self.execute(query=renew_rows, values=(lease_expiry, worker_id, *batch), count=True)
+        return row_count
+
+    def row_count(self):
+        """
+        Returns row count of links table.
+
+        Returns:
+            row_count(int): Number of row in database table of hyperlinks.
+        """
+        result = self.execute(f"SELECT COUNT(*) FROM {self.TABLE_NAME};", fetch=True)
+        # print("row_count:", result)
+        if type(result[0]) == bool:
+            return 0
+        # indexes at end of statement [row_index][column name]
+        row = result[0]
+        row_count = row['COUNT(*)']
+        return row_count
+
+    def schema_version(self):
+        """ Returns version of schema of links table, 0 if table doesn't exist. """
+        columns = self.get_columns()
+        if len(columns) == 0:
+            return 0
+        return SCHEMA_VERSION if "link_hash" in columns else 1
+
+    def upgrade_table(self):
+        """ Adds columns introduced after creation of an existing links table. """
+        new_columns = {
+            "lease_expiry": "DATETIME",
+            "etag": "VARCHAR(255)",
+            "last_modified": "VARCHAR(64)",
+            "content_hash": "CHAR(64)",
+            "recrawl_interval": "INT",
+            "next_crawl_at": "DATETIME",
+            # existing links are treated as found at base url, as their depth can't be known cheaply
+            "depth": "INT NOT NULL DEFAULT 0",
+            "priority": "INT NOT NULL DEFAULT 0",
+            "lease_owner": "VARCHAR(64)",
+            "lease_token": "CHAR(32)",
+            "host_hash": "INT UNSIGNED",
+            "duplicate_of": "INT",
+        }
+        # queries run after a column is added, to fill it for existing rows
+        backfills = {
+            # previously visited links become due for refresh right away and get scheduled on their next visit
+            "next_crawl_at": f"UPDATE {self.TABLE_NAME} SET next_crawl_at=last_crawl_dt "
+                             f"WHERE last_crawl_dt IS NOT NULL;",
+        }
+        # webpages are stored by hash of their content, so links with identical webpages share a file path
+        dropped_indexes = ["file_path"]
+        columns = self.get_columns()
+        if len(columns) == 0:
+            return
+        if "link_hash" not in columns:
+            raise RuntimeError(f"Table {self.TABLE_NAME} has schema version 1, which is converted to version "
+                               f"{SCHEMA_VERSION} by: python migrate_schema.py")
+        for column, definition in new_columns.items():
+            if column not in columns:
+                self.execute(f"ALTER TABLE {self.TABLE_NAME} ADD COLUMN {column} {definition};")
+                print("New Column added:", column)
+                if column in backfills:
+                    self.execute(backfills[column])
+        indexes = self.get_indexes()
+        for index, definition in CrawlerDBHandler.INDEXES.items():
+            if index not in indexes:
+                self.execute(f"CREATE INDEX {index} ON {self.TABLE_NAME} {definition};")
+                print("New Index added:", index)
+        for index in dropped_indexes:
+            if index in indexes:
+                self.drop_index(index)
+                print("Index dropped:", index)
+
+    def warm_seen_filter(self, seen_filter):
+        """
+        Loads all links present in database into seen filter and shares it with all handlers. Only hashes of links
+        are read, which are the same as hashes of seen filter.
+
+        Parameters:
+            seen_filter(ScalableBloomFilter/HashSetFilter): An empty filter of links.
+        """
+        last_id = 0
+        while True:
+            get_links = f"SELECT id, link_hash FROM {self.TABLE_NAME} WHERE id > {last_id} ORDER BY id LIMIT 10000;"
+            result = self.execute(query=get_links, fetch=True)
+            if type(result) != list or len(result) == 0:
+                break
+            for row in result:
+                seen_filter.add(None, bytes(row['link_hash']))
+            last_id = result[-1]['id']
+        CrawlerDBHandler.seen_filter = seen_filter
+
+    def update_unchanged(self, row_id, resp_status, recrawl_interval=None):
+        """
+        Updates only status and datetime of visit for a refreshed link whose webpage hasn't changed, keeping it's
+        stored file and validators. It's buffered like update_visit.
+
+        Parameters:
+             row_id(int):       Primary key of a hyperlink row for which values are to be updated in the database.
+             resp_status(int):  Value of response for a visited link Eg. 304 for Not Modified.
+             recrawl_interval(int): Seconds after which link should be visited again.
+        """
+        visit_info = {
+            "id": row_id,
+            "response_status": resp_status,
+            "last_crawl_dt": datetime.now(),
+        }
+        self.__buffer_visit(CrawlerDBHandler.__schedule(visit_info, recrawl_interval))
+
+    def update_failure(self, row_id, resp_status, recrawl_interval=None):
+        """
+        Updates only status and datetime of visit for a link which couldn't be downloaded, keeping stored file and
+        validators of it's previous visit. It's buffered like update_visit.
+
+        Parameters:
+             row_id(int):       Primary key of a hyperlink row for which values are to be updated in the database.
+             resp_status(int):  Value of response for a visited link Eg. 408 for timeout.
+             recrawl_interval(int): Seconds after which link should be visited again.
+        """
+        self.update_unchanged(row_id, resp_status, recrawl_interval)
+
+    def update_duplicate(self, row_id, resp_status, content_hash, duplicate_of, recrawl_interval=None):
+        """
+        Updates status and datetime of visit for a link whose webpage is a near-duplicate of another stored webpage,
+        with hash of it's content and row of that webpage. Stored file and validators of a previous visit are kept. It's
+        buffered like update_visit.
+
+        Parameters:
+             row_id(int):       Primary key of a hyperlink row for which values are to be updated in the database.
+             resp_status(int):  Value of response for a visited link Eg. 200 for Successful visit.
+             content_hash(str): SHA-256 hex digest of the webpage content.
+             duplicate_of(int): Primary key of a row whose stored webpage is a near-duplicate of this webpage.
+             recrawl_interval(int): Seconds after which link should be visited again.
+        """
+        visit_info = {
+            "id": row_id,
+            "response_status": resp_status,
+            "last_crawl_dt": datetime.now(),
+            "content_hash": content_hash,
+            "duplicate_of": duplicate_of,
+        }
+        self.__buffer_visit(CrawlerDBHandler.__schedule(visit_info, recrawl_interval))
+
+    @staticmethod
+    def __schedule(visit_info, recrawl_interval):
+        """ Adds recrawl interval and datetime of next visit into values of a visited link. """
+        if recrawl_interval is not None:
+            visit_info["recrawl_interval"] = recrawl_interval
+            visit_info["next_crawl_at"] = visit_info["last_crawl_dt"] + timedelta(seconds=recrawl_interval)
+        return visit_info
+
+    def update_visit(self, row_id, resp_status, content_type=None, content_len=None, file_path=None, etag=None,
+                     last_modified=None, content_hash=None, recrawl_interval=None, duplicate_of=None):
+        """
+        Updates values of database for a visited link. Updates are buffered and written together when UPDATE_BATCH_SIZE
+        rows are buffered or UPDATE_FLUSH_MS milliseconds have passed since first buffered row. Row stays leased until
+        then, so it isn't handed out again.
+
+        Parameters:
+             row_id(int):           Primary key of a hyperlink row for which values are to be updated in the database.
+             resp_status(int):  Value of response for a visited link Eg. 200 for Successful visit.
+             content_type(str): Value of Content Type mentioned in the response.
+             content_len(int):  Number of bytes of data present in the webpage response.
+             file_path(str):    File Path where webpage is stored on the machine/server.
+             etag(str):         Value of ETag mentioned in the response.
+             last_modified(str): Value of Last-Modified mentioned in the response.
+             content_hash(str): SHA-256 hex digest of the webpage content.
+             recrawl_interval(int): Seconds after which link should be visited again.
+             duplicate_of(int): Primary key of a row whose stored webpage is a near-duplicate of this webpage.
+        """
+        visit_info = {
+            "id": row_id,
+            "response_status": resp_status,
+            "last_crawl_dt": datetime.now(),
+            "content_type": content_type,
+            "content_len": content_len,
+            "file_path": file_path,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "duplicate_of": duplicate_of,
+        }
+        self.__buffer_visit(CrawlerDBHandler.__schedule(visit_info, recrawl_interval))
+
+    def __buffer_visit(self, visit_info):
+        """
+        Buffers values of a visited link until they're written by flush_visits.
+
+        Parameters:
+            visit_info(dict): Column name as key and it's new value, including primary key as id.
+        """
+        with self.buffer_lock:
+            self.visit_buffer[visit_info["id"]] = visit_info
+            buffered = len(self.visit_buffer)
+            if self.flush_timer is None and buffered < self.UPDATE_BATCH_SIZE:
+                self.flush_timer = Timer(self.UPDATE_FLUSH_MS / 1000, self.flush_visits)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+        if buffered >= self.UPDATE_BATCH_SIZE:
+            self.flush_visits()
+
+    def write_visits(self, visits):
+        """
+        Writes values of visited links, marking them crawled and releasing their lease, in a single batch.
+
+        Parameters:
+            visits(list): Dictionaries of column name as key and it's new value, including primary key as id.
+        """
+        raise NotImplementedError
+
+
+class MySQLHandler(CrawlerDBHandler):
+    """ Storage backend which keeps links table in a MySQL Database server. """
+    BACKEND = "mysql"
+    # pool of connections shared by all handlers, so that queries of crawling threads don't wait for each other
+    pool = None
+    pool_lock = Lock()
+
     def __init__(self):
         """
-        Initializes CrawlerDBHandler with parameters and detects the connection is live.
+        Initializes MySQLHandler with parameters and detects the connection is live.
         """
         # Database configuration values
         self.config = self.__class__.read_config()
+        super().__init__(self.config)
         self.DB_NAME = self.config['db_name']
-        self.TABLE_NAME = self.config['table_name']
         self.USERNAME = self.config['username']
         self.PASSWORD = self.config['password']
         self.HOST = self.config['host_type']
-        self.MAX_ROW_LIMIT = self.config['max_row_read']
+        self.POOL_SIZE = int(self.config['pool_size'])
+        self.CONNECT_RETRIES = int(self.config['connect_retries'])
+        self.CONNECT_BACKOFF_MS = int(self.config['connect_backoff_ms'])
+        self.CONNECT_MAX_BACKOFF_MS = int(self.config['connect_max_backoff_ms'])
+        self.MAX_PREPARED_STATEMENTS = int(self.config['max_prepared_statements'])
         del self.config
-        # connectors
-        self.connector = None
-        self.cursor = None
-        # thread synchronization with lock
-        self.lock = Lock()
         self.connect()
 
     def close(self):
-        """ Closes a connection with the database. """
-        if self.connector is not None:
-            self.connector.close()
+        """ Closes all idle connections of pool with the database. """
+        if MySQLHandler.pool is not None:
+            MySQLHandler.pool.close()
         else:
             raise ValueError(" Connector value is not initialize. ")
 
     def connect(self):
         """
-            Makes connection with MySQL Database server.
-            If check is set to True,con_count=10
-                it detects by making connection and closes it.
-            Else if check is set to False,
-                it makes a connection and also initializes a cursor.
+            Creates pool of connections with MySQL Database server, which is shared by all handlers, if it isn't
+            created yet. It detects the connection is live by borrowing a connection from pool.
         """
+        with MySQLHandler.pool_lock:
+            if MySQLHandler.pool is None:
+                MySQLHandler.pool = db_pool.ConnectionPool(
+                    size=self.POOL_SIZE,
+                    connect_args=dict(
+                        host=self.HOST,
+                        user=self.USERNAME,
+                        password=self.PASSWORD,
+                        database=self.DB_NAME,
+                        charset="utf8mb4",
+                        autocommit=True
+                    ),
+                    max_retries=self.CONNECT_RETRIES,
+                    backoff_secs=self.CONNECT_BACKOFF_MS / 1000,
+                    max_backoff_secs=self.CONNECT_MAX_BACKOFF_MS / 1000,
+                    max_statements=self.MAX_PREPARED_STATEMENTS
+                )
         try:
-            self.connector = connector.connect(
-                host=self.HOST,
-                user=self.USERNAME,
-                password=self.PASSWORD,
-                database=self.DB_NAME,
-                autocommit=True
-            )
-            self.cursor = self.connector.cursor(dictionary=True)
+            with MySQLHandler.pool.connection():
+                pass
         except connector.Error as err:
             if err.errno == errorcode.ER_BAD_DB_ERROR:
                 # unknown database error
@@ -65,194 +748,389 @@ class CrawlerDBHandler:
             elif err.errno == errorcode.CR_CONN_HOST_ERROR:
                 print("Database server is down.")
                 print("Please start/reboot database server and then restart the program.")
-                exit()
+                # raised instead of exiting, so that an embedding program can handle it Eg. fall back to SQLite
+                raise
             else:
                 print("DB ERROR", err.errno, end=": ")
                 print("Unknown Error while connecting.")
 
     def create_db(self):
         """ Creates a New Database crawler if does not exist. """
-        self.connector = connector.connect(
+        server_connector = connector.connect(
+            host=self.HOST,
             user=self.USERNAME,
             password=self.PASSWORD
         )
-        add_db = f"CREATE DATABASE IF NOT EXISTS {self.DB_NAME};"
-        self.cursor = self.connector.cursor()
-        self.cursor.execute(add_db)
+        add_db = f"CREATE DATABASE IF NOT EXISTS {self.DB_NAME} CHARACTER SET utf8mb4;"
+        cursor = server_connector.cursor()
+        cursor.execute(add_db)
         print("New Database created:", self.DB_NAME)
-        self.connector.database = self.DB_NAME
+        server_connector.close()
         self.create_table()
-        self.connector.close()
 
-    def create_table(self):
-        """ Creates Table links if does not exists. """
+    def create_table(self, table_name=None):
+        table_name = table_name or self.TABLE_NAME
+        # links are looked up by a fixed width hash, so the unique index stays small for links of any length
         add_table = f'''
-            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME}(
-                id INT PRIMARY KEY AUTO_INCREMENT, 
-                link VARCHAR(1023) NOT NULL UNIQUE, 
-                src_link VARCHAR(1023) NOT NULL, 
-                is_crawled TINYINT NOT NULL DEFAULT 0, 
-                last_crawl_dt DATETIME, 
-                response_status VARCHAR(4), 
-                content_type VARCHAR(255), 
-                content_len INT, 
-                file_path VARCHAR(1023) UNIQUE, 
-                created_at DATETIME NOT NULL
+            CREATE TABLE IF NOT EXISTS {table_name}(
+                id INT PRIMARY KEY AUTO_INCREMENT,
+                link_hash BINARY(16) NOT NULL UNIQUE,
+                link VARCHAR(2048) NOT NULL,
+                is_crawled TINYINT NOT NULL DEFAULT 0,
+                last_crawl_dt DATETIME,
+                response_status VARCHAR(4),
+                content_type VARCHAR(255),
+                content_len INT,
+                file_path VARCHAR(1023),
+                created_at DATETIME NOT NULL,
+                lease_expiry DATETIME,
+                etag VARCHAR(255),
+                last_modified VARCHAR(64),
+                content_hash CHAR(64),
+                recrawl_interval INT,
+                next_crawl_at DATETIME,
+                depth INT NOT NULL DEFAULT 0,
+                priority INT NOT NULL DEFAULT 0,
+                lease_owner VARCHAR(64),
+                lease_token CHAR(32),
+                host_hash INT UNSIGNED,
+                duplicate_of INT,
+                INDEX idx_next_crawl_at (next_crawl_at),
+                INDEX idx_frontier (is_crawled, priority, id),
+                INDEX idx_last_crawl_dt (last_crawl_dt),
+                INDEX idx_lease_token (lease_token)
             )
-            CHARSET=latin1;
+            CHARSET=utf8mb4;
+        '''
+        add_edge_table = f'''
+            CREATE TABLE IF NOT EXISTS {self.EDGE_TABLE_NAME}(
+                parent_id INT NOT NULL,
+                child_id INT NOT NULL,
+                PRIMARY KEY (parent_id, child_id),
+                INDEX idx_child_id (child_id)
+            );
         '''
-        self.connect()
         if self.execute(add_table):
-            print("New Table created:", self.TABLE_NAME)
+            print("New Table created:", table_name)
+        if self.execute(add_edge_table):
+            print("New Table created:", self.EDGE_TABLE_NAME)
 
-    def execute(self, query, values=None, fetch=False):
-        """ Executes query with cursor by creating connection.
+    def claim_query(self, condition, order, limit):
+        # UPDATE with ORDER BY and LIMIT locks the rows it claims, so concurrent claims wait instead of overlapping
+        return f'''UPDATE {self.TABLE_NAME}
+        SET lease_expiry=%s, lease_owner=%s, lease_token=%s
+        WHERE {condition}
+        ORDER BY {order}
+        LIMIT {limit};'''
 
-            Parameters:
-                query (str): SQL query for execution.
-                values (list/tuple): Parameters in case of insert query.
-                fetch (bool): Is this a select query?.
+    def drop_index(self, index):
+        return self.execute(f"ALTER TABLE {self.TABLE_NAME} DROP INDEX {index};")
 
-            Output:
-                If fetch is set to true then
-                    it returns a boolean value and list of experiments.
-                Else then
-                    it returns a boolean value based on success/failure.
+    def execute(self, query, values=None, fetch=False, count=False, prepared=False, retry=True):
+        """ Executes query with a cursor of a connection borrowed from pool. If connection was lost, query is retried
+            once on a new connection unless retry is set to False. Parameters and output are same as of
+            CrawlerDBHandler.execute.
         """
-        if self.connector is not None:
-            if self.cursor is not None:
-                try:
-                    if values is not None:
-                        self.lock.acquire()
-                        self.cursor.execute(query, values)
-                        self.lock.release()
-                        return True
-                    elif fetch:
-                        self.lock.acquire()
-                        self.cursor.execute(query)
-                        result = self.cursor.fetchall()
-                        self.lock.release()
-                        return result
-                    else:
-                        self.lock.acquire()
-                        self.cursor.execute(query)
-                        self.lock.release()
-                        return True
-                except connector.Error as err:
-                    self.lock.release()
-                    if err.errno == errorcode.ER_BAD_TABLE_ERROR:
-                        print("Table does not exist:", self.TABLE_NAME)
-                        self.create_table()
-                    elif err.errno == errorcode.ER_DUP_ENTRY:
-                        # print("link is repeated")
-                        pass
-                    elif err.errno == errorcode.ER_NO_SUCH_TABLE:               # error code 1146
-                        self.create_table()
-                    elif err.errno == errorcode.CR_SERVER_LOST:
-                        self.connect()
-                        if values is not None:
-                            self.execute(query, values=values)
-                        elif fetch:
-                            self.execute(query, fetch=True)
-                            return self.cursor.fetchall()
-                        else:
-                            self.execute(query)
-                    else:
-                        print(err.errno, ":", sep="", end=" ")
-                        print("While executing query")
-            else:
-                raise TypeError("Cursor is not initialized.")
-        else:
-            raise TypeError("Connector is not initialized.")
-        if fetch:
-            return False, []
-        return False
+        with self.metrics.timer("db_query_seconds", query=CrawlerDBHandler.query_type(query)):
+            if MySQLHandler.pool is None:
+                raise TypeError("Connector is not initialized.")
+            try:
+                with MySQLHandler.pool.connection() as pooled:
+                    cursor = pooled.execute(query, values, prepared=prepared)
+                    if fetch:
+                        return cursor.fetchall()
+                    return cursor.rowcount if count else True
+            except connector.Error as err:
+                if err.errno == errorcode.ER_BAD_TABLE_ERROR:
+                    print("Table does not exist:", self.TABLE_NAME)
+                    self.create_table()
+                elif err.errno == errorcode.ER_DUP_ENTRY:
+                    # print("link is repeated")
+                    pass
+                elif err.errno == errorcode.ER_NO_SUCH_TABLE:               # error code 1146
+                    self.create_table()
+                elif err.errno in db_pool.LOST_CONNECTION_ERRORS and retry:
+                    # lost connection is dropped by pool, so query runs on a new connection
+                    return self.execute(query, values=values, fetch=fetch, count=count, prepared=prepared, retry=False)
+                else:
+                    print(err.errno, ":", sep="", end=" ")
+                    print("While executing query")
+            if fetch:
+                return False, []
+            if count:
+                return 0
+            return False
 
-    def get_unvisited(self):
-        """ Retrieves unvisited links from the database. """
-        get_unvisit = f"SELECT * FROM {self.TABLE_NAME} WHERE is_crawled=0 LIMIT {self.MAX_ROW_LIMIT};"
-        result = self.execute(query=get_unvisit, fetch=True)
-        return list(result)
+    def get_columns(self):
+        get_columns = '''SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s;'''
+        result = self.execute(query=get_columns, values=(self.DB_NAME, self.TABLE_NAME), fetch=True)
+        return {row['COLUMN_NAME'] for row in result} if type(result) == list else set()
 
-    def get_unrefreshed(self, from_dt=datetime.now() - timedelta(days=1)):
-        """
-        Fetches unrefreshed data which aren't updated recently.
+    def get_indexes(self):
+        get_indexes = '''SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s;'''
+        result = self.execute(query=get_indexes, values=(self.DB_NAME, self.TABLE_NAME), fetch=True)
+        return {row['INDEX_NAME'] for row in result} if type(result) == list else set()
 
-        Parameters:
-             from_dt(datetime): Links which have last_crawled later than datetime of "from_dt" parameter.
-                                By default, it's set for one day before the time of execution.
-        """
-        get_unrefreshed = f'''SELECT * FROM {self.TABLE_NAME} 
-        WHERE last_crawl_dt <= "{from_dt.strftime("%Y-%-m-%-d %H:%M:%S")}" 
-        LIMIT {self.MAX_ROW_LIMIT};'''
-        result = self.execute(query=get_unrefreshed, fetch=True)
-        return list(result)
-
-    def insert_unvisited(self, link, src_link):
-        """ Inserts unvisited links in database with current datetime. """
-        insert_link = "INSERT INTO {}(link, src_link, created_at) VALUES(%s, %s, %s);".format(self.TABLE_NAME)
-        new_link = (link, src_link, datetime.now())
-        # print("Insert query:", insert_link, new_link)
-        return self.execute(query=insert_link, values=new_link)
+    def insert_rows(self, table_name, columns, rows):
+        row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        placeholders = ", ".join([row_placeholders] * len(rows))
+        insert_rows = f'''{self.INSERT_IGNORE} INTO {table_name}({", ".join(columns)})
+        VALUES {placeholders};'''
+        values = [value for row in rows for value in row]
+        return self.execute(query=insert_rows, values=values, count=True)
+
+    def location(self):
+        return f"{self.HOST}/{self.DB_NAME}"
 
     def print_connect(self):
         """ Prints connect message. """
-        if self.connector is not None:
+        if MySQLHandler.pool is not None:
             print("Database connected:", self.DB_NAME)
         else:
             print("h")
 
-    @staticmethod
-    def read_config():
-        """
-        Reads parameters for database configuration.
+    def write_visits(self, visits):
+        """ Writes visits with a single UPDATE query, which picks value of each row by it's id. """
+        columns = list()
+        for visit in visits:
+            columns.extend(column for column in visit if column != "id" and column not in columns)
+        values = list()
+        set_columns = list()
+        for column in columns:
+            # rows which don't update a column keep it's current value
+            updating = [visit for visit in visits if column in visit]
+            cases = " ".join(["WHEN %s THEN %s"] * len(updating))
+            set_columns.append(f"{column}=CASE id {cases} ELSE {column} END")
+            for visit in updating:
+                values.extend((visit["id"], visit[column]))
+        placeholders = ", ".join(["%s"] * len(visits))
+        values.extend(visit["id"] for visit in visits)
+        update_links = f'''
+        UPDATE {self.TABLE_NAME}
+        SET is_crawled=1,
+            lease_expiry=NULL,
+            lease_owner=NULL,
+            lease_token=NULL,
+            {", ".join(set_columns)}
+        WHERE id IN ({placeholders});
+        '''
+        # query of a full batch of same columns is identical every time, so it's prepared once per connection
+        self.execute(query=update_links, values=values, prepared=len(visits) == self.UPDATE_BATCH_SIZE)
 
-        Returns:
-            config(dict): A configurations name as key and it's value.
-        """
-        config_parser = configparser.ConfigParser()
-        config_parser.read("config.cfg")
-        config = {}
-        for k, v in config_parser.items(section="database"):
-            config.update({k: v})
-        return config
 
-    def row_count(self):
+class SQLiteHandler(CrawlerDBHandler):
+    """
+    Storage backend which keeps links table in an embedded SQLite database file, for crawls of a single machine and
+    for testing without a database server. Database is used in WAL mode, so crawling threads read while another
+    thread writes, and every thread uses it's own connection. Batches of rows are written in a single transaction.
+    """
+    BACKEND = "sqlite"
+    INSERT_IGNORE = "INSERT OR IGNORE"
+
+    def __init__(self):
         """
-        Returns row count of links table.
+        Initializes SQLiteHandler with parameters and detects the connection is live.
+        """
+        self.config = self.__class__.read_config()
+        super().__init__(self.config)
+        self.DB_PATH = self.config['sqlite_path']
+        self.BUSY_TIMEOUT_MS = int(self.config['sqlite_busy_timeout_ms'])
+        del self.config
+        self.local = local()
+        self.connect()
 
-        Returns:
-            row_count(int): Number of row in database table of hyperlinks.
+    def close(self):
+        """ Closes connection of current thread with the database. """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            raise ValueError(" Connector value is not initialize. ")
+        connection.close()
+        self.local.connection = None
+
+    def connect(self):
+        """ Opens connection of current thread with SQLite database file, which is created if does not exist. """
+        connection = sqlite3.connect(self.DB_PATH, timeout=self.BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        connection.row_factory = SQLiteHandler.__dict_row
+        connection.execute("PRAGMA journal_mode=WAL;")
+        # WAL file is synced on checkpoints only, a crash can lose last transactions but never corrupts database
+        connection.execute("PRAGMA synchronous=NORMAL;")
+        self.local.connection = connection
+        return connection
+
+    def create_table(self, table_name=None):
+        table_name = table_name or self.TABLE_NAME
+        add_table = f'''
+            CREATE TABLE IF NOT EXISTS {table_name}(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                link_hash BLOB NOT NULL UNIQUE,
+                link VARCHAR(2048) NOT NULL,
+                is_crawled TINYINT NOT NULL DEFAULT 0,
+                last_crawl_dt DATETIME,
+                response_status VARCHAR(4),
+                content_type VARCHAR(255),
+                content_len INT,
+                file_path VARCHAR(1023),
+                created_at DATETIME NOT NULL,
+                lease_expiry DATETIME,
+                etag VARCHAR(255),
+                last_modified VARCHAR(64),
+                content_hash CHAR(64),
+                recrawl_interval INT,
+                next_crawl_at DATETIME,
+                depth INT NOT NULL DEFAULT 0,
+                priority INT NOT NULL DEFAULT 0,
+                lease_owner VARCHAR(64),
+                lease_token CHAR(32),
+                host_hash INT UNSIGNED,
+                duplicate_of INT
+            );
+        '''
+        # edges are stored in their primary key only, without a separate rowid
+        add_edge_table = f'''
+            CREATE TABLE IF NOT EXISTS {self.EDGE_TABLE_NAME}(
+                parent_id INTEGER NOT NULL,
+                child_id INTEGER NOT NULL,
+                PRIMARY KEY (parent_id, child_id)
+            ) WITHOUT ROWID;
+        '''
+        if self.execute(add_table):
+            print("New Table created:", table_name)
+            # names of indexes are unique within a SQLite database, not within a table
+            for index, definition in CrawlerDBHandler.INDEXES.items():
+                self.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table_name} {definition};")
+        if self.execute(add_edge_table):
+            print("New Table created:", self.EDGE_TABLE_NAME)
+            self.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.EDGE_TABLE_NAME}_child_id "
+                         f"ON {self.EDGE_TABLE_NAME} (child_id);")
+
+    def claim_query(self, condition, order, limit):
+        # SQLite allows only one writer at once, so the UPDATE is atomic across processes
+        return f'''UPDATE {self.TABLE_NAME}
+        SET lease_expiry=%s, lease_owner=%s, lease_token=%s
+        WHERE id IN (SELECT id FROM {self.TABLE_NAME} WHERE {condition} ORDER BY {order} LIMIT {limit});'''
+
+    @staticmethod
+    def __dict_row(cursor, row):
+        """ Row factory which returns rows as dictionaries with column name as keys, like cursors of MySQL. """
+        return {column[0]: value for column, value in zip(cursor.description, row)}
+
+    def drop_index(self, index):
+        return self.execute(f"DROP INDEX IF EXISTS {index};")
+
+    def execute(self, query, values=None, fetch=False, count=False, prepared=False):
+        """ Executes query with connection of current thread. SQLite caches compiled statements of every connection by
+            itself, so prepared is accepted only for compatibility. Parameters and output are same as of
+            CrawlerDBHandler.execute.
         """
-        result = self.execute(f"SELECT COUNT(*) FROM {self.TABLE_NAME};", fetch=True)
-        # print("row_count:", result)
-        if type(result[0]) == bool:
-            return 0
-        # indexes at end of statement [row_index][column name]
-        row = result[0]
-        row_count = row['COUNT(*)']
-        return row_count
+        with self.metrics.timer("db_query_seconds", query=CrawlerDBHandler.query_type(query)):
+            connection = getattr(self.local, "connection", None) or self.connect()
+            try:
+                cursor = connection.execute(query.replace("%s", "?"), SQLiteHandler.__adapt(values or ()))
+                if fetch:
+                    return cursor.fetchall()
+                return cursor.rowcount if count else True
+            except sqlite3.IntegrityError:
+                # print("link is repeated")
+                pass
+            except sqlite3.OperationalError as err:
+                self.__handle_error(err)
+            if fetch:
+                return False, []
+            if count:
+                return 0
+            return False
 
-    def update_visit(self, row_id, resp_status, content_type=None, content_len=None, file_path=None):
+    def execute_batch(self, statements):
         """
-        Updates values of database for a visited link.
+        Executes queries for many rows in a single transaction, which is rolled back if any query fails.
 
         Parameters:
-             row_id(int):           Primary key of a hyperlink row for which values are to be updated in the database.
-             resp_status(int):  Value of response for a visited link Eg. 200 for Successful visit.
-             content_type(str): Value of Content Type mentioned in the response.
-             content_len(int):  Number of bytes of data present in the webpage response.
-             file_path(str):    File Path where webpage is stored on the machine/server.
+            statements(list): Tuples of a query and list of it's parameters for every row.
+
+        Returns:
+            row_count(int): Count of affected rows.
         """
-        update_link = f'''
-        UPDATE {self.TABLE_NAME} 
-        SET is_crawled=%s,
-            response_status=%s, 
-            last_crawl_dt=%s,
-            content_type=%s,
-            content_len=%s,
-            file_path=%s
-        WHERE id=%s;
-        '''
-        visit_info = (True, resp_status, datetime.now(), content_type, content_len, file_path, row_id)
-        self.execute(query=update_link, values=visit_info)
+        with self.metrics.timer("db_query_seconds", query="BATCH"):
+            connection = getattr(self.local, "connection", None) or self.connect()
+            row_count = 0
+            try:
+                with connection:
+                    connection.execute("BEGIN;")
+                    for query, rows in statements:
+                        cursor = connection.executemany(query.replace("%s", "?"), map(SQLiteHandler.__adapt, rows))
+                        row_count += cursor.rowcount
+            except sqlite3.OperationalError as err:
+                self.__handle_error(err)
+                return 0
+            return row_count
+
+    @staticmethod
+    def __adapt(values):
+        """ Formats datetime values of a query like MySQL does, so that they're compared as text in right order. """
+        return [value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value for value in values]
+
+    def __handle_error(self, err):
+        """ Creates links table if it's missing, else prints an error of a query. """
+        if str(err).startswith("no such table"):
+            print("Table does not exist:", self.TABLE_NAME)
+            self.create_table()
+        else:
+            print(err, ":", sep="", end=" ")
+            print("While executing query")
+
+    def get_columns(self):
+        result = self.execute(f"PRAGMA table_info({self.TABLE_NAME});", fetch=True)
+        return {row['name'] for row in result} if type(result) == list else set()
+
+    def get_indexes(self):
+        result = self.execute(f"PRAGMA index_list({self.TABLE_NAME});", fetch=True)
+        return {row['name'] for row in result} if type(result) == list else set()
+
+    def insert_rows(self, table_name, columns, rows):
+        insert_rows = f'''{self.INSERT_IGNORE} INTO {table_name}({", ".join(columns)})
+        VALUES({", ".join(["%s"] * len(columns))});'''
+        return self.execute_batch([(insert_rows, rows)])
+
+    def location(self):
+        return os.path.abspath(self.DB_PATH)
+
+    def print_connect(self):
+        """ Prints connect message. """
+        print("Database connected:", self.DB_PATH)
+
+    def write_visits(self, visits):
+        """ Writes visits in a single transaction, with one UPDATE query per set of updated columns. """
+        batches = dict()
+        for visit in visits:
+            columns = tuple(column for column in visit if column != "id")
+            batches.setdefault(columns, list()).append(tuple(visit[column] for column in columns) + (visit["id"],))
+        statements = list()
+        for columns, rows in batches.items():
+            set_columns = ", ".join(f"{column}=%s" for column in columns)
+            update_links = f'''UPDATE {self.TABLE_NAME}
+            SET is_crawled=1, lease_expiry=NULL, lease_owner=NULL, lease_token=NULL, {set_columns}
+            WHERE id=%s;'''
+            statements.append((update_links, rows))
+        self.execute_batch(statements)
+
+
+BACKENDS = {
+    "mysql": MySQLHandler,
+    "sqlite": SQLiteHandler,
+}
+
+
+def create_handler():
+    """
+    Creates database handler of backend configured from configuration file.
+
+    Returns:
+        db_handler(CrawlerDBHandler): A database handler.
+    """
+    backend = CrawlerDBHandler.read_config().get("backend", "mysql")
+    if backend == "mysql" and connector is None:
+        print("mysql-connector-python package is not installed - using sqlite backend")
+        backend = "sqlite"
+    return BACKENDS[backend]()
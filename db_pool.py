@@ -0,0 +1,174 @@
+# standard python package
+import queue
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+# global imports
+from mysql import connector
+from mysql.connector import errorcode
+
+# local packages
+import metrics
+
+# errors after which a connection can't be used anymore, a new connection is made in it's place
+LOST_CONNECTION_ERRORS = (
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+)
+
+
+class PooledConnection:
+    """ A connection of pool along with it's cursor and statements prepared on it, which live as long as it lives. """
+    def __init__(self, connection, max_statements):
+        """
+        Initializer for PooledConnection object.
+
+        Parameters:
+            connection(MySQLConnection): An open connection with MySQL Database server.
+            max_statements(int): Maximum count of prepared statements kept open on the connection.
+        """
+        self.connection = connection
+        self.cursor = connection.cursor(dictionary=True)
+        self.max_statements = max_statements
+        self.statements = OrderedDict()
+
+    def close(self):
+        """ Closes connection, ignoring errors of a connection which is already broken. """
+        try:
+            self.connection.close()
+        except connector.Error:
+            pass
+
+    def execute(self, query, values=None, prepared=False):
+        """
+        Executes a query on connection.
+
+        Parameters:
+            query(str): SQL query for execution.
+            values(list/tuple): Parameters of query.
+            prepared(bool): Should query be prepared on server and reused for later executions of same query?.
+                            Such queries return rows as tuples, so it's meant for insert and update queries.
+
+        Returns:
+            cursor(MySQLCursor): A cursor with result of query.
+        """
+        if not prepared:
+            self.cursor.execute(query, values)
+            return self.cursor
+        statement = self.statements.get(query)
+        if statement is None:
+            statement = (query, self.connection.cursor(prepared=True))
+            self.statements[query] = statement
+            if len(self.statements) > self.max_statements:
+                self.statements.popitem(last=False)[1][1].close()
+        else:
+            self.statements.move_to_end(query)
+        # prepared cursor prepares query again unless it's given the same query object which it has prepared
+        statement[1].execute(statement[0], values)
+        return statement[1]
+
+
+class ConnectionPool:
+    """
+    Pool of connections with MySQL Database server shared by all crawling threads, so that queries of different
+    threads run in parallel instead of waiting for a single connection. Connections are opened on demand up to size of
+    pool and a broken connection is replaced with a new one, which is retried with bounded exponential backoff while
+    server is unreachable.
+    """
+    def __init__(self, size, connect_args, max_retries, backoff_secs, max_backoff_secs, max_statements):
+        """
+        Initializer for ConnectionPool object.
+
+        Parameters:
+            size(int): Maximum count of open connections.
+            connect_args(dict): Keyword arguments of mysql.connector.connect Eg. host, user and database.
+            max_retries(int): Count of retries of a connection before giving up.
+            backoff_secs(float): Seconds to wait before first retry, it's doubled on every retry.
+            max_backoff_secs(float): Maximum seconds to wait before a retry.
+            max_statements(int): Maximum count of prepared statements kept open per connection.
+        """
+        self.size = size
+        self.connect_args = connect_args
+        self.max_retries = max_retries
+        self.backoff_secs = backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+        self.max_statements = max_statements
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = Lock()
+
+    def __acquire(self):
+        """ Takes an idle connection, opens a new one if pool isn't full, else waits for one to be released. """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if not can_open:
+            start = time.perf_counter()
+            pooled = self.idle.get()
+            # crawlers waiting for a connection tell that pool or database is saturated
+            metrics.get_metrics().observe("db_pool_wait_seconds", time.perf_counter() - start)
+            return pooled
+        try:
+            return self.__open()
+        except connector.Error:
+            self.__discard(None)
+            raise
+
+    def close(self):
+        """ Closes all idle connections. """
+        while True:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.__discard(pooled)
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection for the duration of a with block and takes it back afterwards, even if query fails. A
+        connection which was lost during the block is closed instead of being reused.
+
+        Yields:
+            pooled(PooledConnection): A connection which is used by no other thread meanwhile.
+        """
+        pooled = self.__acquire()
+        try:
+            yield pooled
+        except connector.Error as err:
+            if err.errno in LOST_CONNECTION_ERRORS:
+                self.__discard(pooled)
+                pooled = None
+            raise
+        finally:
+            if pooled is not None:
+                self.idle.put(pooled)
+
+    def __discard(self, pooled):
+        """ Closes a connection and frees it's place in pool. """
+        if pooled is not None:
+            pooled.close()
+        with self.lock:
+            self.opened -= 1
+
+    def __open(self):
+        """ Opens a new connection, retrying with exponential backoff while server is unreachable. """
+        delay = self.backoff_secs
+        for attempt in range(self.max_retries + 1):
+            try:
+                return PooledConnection(connector.connect(**self.connect_args), self.max_statements)
+            except connector.Error as err:
+                if err.errno not in LOST_CONNECTION_ERRORS or attempt == self.max_retries:
+                    raise
+                print(f"Database server is unreachable, retrying in {delay:.1f} secs.")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff_secs)
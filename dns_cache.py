@@ -0,0 +1,360 @@
+# standard python package
+import configparser
+import functools
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from urllib.parse import urlsplit
+
+# global imports
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+# local packages
+import metrics
+
+# errors of lookups of hosts which don't exist or have no address, other errors Eg. EAI_AGAIN of a resolver which
+# timed out may go away on next lookup, so they aren't cached
+NEGATIVE_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+
+def read_config():
+    """
+    Reads configuration of DNS cache.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("dns"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+def get_hostname(link):
+    """ Returns lowercase hostname of a link without it's port, or None if link has none. """
+    try:
+        return urlsplit(link).hostname
+    except ValueError:
+        return None
+
+
+class DNSCache:
+    """
+    Process-wide cache of resolved hostnames. Addresses are kept for ttl_secs and lookups of hosts which don't exist
+    for negative_ttl_secs, so that crawlers of many threads resolve a host once, and a host which can't be resolved is
+    skipped instead of being looked up again for each of it's links. Concurrent lookups of a same host wait for a
+    single lookup. Hosts can be resolved ahead of time in background by prefetch.
+
+    Only downloads of crawlers resolve through cache, by DNSCacheAdapter of requests or by resolver of aiohttp, other
+    connections of process Eg. to database or of metrics use resolver of operating system.
+
+    A host is resolved once for stream sockets of any family and port, and results are filtered and given the port of
+    each call, so a prefetched host serves both HTTP and HTTPS connections of either engine.
+    """
+    def __init__(self, resolver=socket.getaddrinfo, ttl_secs=300, negative_ttl_secs=60, max_entries=10000,
+                 prefetch_workers=4):
+        """
+        Initializer for DNSCache object.
+
+        Parameters:
+            resolver(function): A function with signature of socket.getaddrinfo, which looks up hostnames Eg. a stub
+                                resolver without network access.
+            ttl_secs(int): Seconds for which addresses of a host are reused.
+            negative_ttl_secs(int): Seconds for which a lookup of a host which doesn't exist is reused.
+            max_entries(int): Count of hosts kept in cache, least recently used hosts are dropped first.
+            prefetch_workers(int): Count of threads which resolve hosts in background.
+        """
+        self.resolver = resolver
+        self.ttl_secs = ttl_secs
+        self.negative_ttl_secs = negative_ttl_secs
+        self.max_entries = max_entries
+        self.prefetch_workers = prefetch_workers
+        # hostname as key and (expiry, addresses, error) as value
+        self.entries = OrderedDict()
+        # hostnames being looked up with an event which is set when lookup is done
+        self.pending = dict()
+        self.lock = Lock()
+        self.executor = None
+        self.metrics = metrics.get_metrics()
+
+    @classmethod
+    def from_config(cls):
+        """ Creates DNS cache configured from configuration file. """
+        config = read_config()
+        return cls(
+            ttl_secs=config["ttl_secs"],
+            negative_ttl_secs=config["negative_ttl_secs"],
+            max_entries=config["max_entries"],
+            prefetch_workers=config["prefetch_workers"]
+        )
+
+    def __lookup(self, host):
+        """
+        Returns a fresh entry of a host from cache, looking it up if it's missing or expired. Only one thread looks up a
+        host at once, others wait for it's result.
+
+        Returns:
+            (expiry, addresses, error): Addresses of host or error of failed lookup.
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.get(host)
+                if entry is not None and entry[0] > time.monotonic():
+                    self.entries.move_to_end(host)
+                    self.metrics.inc("dns_lookups_total", result="hit" if entry[2] is None else "negative_hit")
+                    return entry
+                event = self.pending.get(host)
+                if event is None:
+                    event = self.pending[host] = Event()
+                    break
+            event.wait()
+        start = time.perf_counter()
+        try:
+            entry = (time.monotonic() + self.ttl_secs, self.resolver(host, None, 0, socket.SOCK_STREAM), None)
+            self.metrics.inc("dns_lookups_total", result="miss")
+        except socket.gaierror as err:
+            self.metrics.inc("dns_lookups_total", result="failure")
+            if err.errno not in NEGATIVE_ERRORS:
+                # a temporary failure is looked up again by next connection
+                with self.lock:
+                    self.pending.pop(host).set()
+                raise
+            entry = (time.monotonic() + self.negative_ttl_secs, None, err)
+        except BaseException:
+            # an invalid hostname Eg. a too long label isn't cached, so that it's error is raised every time
+            with self.lock:
+                self.pending.pop(host).set()
+            raise
+        self.metrics.observe("dns_lookup_seconds", time.perf_counter() - start)
+        with self.lock:
+            self.entries[host] = entry
+            self.entries.move_to_end(host)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.pending.pop(host).set()
+        return entry
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """
+        Resolves hostnames like socket.getaddrinfo, through cache. Lookups which aren't for a stream connection to a
+        hostname are passed to resolver as they are. Parameters and output are same as of socket.getaddrinfo.
+        """
+        if isinstance(host, bytes):
+            host = host.decode("idna")
+        if (not host or type not in (0, socket.SOCK_STREAM) or proto not in (0, socket.IPPROTO_TCP)
+                or (port is not None and not str(port).isdigit()) or flags & socket.AI_NUMERICHOST):
+            return self.resolver(host, port, family, type, proto, flags)
+        expiry, addresses, error = self.__lookup(host.lower())
+        if error is not None:
+            raise error
+        port = int(port or 0)
+        results = [
+            (address_family, socket_type, protocol, canonical_name, (address[0], port, *address[2:]))
+            for address_family, socket_type, protocol, canonical_name, address in addresses
+            if family in (0, address_family) and address_family in (socket.AF_INET, socket.AF_INET6)
+        ]
+        if len(results) == 0:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return results
+
+    def is_unresolvable(self, link):
+        """
+        Checks whether host of a link failed to resolve recently. It never looks up a host.
+
+        Parameters:
+            link(str): A hyperlink.
+
+        Returns:
+            unresolvable(bool): True if host was found not to exist within negative TTL, else False.
+        """
+        host = get_hostname(link)
+        with self.lock:
+            entry = self.entries.get(host)
+            return entry is not None and entry[2] is not None and entry[0] > time.monotonic()
+
+    def prefetch(self, links):
+        """
+        Resolves hosts of links in background, which aren't cached or being looked up yet.
+
+        Parameters:
+            links(list): Hyperlinks whose hosts will be visited later.
+        """
+        hosts = {get_hostname(link) for link in links}
+        now = time.monotonic()
+        with self.lock:
+            hosts = [host for host in hosts if host and host not in self.pending
+                     and (host not in self.entries or self.entries[host][0] <= now)]
+            if len(hosts) > 0 and self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.prefetch_workers, thread_name_prefix="dns")
+        for host in hosts:
+            self.executor.submit(self.__prefetch, host)
+        if hosts:
+            self.metrics.inc("dns_prefetches_total", len(hosts))
+
+    def __prefetch(self, host):
+        """ Looks up a host in background, errors are kept in cache only. """
+        try:
+            self.__lookup(host)
+        except Exception:
+            pass
+
+
+class CachedResolution:
+    """
+    Mixin of a connection of urllib3 whose host is resolved through a DNS cache, or through resolver of operating
+    system if there's no cache. Addresses are tried in order until one connects, like urllib3 does. urllib3 connects to
+    an address without looking it up, and host of request and of TLS stays the hostname. Time of resolution and of
+    connection are recorded as dns and connect stages.
+    """
+    dns = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        resolver = self.dns.getaddrinfo if self.dns is not None else socket.getaddrinfo
+        crawl_metrics = metrics.get_metrics()
+        start = time.perf_counter()
+        try:
+            addresses = resolver(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as err:
+            raise NewConnectionError(self, f"Failed to resolve {host}: {err}") from err
+        crawl_metrics.observe("stage_seconds", time.perf_counter() - start, stage="dns")
+        error = None
+        try:
+            for address in dict.fromkeys(address_info[4][0] for address_info in addresses):
+                self._dns_host = address
+                start = time.perf_counter()
+                try:
+                    connection = super()._new_conn()
+                except ConnectTimeoutError as err:
+                    # NewConnectionError is a ConnectTimeoutError too
+                    error = err
+                    continue
+                crawl_metrics.observe("stage_seconds", time.perf_counter() - start, stage="connect")
+                return connection
+        finally:
+            self._dns_host = host
+        raise error
+
+
+class CachedHTTPConnection(CachedResolution, HTTPConnection):
+    pass
+
+
+class CachedHTTPSConnection(CachedResolution, HTTPSConnection):
+    pass
+
+
+class CachedHTTPConnectionPool(HTTPConnectionPool):
+    """ Pool of connections of a host which are resolved through a DNS cache. """
+    ConnectionCls = CachedHTTPConnection
+
+    def __init__(self, *args, dns=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns = dns
+
+    def _new_conn(self):
+        connection = super()._new_conn()
+        connection.dns = self.dns
+        return connection
+
+
+class CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    """ Pool of TLS connections of a host which are resolved through a DNS cache. """
+    ConnectionCls = CachedHTTPSConnection
+
+    def __init__(self, *args, dns=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns = dns
+
+    def _new_conn(self):
+        connection = super()._new_conn()
+        connection.dns = self.dns
+        return connection
+
+
+class DNSCacheAdapter(HTTPAdapter):
+    """
+    Adapter of requests whose connections resolve hosts through a DNS cache, so only it's session uses cache. Without a
+    cache, it still records time of resolution and of connection.
+    """
+    def __init__(self, dns, **kwargs):
+        """
+        Initializer for DNSCacheAdapter object.
+
+        Parameters:
+            dns(DNSCache): Cache which resolves hosts, or None to resolve them with resolver of operating system.
+            kwargs: Arguments of HTTPAdapter Eg. pool_maxsize.
+        """
+        self.dns = dns
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": functools.partial(CachedHTTPConnectionPool, dns=self.dns),
+            "https": functools.partial(CachedHTTPSConnectionPool, dns=self.dns),
+        }
+
+
+_dns_cache = None
+_dns_cache_lock = Lock()
+
+
+def get_dns_cache():
+    """
+    Returns DNS cache configured from configuration file, which is shared by whole process, or None if it's disabled.
+    """
+    global _dns_cache
+    with _dns_cache_lock:
+        if _dns_cache is None and read_config()["enabled"]:
+            _dns_cache = DNSCache.from_config()
+        return _dns_cache
+
+
+def benchmark(count=10000, hosts=100, latency_ms=5):
+    """
+    Micro-benchmark of lookups through cache against a stub resolver with fixed latency, without network access.
+
+    Parameters:
+        count(int): Count of lookups.
+        hosts(int): Count of distinct hosts among lookups, every tenth of them doesn't resolve.
+        latency_ms(int): Latency of every lookup of stub resolver.
+    """
+    def stub_resolver(host, port, family=0, type=0, proto=0, flags=0):
+        time.sleep(latency_ms / 1000)
+        number = int(host.split(".")[0][4:])
+        if number % 10 == 0:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (f"10.0.0.{number % 250}", port or 0))]
+
+    cache = DNSCache(resolver=stub_resolver)
+    links = [f"http://host{index % hosts}.example/page" for index in range(count)]
+    start = time.perf_counter()
+    cache.prefetch(links)
+    cache.executor.shutdown(wait=True)
+    print(f"prefetch of {hosts} hosts: {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    failures = 0
+    for link in links:
+        if cache.is_unresolvable(link):
+            failures += 1
+            continue
+        cache.getaddrinfo(get_hostname(link), 443, 0, socket.SOCK_STREAM)
+    seconds = time.perf_counter() - start
+    print(f"cached: {seconds / count * 1e6:.2f} us per lookup, {failures} lookups skipped as unresolvable, "
+          f"uncached: {latency_ms * 1000} us per lookup")
+
+
+if __name__ == "__main__":
+    benchmark()
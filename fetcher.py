@@ -1,38 +1,106 @@
 import configparser
+import os
+import socket
+import threading
+import time
 from datetime import datetime, timedelta
-from threading import Lock
 
 
-from db import CrawlerDBHandler
+import checkpoint
+import db
+import metrics
+import politeness
 
 
 class LinkFetcher:
     """
-    It works as fetcher and distributor for links among various crawling threads.
+    It works as fetcher and distributor for links among various crawling threads. Links are kept in a bounded
+    host-aware frontier which is refilled from the database in background whenever it drops below the low-water mark,
+    so crawlers never wait for a whole batch to finish. Links are handed out in rotation across hosts within per-host
+    limits of politeness. Rows are claimed atomically with a lease in the database, so many crawling processes on
+    different machines can share a database without visiting a link twice.
     """
     def __init__(self):
         """ Initializer for LinkFetcher object. """
         self.config = LinkFetcher.read_config()
-        self.refresh_after = self.config['link_refresh_after_hrs']
-        self.links = list()
-        self.lock = Lock()
-        self.db_handler = CrawlerDBHandler()
+        self.low_water_mark = self.config['low_water_mark']
+        self.lease_secs = self.config['lease_secs']
+        self.worker_id = self.config['worker_id'] or f"{socket.gethostname()}-{os.getpid()}"[:64]
+        # each process claims only links of hosts in it's own partition, if there is more than one partition
+        self.partition = (self.config['partition_index'], self.config['partition_count'])
+        politeness_config = politeness.read_config()
+        self.links = politeness.HostFrontier(
+            maxsize=self.config['queue_size'],
+            max_concurrency=politeness_config['host_max_concurrency'],
+            rate=float(politeness_config['host_requests_per_sec']),
+            burst=politeness_config['host_burst'],
+            robots=politeness.get_robots_cache()
+        )
+        self.db_handler = db.create_handler()
+        self.metrics = metrics.get_metrics()
+        self.renewed_at = time.monotonic()
+        self.refill_thread = None
+        self.stopped = threading.Event()
+        # rows handed out by get method whose visit isn't finished yet, by their id
+        self.in_flight = dict()
+        self.in_flight_lock = threading.Lock()
         del self.config
 
     def count(self):
-        """ Returns the count of links currently available in list. """
-        return len(self.links)
+        """ Returns the count of links currently available in queue. """
+        return self.links.qsize()
+
+    def defer(self, link, seconds):
+        """
+        Stops handing out links of host of a link for a while.
+
+        Parameters:
+            link(str): A link of host Eg. whose response asked to retry later.
+            seconds(float): Seconds for which links of host aren't handed out.
+        """
+        self.links.defer(politeness.get_host(link), seconds)
+
+    def done(self, link_row, finished=True):
+        """
+        Must be called after visit of a link returned by get method is completed, so that more links of it's host can
+        be handed out.
 
-    def pop(self):
+        Parameters:
+            link_row(dict): A row returned by get method.
+            finished(bool): Was the visit finished? An unfinished row is returned by drain method on shutdown.
         """
-        Returns a link tuple at 0th index.
-        NOTE: Don't forget to call release_lock method after calling this method as it acquires lock. If lock is not
-        released then execution may can end up in racing state.
+        if finished:
+            with self.in_flight_lock:
+                self.in_flight.pop(link_row['id'], None)
+        self.links.done(link_row)
+
+    def drain(self):
+        """
+        Empties the queue on shutdown. Must be called after crawlers are stopped.
+
+        Returns:
+            rows(list): Rows waiting in queue and rows handed out whose visit wasn't finished.
+        """
+        with self.in_flight_lock:
+            rows = list(self.in_flight.values())
+            self.in_flight.clear()
+        return rows + self.links.drain()
+
+    def get(self, timeout=None):
         """
-        self.lock.acquire(timeout=5)
-        if len(self.links) == 0:
-            return None
-        return self.links.pop()
+        Returns next link row from queue which can be visited now without exceeding limits of it's host.
+
+        Parameters:
+            timeout(float): Seconds to wait for a link if none can be visited now. If None, it doesn't wait.
+
+        Returns:
+            link_row(dict): A row from table links with column name as keys or None if no link can be visited.
+        """
+        link_row = self.links.get(timeout=timeout)
+        if link_row is not None:
+            with self.in_flight_lock:
+                self.in_flight[link_row['id']] = link_row
+        return link_row
 
     @staticmethod
     def read_config():
@@ -52,18 +120,132 @@ class LinkFetcher:
                 config.update({key: val})
         return config
 
+    def refill(self, sleep_interval):
+        """
+        Keeps the queue filled with links from database until fetcher is stopped. Runs in a background thread.
+
+        Parameters:
+            sleep_interval(int): Seconds to wait before checking database again when all links are crawled.
+        """
+        while not self.stopped.is_set():
+            # leases are renewed well before they expire, as links may wait in queue longer than a lease Eg. behind
+            # rate limit of their host
+            if time.monotonic() - self.renewed_at >= self.lease_secs / 3:
+                self.renew()
+            if self.count() >= self.low_water_mark:
+                time.sleep(0.1)
+                continue
+            if self.refresh() == 0:
+                with self.in_flight_lock:
+                    visiting = len(self.in_flight)
+                if self.count() == 0 and visiting == 0:
+                    print("All links crawled.")
+                    self.stopped.wait(sleep_interval)
+                else:
+                    # visits in progress add new links within moments, so database is checked again shortly instead
+                    # of in a tight loop
+                    self.stopped.wait(0.1)
+
     def refresh(self):
-        """ Refreshes or updates new links in the list from database. """
-        unvisited = self.db_handler.get_unvisited()
-        self.links.extend(unvisited)
-        unrefreshed = self.db_handler.get_unrefreshed(
-            from_dt=datetime.now() - timedelta(hours=self.refresh_after)
-        )
-        self.links.extend(unrefreshed)
+        """
+        Refreshes or updates new links in the queue from database. Rows are claimed with a lease in the database, so
+        they aren't handed out again to this or any other process while they're waiting in queue or being visited.
 
-    def release_lock(self):
+        Returns:
+            count(int): Count of links added into queue.
         """
-        This method must be called after pop method to release the acquired lock. Else, execution may get stand still
-        (single-thread) or in racing condition(multi-thread).
+        free_slots = self.links.maxsize - self.count()
+        lease_expiry = datetime.now() + timedelta(seconds=self.lease_secs)
+        rows = self.db_handler.claim_unvisited(lease_expiry, self.worker_id, limit=free_slots,
+                                               partition=self.partition)
+        free_slots -= len(rows)
+        if free_slots > 0:
+            rows += self.db_handler.claim_unrefreshed(lease_expiry, self.worker_id, limit=free_slots,
+                                                      partition=self.partition)
+        return self.__put(rows)
+
+    def __put(self, rows):
         """
-        self.lock.release()
+        Puts claimed rows into queue, except rows which are already being visited. A row is claimed again by it's own
+        crawler only if it's lease has expired, and then it's visited once.
+
+        Parameters:
+            rows(list): Claimed rows from database.
+
+        Returns:
+            count(int): Count of links added into queue.
+        """
+        with self.in_flight_lock:
+            rows = [row for row in rows if row['id'] not in self.in_flight]
+        for row in rows:
+            self.links.put(row)
+        return len(rows)
+
+    def release(self, rows):
+        """
+        Releases leases of rows which weren't visited, so that other crawling processes can claim them right away
+        instead of waiting for their leases to expire.
+
+        Parameters:
+            rows(list): Rows returned by drain method.
+
+        Returns:
+            count(int): Count of released rows.
+        """
+        released = self.db_handler.release([row['id'] for row in rows], self.worker_id)
+        if released:
+            print("Unvisited links released:", released)
+        return released
+
+    def renew(self):
+        """
+        Renews leases of rows waiting in queue or being visited. Rows of other crawlers whose lease expired, Eg. of a
+        crashed process, need no reclaiming, they're claimable again as soon as their lease expires.
+        """
+        self.renewed_at = time.monotonic()
+        with self.in_flight_lock:
+            row_ids = list(self.in_flight)
+        row_ids += self.links.queued()
+        if row_ids:
+            lease_expiry = datetime.now() + timedelta(seconds=self.lease_secs)
+            renewed = self.db_handler.renew(row_ids, lease_expiry, self.worker_id)
+            self.metrics.inc("leases_renewed_total", renewed)
+
+    def restore(self, row_ids):
+        """
+        Claims rows of a checkpoint again and puts them into queue, so that crawl resumes with the same frontier.
+        Rows already visited or claimed by another process since the checkpoint, or of another partition Eg. after
+        PARTITION_INDEX was changed, are skipped.
+
+        Parameters:
+            row_ids(list): Ids of rows in queue when checkpoint was saved.
+
+        Returns:
+            count(int): Count of links added into queue.
+        """
+        lease_expiry = datetime.now() + timedelta(seconds=self.lease_secs)
+        rows = self.db_handler.claim_ids(row_ids[:self.links.maxsize], lease_expiry, self.worker_id,
+                                         partition=self.partition)
+        count = self.__put(rows)
+        print("Frontier restored from checkpoint:", count)
+        return count
+
+    def start(self, sleep_interval):
+        """
+        Starts background refilling of the queue, after restoring frontier of a checkpoint if crawl is resumed.
+
+        Parameters:
+            sleep_interval(int): Seconds to wait before checking database again when all links are crawled.
+        """
+        state = checkpoint.load(self.db_handler)
+        if state is not None and state['frontier']:
+            self.restore(state['frontier'])
+        self.stopped.clear()
+        self.refill_thread = threading.Thread(target=self.refill, args=(sleep_interval,), daemon=True)
+        self.refill_thread.start()
+
+    def stop(self):
+        """ Stops background refilling of the queue. """
+        self.stopped.set()
+        if self.refill_thread is not None:
+            self.refill_thread.join()
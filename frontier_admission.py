@@ -0,0 +1,274 @@
+# standard python package
+import configparser
+import re
+import time
+from collections import Counter
+from threading import Lock
+
+# local packages
+import metrics
+
+# host, path and query of a normalized absolute link, which is cheaper to match than urlsplit
+LINK_RE = re.compile(r"[a-z][a-z0-9+.-]*://([^/?#]*)([^?#]*)(?:\?([^#]*))?", re.IGNORECASE)
+# runs of digits in a path or in names of query parameters, which differ between pages of a same pattern Eg. dates
+DIGITS_RE = re.compile(r"\d+")
+
+
+def read_config():
+    """
+    Reads configuration of admission of links into frontier.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("admission"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+class FrontierAdmission:
+    """
+    Rejects newly found links which are likely part of a crawler trap, before they're inserted into database. A link
+    is rejected for it's own shape, when it's too deep, it's path is too long or repeats a segment Eg. of a relative
+    link resolved again and again, or it has too many query parameters. Otherwise it's counted against budgets of
+    it's host, of it's pattern and of it's path, and rejected once any of them is spent. Pattern of a link is it's host
+    along with it's path and names of query parameters with digits replaced, so that Eg. every day of a calendar shares
+    one pattern, and every query of a same path is counted against it's path, so that combinations of filters or sort
+    orders can't explode. A limit or budget of 0 is unlimited.
+
+    Counts are kept in memory of a process only for links inserted into database, and are saved into checkpoint along
+    with seen filter.
+    """
+    def __init__(self, max_depth=0, max_path_segments=0, max_path_repeat=0, max_query_params=0, host_budget=0,
+                 pattern_budget=0, query_budget=0):
+        """
+        Initializer for FrontierAdmission object.
+
+        Parameters:
+            max_depth(int): Maximum count of links followed from base url to reach a link.
+            max_path_segments(int): Maximum count of segments of path of a link.
+            max_path_repeat(int): Maximum count of occurrences of a same segment in path of a link.
+            max_query_params(int): Maximum count of query parameters of a link.
+            host_budget(int): Count of links admitted per host.
+            pattern_budget(int): Count of links admitted per pattern.
+            query_budget(int): Count of links with a query admitted per path.
+        """
+        self.max_depth = max_depth
+        self.max_path_segments = max_path_segments
+        self.max_path_repeat = max_path_repeat
+        self.max_query_params = max_query_params
+        self.budgets = {"host": host_budget, "pattern": pattern_budget, "query": query_budget}
+        # kind of budget as key and counts of admitted links by their key as value
+        self.counts = {kind: Counter() for kind in self.budgets}
+        self.lock = Lock()
+        self.metrics = metrics.get_metrics()
+
+    @classmethod
+    def from_config(cls):
+        """ Creates admission of links configured from configuration file. """
+        config = read_config()
+        return cls(
+            max_depth=config["max_depth"],
+            max_path_segments=config["max_path_segments"],
+            max_path_repeat=config["max_path_repeat"],
+            max_query_params=config["max_query_params"],
+            host_budget=config["host_budget"],
+            pattern_budget=config["pattern_budget"],
+            query_budget=config["query_budget"]
+        )
+
+    def __getstate__(self):
+        """ Returns state without it's lock and metrics, so it can be pickled into a checkpoint. """
+        with self.lock:
+            state = self.__dict__.copy()
+            state.pop("lock")
+            state.pop("metrics")
+            state["counts"] = {kind: Counter(counts) for kind, counts in self.counts.items()}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+        self.metrics = metrics.get_metrics()
+
+    def restore(self, admission):
+        """
+        Continues counts of admitted links of an admission restored from checkpoint, with limits and budgets of this
+        one, so that configuration can be changed between runs.
+
+        Parameters:
+            admission(FrontierAdmission): Admission restored from checkpoint.
+        """
+        with self.lock:
+            self.counts = {kind: admission.counts.get(kind, Counter()) for kind in self.budgets}
+
+    def check_shape(self, path, query, depth):
+        """
+        Checks a link against limits which don't depend on other links.
+
+        Parameters:
+            path(str): Path of link.
+            query(str): Query of link, empty if it has none.
+            depth(int): Count of links followed from base url to reach the link.
+
+        Returns:
+            reason(str): Reason of rejection, or None if link is acceptable.
+        """
+        if 0 < self.max_depth < depth:
+            return "depth"
+        segments = [segment for segment in path.split("/") if segment]
+        if 0 < self.max_path_segments < len(segments):
+            return "path_segments"
+        if self.max_path_repeat > 0 and len(segments) > self.max_path_repeat and \
+                max(Counter(segments).values()) > self.max_path_repeat:
+            return "path_repeat"
+        if self.max_query_params > 0 and query and query.count("&") + 1 > self.max_query_params:
+            return "query_params"
+        return None
+
+    @staticmethod
+    def budget_keys(host, path, query):
+        """
+        Returns keys of a link for every kind of budget.
+
+        Parameters:
+            host(str): Host of link.
+            path(str): Path of link.
+            query(str): Query of link, empty if it has none.
+
+        Returns:
+            keys(dict): Kind of budget as key and key of link as value, None if budget doesn't apply to link.
+        """
+        host = host.lower()
+        # digits of host aren't replaced, as Eg. site1.example and site2.example are different sites
+        if query:
+            names = sorted({param.split("=", 1)[0] for param in query.split("&") if param})
+            pattern = host + DIGITS_RE.sub("0", f"{path}?{'&'.join(names)}")
+        else:
+            pattern = host + DIGITS_RE.sub("0", path)
+        return {
+            "host": host,
+            "pattern": pattern,
+            "query": f"{host}{path}" if query else None,
+        }
+
+    def __link_keys(self, link):
+        """ Returns host, path and query of a link, or None if it isn't a normalized absolute link. """
+        match = LINK_RE.match(link)
+        if match is None:
+            return None
+        host, path, query = match.group(1, 2, 3)
+        return host, path, query or ""
+
+    def admit(self, links, depth):
+        """
+        Filters links which may be admitted into frontier. Budgets aren't spent until admitted links are inserted into
+        database and passed to commit, but links of a same call are counted together, so that a single webpage can't
+        overrun a budget. Links are admitted in their given order, so best links should come first.
+
+        Parameters:
+            links(list): Newly found links, which aren't present in database.
+            depth(int): Count of links followed from base url to reach the links.
+
+        Returns:
+            admitted(list): Links which are admitted.
+        """
+        admitted = list()
+        rejected = Counter()
+        # links admitted by this call, which aren't committed yet
+        pending = {kind: Counter() for kind in self.budgets}
+        with self.lock:
+            for link in links:
+                parts = self.__link_keys(link)
+                if parts is None:
+                    rejected["invalid"] += 1
+                    continue
+                host, path, query = parts
+                reason = self.check_shape(path, query, depth)
+                if reason is None:
+                    keys = self.budget_keys(host, path, query)
+                    for kind, key in keys.items():
+                        budget = self.budgets[kind]
+                        if key is not None and 0 < budget <= self.counts[kind][key] + pending[kind][key]:
+                            reason = kind
+                            break
+                if reason is not None:
+                    rejected[reason] += 1
+                    continue
+                for kind, key in keys.items():
+                    if key is not None and self.budgets[kind] > 0:
+                        pending[kind][key] += 1
+                admitted.append(link)
+        for reason, count in rejected.items():
+            self.metrics.inc("links_rejected_total", count, reason=reason)
+        return admitted
+
+    def commit(self, links):
+        """
+        Counts links inserted into database against their budgets.
+
+        Parameters:
+            links(list): Admitted links which were newly inserted.
+        """
+        with self.lock:
+            for link in links:
+                parts = self.__link_keys(link)
+                if parts is None:
+                    continue
+                for kind, key in self.budget_keys(*parts).items():
+                    if key is not None and self.budgets[kind] > 0:
+                        self.counts[kind][key] += 1
+                        if self.counts[kind][key] == self.budgets[kind]:
+                            print(f"Budget of {kind} spent, further links are rejected:", key)
+
+
+_admission = None
+_admission_lock = Lock()
+
+
+def get_admission():
+    """
+    Returns admission of links configured from configuration file, which is shared by whole process, or None if it's
+    disabled.
+    """
+    global _admission
+    with _admission_lock:
+        if _admission is None and read_config()["enabled"]:
+            _admission = FrontierAdmission.from_config()
+        return _admission
+
+
+def benchmark(count=100000):
+    """
+    Micro-benchmark of admission of generated links, a half of which belong to traps.
+
+    Parameters:
+        count(int): Count of links.
+    """
+    admission = FrontierAdmission(max_depth=20, max_path_segments=12, max_path_repeat=3, max_query_params=6,
+                                  host_budget=0, pattern_budget=1000, query_budget=500)
+    links = list()
+    for number in range(count // 4):
+        links.append(f"https://site{number % 50}.example/articles/{number}-title")
+        links.append(f"https://site{number % 50}.example/section{number % 20}/page{number}.html")
+        links.append(f"https://calendar.example/events/{2000 + number // 365}/{number % 12 + 1}/{number % 28 + 1}")
+        links.append(f"https://shop.example/list?sort={number % 7}&color={number % 11}&size={number}")
+    links.append("https://site0.example/a/b/a/b/a/b/a/b")
+    links.append("https://site0.example/" + "/".join(f"level{level}" for level in range(20)))
+    start = time.perf_counter()
+    admitted = admission.admit(links, depth=3)
+    admission.commit(admitted)
+    seconds = time.perf_counter() - start
+    print(f"{seconds / len(links) * 1e6:.2f} us per link, admitted: {len(admitted)} of {len(links)}")
+    for kind, counts in admission.counts.items():
+        print(f"  {kind}: {len(counts)} keys counted")
+
+
+if __name__ == "__main__":
+    benchmark()
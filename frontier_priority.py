@@ -0,0 +1,90 @@
+# standard python package
+import configparser
+import importlib
+
+# local packages
+import url_normalizer
+from politeness import get_host
+
+
+class DepthSiteScorer:
+    """
+    Default scorer of links. Links closer to the base url are crawled first and links of other sites than the base
+    url are delayed by a penalty. Lower score is crawled first.
+    """
+    def __init__(self, base_url, depth_weight, offsite_penalty):
+        """
+        Initializer for DepthSiteScorer object.
+
+        Parameters:
+            base_url(str): The url from which crawling started.
+            depth_weight(int): Score added per link followed from the base url.
+            offsite_penalty(int): Score added to a link of other site than base url.
+        """
+        self.base_host = get_host(url_normalizer.get_normalizer().normalize(base_url) or base_url)
+        self.depth_weight = depth_weight
+        self.offsite_penalty = offsite_penalty
+
+    def score(self, link, depth, src_link):
+        """
+        Scores a newly found link.
+
+        Parameters:
+            link(str): A newly found link.
+            depth(int): Count of links followed from base url to reach the link.
+            src_link(str): A hyperlink of webpage from which link was extracted.
+
+        Returns:
+            priority(int): Priority of link, lower is crawled first.
+        """
+        priority = depth * self.depth_weight
+        if get_host(link) != self.base_host:
+            priority += self.offsite_penalty
+        return priority
+
+
+def read_config():
+    """
+    Reads configuration of frontier.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("frontier"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    config["base_url"] = config_parser.get("setting", "base_url")
+    return config
+
+
+def create_scorer(config):
+    """
+    Creates scoring function of links. A custom function can be plugged in as "module:function", which takes a link,
+    it's depth and it's source link and returns an integer priority.
+
+    Parameters:
+        config(dict): Configuration of frontier.
+
+    Returns:
+        score(function): A scoring function.
+    """
+    if config["scorer"] == "default":
+        return DepthSiteScorer(config["base_url"], config["depth_weight"], config["offsite_penalty"]).score
+    module_name, function_name = config["scorer"].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+_scorer = None
+
+
+def get_scorer():
+    """ Returns scoring function configured from configuration file, which is shared by whole process. """
+    global _scorer
+    if _scorer is None:
+        _scorer = create_scorer(read_config())
+    return _scorer
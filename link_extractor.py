@@ -0,0 +1,196 @@
+# standard python package
+import configparser
+import html
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+# global imports
+import bs4
+
+# local packages
+import page_store
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+class LinkExtractor:
+    """
+    Interface of backends which extract hyperlinks from a html webpage. A backend only needs to yield href values of
+    <a> and <base> tags, resolution of <base href> is common for all backends.
+    """
+    def iter_tags(self, webpage):
+        """
+        Yields href values of <a> and <base> tags in order of their occurrence.
+
+        Parameters:
+            webpage(str): A text content of downloaded html page.
+
+        Returns:
+            (tag_name, href)(generator): Lowercase name of a tag and value of it's href attribute.
+        """
+        raise NotImplementedError
+
+    def extract(self, webpage, src_link):
+        """
+        Extracts hyperlinks from a webpage along with the link against which each of them should be resolved. The
+        first <base href> of a webpage replaces src_link for resolution of links.
+
+        Parameters:
+            webpage(str): A text content of downloaded html page.
+            src_link(str): A text of hyperlink from which a webpage is download.
+
+        Returns:
+            (href, base_link)(generator): An unvalidated link and a link to resolve it against.
+        """
+        base_link = src_link
+        has_base = False
+        for tag_name, href in self.iter_tags(webpage):
+            if tag_name == "a":
+                yield href, base_link
+            elif not has_base:
+                base_link = urljoin(src_link, href.strip())
+                has_base = True
+
+
+class StreamingExtractor(LinkExtractor):
+    """
+    Lightweight backend which tokenizes a webpage with a single precompiled pattern and emits hrefs as it goes,
+    without building any tree. Comments and contents of <script> and <style> tags are skipped. Attributes of a tag are
+    tokenized one by one, so that Eg. href= within a quoted value of another attribute isn't taken for a link.
+    """
+    TOKEN = re.compile(
+        r"""<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(a|base)\s((?:[^>"']|"[^"]*"|'[^']*')*)>""",
+        re.IGNORECASE | re.DOTALL
+    )
+    # attributes of a tag up to it's first href attribute, every attribute is a name and an optional value, which is
+    # double or single quoted or unquoted, so that a value is never searched for href
+    HREF = re.compile(
+        r"""\s*(?:[^\s/>][^\s/>=]*(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>"'][^\s>]*))?[\s/]+)*?"""
+        r"""href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]*))""",
+        re.IGNORECASE
+    )
+
+    def iter_tags(self, webpage):
+        for token in StreamingExtractor.TOKEN.finditer(webpage):
+            tag_name = token.group(2)
+            if tag_name is None:
+                continue
+            href = StreamingExtractor.HREF.match(token.group(3))
+            if href is None:
+                continue
+            value = href.group(1) if href.group(1) is not None else href.group(2)
+            if value is None:
+                value = href.group(3)
+            yield tag_name.lower(), html.unescape(value) if "&" in value else value
+
+
+class LxmlExtractor(LinkExtractor):
+    """ Backend which parses a webpage with lxml. It requires optional lxml package. """
+    def __init__(self):
+        """ Initializer for LxmlExtractor object. """
+        if lxml is None:
+            raise ImportError("lxml package is required for lxml link extractor.")
+
+    def iter_tags(self, webpage):
+        try:
+            document = lxml.html.document_fromstring(webpage)
+        except (ValueError, lxml.etree.ParserError):
+            return
+        for element in document.iter("a", "base"):
+            href = element.get("href")
+            if href is not None:
+                yield element.tag, href
+
+
+class BeautifulSoupExtractor(LinkExtractor):
+    """ Fallback backend which builds a full tree of a webpage with BeautifulSoup. """
+    def iter_tags(self, webpage):
+        soup = bs4.BeautifulSoup(webpage, "html.parser")
+        for tag in soup.find_all(["a", "base"]):
+            try:
+                yield tag.name, tag["href"]
+            except KeyError:
+                continue
+
+
+BACKENDS = {
+    "streaming": StreamingExtractor,
+    "lxml": LxmlExtractor,
+    "bs4": BeautifulSoupExtractor,
+}
+
+_extractor = None
+
+
+def read_config():
+    """
+    Reads configuration of link extractor.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    return dict(config_parser.items("extractor"))
+
+
+def create_extractor(backend):
+    """
+    Creates link extractor of specified backend. It falls back to BeautifulSoup if backend isn't available.
+
+    Parameters:
+        backend(str): Name of backend. Options: streaming, lxml or bs4.
+
+    Returns:
+        extractor(LinkExtractor): A link extractor.
+    """
+    try:
+        return BACKENDS[backend]()
+    except (KeyError, ImportError) as err:
+        print("Link extractor", backend, "is not available:", err, "- using bs4")
+        return BeautifulSoupExtractor()
+
+
+def get_extractor():
+    """ Returns link extractor configured from configuration file, which is shared by whole process. """
+    global _extractor
+    if _extractor is None:
+        _extractor = create_extractor(read_config()["backend"])
+    return _extractor
+
+
+def benchmark(html_dir):
+    """
+    Compares parsing speed of available backends over webpages saved in page store of a directory.
+
+    Parameters:
+        html_dir(str): A path of directory where html pages are stored.
+    """
+    store = page_store.get_store(html_dir)
+    pages = [content.decode("utf-8", errors="replace") for content in store.iter_contents()]
+    if len(pages) == 0:
+        print("No webpages found in", html_dir)
+        return
+    size = sum(len(page) for page in pages) / 2 ** 20
+    print(f"{len(pages)} webpages, {size:.1f} MB")
+    for backend, extractor_class in BACKENDS.items():
+        try:
+            extractor = extractor_class()
+        except ImportError as err:
+            print(f"{backend}: skipped, {err}")
+            continue
+        link_count = 0
+        start = time.perf_counter()
+        for page in pages:
+            link_count += sum(1 for _ in extractor.extract(page, "http://localhost/"))
+        seconds = time.perf_counter() - start
+        print(f"{backend}: {len(pages) / seconds:.1f} pages/s, {size / seconds:.2f} MB/s, {link_count} links")
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "html_pgs")
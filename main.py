@@ -1,6 +1,8 @@
+# standard python package
+import configparser
+
 # Local Imports
 from crawler import WebCrawler
-from thread_manager import ThreadManager
 
 
 # to carry out some initialization tasks
@@ -8,6 +10,17 @@ crawler = WebCrawler()
 crawler.setup()
 del crawler
 
-# Multi-threading crawling
-crawl_threads = ThreadManager()
-crawl_threads.execute()
+# selection of crawl engine
+config_parser = configparser.ConfigParser()
+config_parser.read("config.cfg")
+engine = config_parser.get("manager", "engine", fallback="thread")
+
+if engine == "async":
+    # Asynchronous crawling over a single event loop
+    from async_manager import AsyncManager
+    crawl_manager = AsyncManager()
+else:
+    # Multi-threading crawling
+    from thread_manager import ThreadManager
+    crawl_manager = ThreadManager()
+crawl_manager.execute()
@@ -0,0 +1,374 @@
+# standard python package
+import bisect
+import configparser
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# all metrics are exposed with this prefix
+PREFIX = "crawler_"
+
+
+def read_config():
+    """
+    Reads configuration of metrics.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("metrics"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+class Histogram:
+    """
+    Histogram of latencies with fixed buckets, so an observation costs a binary search and an increment, and memory
+    doesn't grow with count of observations. Quantiles are estimated from buckets.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Initializer for Histogram object.
+
+        Parameters:
+            buckets(tuple): Sorted upper bounds of buckets in seconds. Larger values fall into an overflow bucket.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """ Records a value in seconds. """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by interpolating linearly within it's bucket, like histogram_quantile of Prometheus.
+
+        Parameters:
+            q(float): A quantile between 0 and 1 Eg. 0.99
+
+        Returns:
+            value(float): Estimated value in seconds or None if nothing was observed.
+        """
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count > 0 and cumulative + bucket_count >= rank:
+                if index == len(self.buckets):
+                    # values above largest bucket can't be estimated any closer
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def merge(self, other):
+        """ Adds observations of another histogram with same buckets into this one. """
+        with other.lock:
+            counts, count, total = list(other.counts), other.count, other.sum
+        with self.lock:
+            self.counts = [own + added for own, added in zip(self.counts, counts)]
+            self.count += count
+            self.sum += total
+
+    def since(self, previous):
+        """
+        Returns a histogram of values observed after an earlier copy of this histogram was taken, Eg. latencies of the
+        last few seconds.
+
+        Parameters:
+            previous(Histogram): An earlier copy of this histogram.
+
+        Returns:
+            window(Histogram): A histogram of values observed in between.
+        """
+        window = Histogram(self.buckets)
+        with self.lock:
+            window.counts = [count - previous_count for count, previous_count in zip(self.counts, previous.counts)]
+            window.count = self.count - previous.count
+            window.sum = self.sum - previous.sum
+        return window
+
+    def summary(self):
+        """ Returns count, mean, p50 and p99 of observed values. """
+        with self.lock:
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "mean": round(total / count, 6) if count else None,
+            "p50": Histogram.__round(self.quantile(0.5)),
+            "p99": Histogram.__round(self.quantile(0.99)),
+        }
+
+    @staticmethod
+    def __round(value):
+        return round(value, 6) if value is not None else None
+
+
+class Metrics:
+    """
+    Registry of counters, gauges and latency histograms of a crawling process. Metrics are identified by a name and
+    optional labels Eg. stage="parse". When disabled, every method returns right away, so instrumented code doesn't
+    need to check it.
+    """
+    def __init__(self, enabled=True):
+        """
+        Initializer for Metrics object.
+
+        Parameters:
+            enabled(bool): Should metrics be recorded?.
+        """
+        self.enabled = enabled
+        self.counters = dict()
+        self.gauges = dict()
+        self.histograms = dict()
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.server = None
+        self.log_thread = None
+        self.stopped = threading.Event()
+        # count of pages and time of previous log line, for rate of pages since then
+        self.last_log = (0, self.started_at)
+
+    @staticmethod
+    def __key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def add_gauge(self, name, value, **labels):
+        """ Adds a value (negative to subtract) into a gauge Eg. count of active workers. """
+        if not self.enabled:
+            return
+        key = Metrics.__key(name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def gauge(self, name, function, **labels):
+        """ Registers a gauge whose value is read from a function whenever metrics are exposed Eg. queue depth. """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[Metrics.__key(name, labels)] = function
+
+    def inc(self, name, value=1, **labels):
+        """ Increments a counter. """
+        if not self.enabled:
+            return
+        key = Metrics.__key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, secs, **labels):
+        """ Records a latency in seconds into a histogram. """
+        if not self.enabled:
+            return
+        key = Metrics.__key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.observe(secs)
+
+    def counter(self, name, **labels):
+        """ Returns sum of counters of a name over all their labels which include given labels. """
+        with self.lock:
+            return sum(value for (counter_name, counter_labels), value in self.counters.items()
+                       if counter_name == name and set(labels.items()) <= set(counter_labels))
+
+    def histogram(self, name, **labels):
+        """
+        Returns a copy of histograms of a name merged over all their labels which include given labels Eg. all query
+        types of db_query_seconds. Observations between two copies are given by Histogram.since.
+        """
+        with self.lock:
+            histograms = [histogram for (histogram_name, histogram_labels), histogram in self.histograms.items()
+                          if histogram_name == name and set(labels.items()) <= set(histogram_labels)]
+        merged = Histogram()
+        for histogram in histograms:
+            merged.merge(histogram)
+        return merged
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """ Records time taken by a with block into a histogram. """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def __gauge_values(self):
+        """ Returns current values of all gauges. """
+        with self.lock:
+            gauges = list(self.gauges.items())
+        values = dict()
+        for key, value in gauges:
+            values[key] = value() if callable(value) else value
+        return values
+
+    @staticmethod
+    def __labels(labels, extra=()):
+        """ Formats labels for Prometheus text format Eg. {stage="parse"} """
+        labels = tuple(labels) + tuple(extra)
+        if len(labels) == 0:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+    def render(self):
+        """
+        Renders all metrics in Prometheus text format.
+
+        Returns:
+            text(str): Metrics in text exposition format of Prometheus.
+        """
+        lines = list()
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+        for metric_type, items in (("counter", counters), ("gauge", sorted(self.__gauge_values().items()))):
+            typed = set()
+            for (name, labels), value in items:
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{Metrics.__labels(labels)} {value}")
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                typed.add(name)
+            with histogram.lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{Metrics.__labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{Metrics.__labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{Metrics.__labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Summarizes all metrics, with rate of visited pages since previous snapshot.
+
+        Returns:
+            snapshot(dict): Counters, gauges and summaries of histograms by their name and labels.
+        """
+        now = time.monotonic()
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = dict(self.histograms)
+        pages = sum(value for (name, _), value in counters.items() if name == "pages_total")
+        last_pages, last_time = self.last_log
+        self.last_log = (pages, now)
+        snapshot = {
+            "uptime_secs": round(now - self.started_at, 3),
+            "pages_per_sec": round((pages - last_pages) / max(now - last_time, 1e-9), 3),
+        }
+        for values in (counters, self.__gauge_values()):
+            for (name, labels), value in sorted(values.items()):
+                snapshot[name + Metrics.__labels(labels)] = value
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+            snapshot[name + Metrics.__labels(labels)] = histogram.summary()
+        return snapshot
+
+    def __log(self, interval):
+        """ Prints a JSON line of metrics every interval seconds until stopped. """
+        while not self.stopped.wait(interval):
+            print("metrics:", json.dumps(self.snapshot()))
+
+    def start(self, http_port=0, log_interval=0):
+        """
+        Starts exposing metrics in background threads.
+
+        Parameters:
+            http_port(int): Port of HTTP endpoint /metrics in Prometheus text format. 0 disables it.
+            log_interval(int): Seconds between JSON lines of metrics printed on console. 0 disables it.
+        """
+        if not self.enabled:
+            return
+        self.stopped.clear()
+        if http_port > 0 and self.server is None:
+            self.server = ThreadingHTTPServer(("", http_port), Metrics.__handler(self))
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print("Metrics served at port:", http_port)
+        if log_interval > 0 and self.log_thread is None:
+            self.log_thread = threading.Thread(target=self.__log, args=(log_interval,), daemon=True)
+            self.log_thread.start()
+
+    def stop(self):
+        """ Stops background threads of metrics, printing a final JSON line if logging was enabled. """
+        self.stopped.set()
+        if self.log_thread is not None:
+            self.log_thread.join()
+            self.log_thread = None
+            print("metrics:", json.dumps(self.snapshot()))
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @staticmethod
+    def __handler(metrics):
+        """ Creates handler class of HTTP endpoint serving given metrics. """
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                # scrapes of metrics aren't printed on console
+                pass
+
+        return MetricsHandler
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """ Returns metrics configured from configuration file, which are shared by whole process. """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(enabled=bool(read_config()["enabled"]))
+        return _metrics
+
+
+def start():
+    """ Starts exposing metrics of process as configured in configuration file. """
+    config = read_config()
+    get_metrics().start(http_port=config["http_port"], log_interval=config["log_interval_secs"])
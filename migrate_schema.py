@@ -0,0 +1,111 @@
+# standard python package
+import argparse
+
+# local packages
+import db
+import seen_filter
+
+
+def parent_ids(db_handler, table_name, src_links):
+    """
+    Looks up ids of source links in a table of schema version 1, by it's unique index of links.
+
+    Parameters:
+        db_handler(CrawlerDBHandler): A database handler.
+        table_name(str): Name of table of schema version 1.
+        src_links(list): Source links of rows.
+
+    Returns:
+        ids(dict): Source link as key and it's id as value, for links present in table.
+    """
+    # starting link has no source link
+    src_links = [link for link in set(src_links) if link and link != "NA"]
+    ids = dict()
+    # older SQLite versions allow up to 999 parameters in a query
+    for start in range(0, len(src_links), 500):
+        batch = src_links[start:start + 500]
+        placeholders = ", ".join(["%s"] * len(batch))
+        get_ids = f"SELECT id, link FROM {table_name} WHERE link IN ({placeholders});"
+        result = db_handler.execute(query=get_ids, values=batch, fetch=True)
+        if type(result) == list:
+            ids.update({row['link']: row['id'] for row in result})
+    return ids
+
+
+def migrate(db_handler, batch_size):
+    """
+    Converts links table of schema version 1 to current schema. Rows are copied in batches into a new table with same
+    ids, with hashes of links as their key and source links as edges, then the new table replaces the old one. Old
+    table is kept as {TABLE_NAME}_v1 without it's secondary indexes, as names of indexes are shared by whole database in
+    SQLite.
+
+    Parameters:
+        db_handler(CrawlerDBHandler): A database handler.
+        batch_size(int): Count of rows copied in one batch.
+
+    Returns:
+        migrated(bool): True if table was converted.
+    """
+    version = db_handler.schema_version()
+    if version == 0:
+        print("Table does not exist:", db_handler.TABLE_NAME)
+        return False
+    if version >= db.SCHEMA_VERSION:
+        print("Table already has schema version", version)
+        return False
+    table_name = db_handler.TABLE_NAME
+    new_table_name = f"{table_name}_v{db.SCHEMA_VERSION}"
+    backup_table_name = f"{table_name}_v{version}"
+    columns = db_handler.get_columns()
+    indexes = db_handler.get_indexes()
+    for index in db.CrawlerDBHandler.INDEXES:
+        if index in indexes:
+            db_handler.drop_index(index)
+    db_handler.create_table(new_table_name)
+
+    # columns added to version 1 over time may be missing in an old table, they get their default value
+    select_columns = sorted(column for column in columns if column != "src_link")
+    insert_columns = ["link_hash", *select_columns]
+    for column in ("host_hash", "next_crawl_at"):
+        if column not in columns:
+            insert_columns.append(column)
+    last_id, copied, edges = 0, 0, 0
+    while True:
+        get_rows = f'''SELECT {", ".join(select_columns)}, src_link FROM {table_name}
+        WHERE id > %s ORDER BY id LIMIT {int(batch_size)};'''
+        rows = db_handler.execute(query=get_rows, values=(last_id,), fetch=True)
+        if type(rows) != list or len(rows) == 0:
+            break
+        new_rows = list()
+        for row in rows:
+            row["link_hash"] = seen_filter.url_digest(row['link'])
+            if row.get("host_hash") is None:
+                row["host_hash"] = db.CrawlerDBHandler.host_hash(row['link'])
+            if "next_crawl_at" not in row:
+                # previously visited links become due for refresh right away
+                row["next_crawl_at"] = row['last_crawl_dt']
+            new_rows.append(tuple(row[column] for column in insert_columns))
+        copied += db_handler.insert_rows(new_table_name, insert_columns, new_rows)
+        parents = parent_ids(db_handler, table_name, [row['src_link'] for row in rows])
+        new_edges = [(parents[row['src_link']], row['id']) for row in rows if row['src_link'] in parents]
+        if new_edges:
+            edges += db_handler.insert_rows(db_handler.EDGE_TABLE_NAME, ("parent_id", "child_id"), new_edges)
+        last_id = rows[-1]['id']
+        print(f"Rows copied: {copied}, edges: {edges}")
+
+    db_handler.rename_table(table_name, backup_table_name)
+    db_handler.rename_table(new_table_name, table_name)
+    print(f"Table {table_name} converted to schema version {db.SCHEMA_VERSION}, old table kept as {backup_table_name}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts links table of an older schema to the current schema. "
+                                                 "Crawlers must be stopped while it runs.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="count of rows copied in one batch")
+    args = parser.parse_args()
+    migrate(db.create_handler(), args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# standard python package
+import array
+import configparser
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# markup, scripts, styles and comments aren't visible text of a webpage
+MARKUP_RE = re.compile(r"<(script|style)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>", re.DOTALL | re.IGNORECASE)
+
+FINGERPRINT_BITS = 64
+# a bit of a byte, as one byte per bit value
+BIT_BYTES = [bytes((1 << bit,)) for bit in range(8)]
+
+
+def popcount(value):
+    """ Returns count of set bits of a non-negative integer. """
+    return bin(value).count("1")
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+
+
+def read_config():
+    """
+    Reads configuration of near-duplicate detection.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("near_duplicate"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+def features(html):
+    """
+    Returns hashes of distinct pairs of adjacent words of visible text of a webpage, so that order of words matters and
+    not just it's vocabulary. Hashes are built-in hashes of python, which are cheap but differ between processes, so
+    fingerprints are only compared within a process.
+
+    Parameters:
+        html(str): A html webpage.
+
+    Returns:
+        features(set): 64 bit signed hashes of pairs of words.
+    """
+    words = MARKUP_RE.sub(" ", html).lower().split()
+    return set(map(hash, zip(words, words[1:])))
+
+
+def simhash(page_features):
+    """
+    Computes 64 bit SimHash of features. Similar sets of features get fingerprints which differ in few bits.
+
+    Parameters:
+        page_features(set): 64 bit signed hashes of features of a webpage.
+
+    Returns:
+        fingerprint(int): An unsigned 64 bit fingerprint.
+    """
+    count = len(page_features)
+    digests = array.array("q", page_features).tobytes()
+    # every byte of digests is taken as a column of one integer, so that a bit of every feature is counted by a single
+    # popcount instead of a loop over features for every bit
+    masks = [int.from_bytes(bit_byte * count, "little") for bit_byte in BIT_BYTES]
+    fingerprint = 0
+    for byte in range(FINGERPRINT_BITS // 8):
+        column = int.from_bytes(digests[byte::8], "little")
+        for bit, mask in enumerate(masks):
+            # a bit is set if most features have it set
+            if 2 * popcount(column & mask) > count:
+                fingerprint |= 1 << (8 * byte + bit)
+    return fingerprint
+
+
+class SimHashIndex:
+    """
+    In-memory index of fingerprints of recently stored webpages, which finds a fingerprint within max_distance bits of
+    a given one. Fingerprint is split into max_distance + 1 blocks, and fingerprints within max_distance bits share at
+    least one block with it, so only fingerprints with a common block are compared. Least recently added fingerprints
+    are dropped first, once capacity is reached.
+    """
+    def __init__(self, max_distance=3, capacity=100000):
+        """
+        Initializer for SimHashIndex object.
+
+        Parameters:
+            max_distance(int): Maximum count of differing bits of fingerprints of near-duplicate webpages.
+            capacity(int): Count of fingerprints kept in index.
+        """
+        self.max_distance = max_distance
+        self.capacity = capacity
+        blocks = max_distance + 1
+        bounds = [FINGERPRINT_BITS * block // blocks for block in range(blocks + 1)]
+        # (shift, mask) of every block
+        self.blocks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        # value of a block as key and ids of rows whose fingerprint has it as value, per block
+        self.tables = [dict() for _ in self.blocks]
+        # row id as key and it's fingerprint as value, in order of addition
+        self.fingerprints = OrderedDict()
+        self.lock = Lock()
+
+    def __keys(self, fingerprint):
+        """ Returns value of every block of a fingerprint. """
+        return [(fingerprint >> shift) & mask for shift, mask in self.blocks]
+
+    def __remove(self, row_id):
+        """ Removes fingerprint of a row from index. """
+        fingerprint = self.fingerprints.pop(row_id)
+        for table, key in zip(self.tables, self.__keys(fingerprint)):
+            row_ids = table[key]
+            row_ids.discard(row_id)
+            if len(row_ids) == 0:
+                del table[key]
+
+    def __find(self, fingerprint, exclude):
+        """ Returns id of a row whose fingerprint is within max_distance bits of fingerprint, other than excluded. """
+        for table, key in zip(self.tables, self.__keys(fingerprint)):
+            for row_id in table.get(key, ()):
+                if row_id != exclude and popcount(self.fingerprints[row_id] ^ fingerprint) <= self.max_distance:
+                    return row_id
+        return None
+
+    def find(self, fingerprint, exclude=None):
+        """
+        Finds a near-duplicate of a fingerprint.
+
+        Parameters:
+            fingerprint(int): A fingerprint of a webpage.
+            exclude(int): Id of a row which isn't matched Eg. of webpage being refreshed.
+
+        Returns:
+            row_id(int): Id of row of near-duplicate webpage, or None if there's none.
+        """
+        with self.lock:
+            return self.__find(fingerprint, exclude)
+
+    def add(self, row_id, fingerprint):
+        """
+        Adds fingerprint of a row, replacing it's previous fingerprint.
+
+        Parameters:
+            row_id(int): Id of row of webpage.
+            fingerprint(int): A fingerprint of it's webpage.
+        """
+        with self.lock:
+            self.__add(row_id, fingerprint)
+
+    def __add(self, row_id, fingerprint):
+        """ Adds fingerprint of a row, while lock is held. """
+        if row_id in self.fingerprints:
+            self.__remove(row_id)
+        self.fingerprints[row_id] = fingerprint
+        for table, key in zip(self.tables, self.__keys(fingerprint)):
+            table.setdefault(key, set()).add(row_id)
+        while len(self.fingerprints) > self.capacity:
+            self.__remove(next(iter(self.fingerprints)))
+
+    def check(self, row_id, fingerprint):
+        """
+        Finds a near-duplicate of a webpage, or adds it into index if there's none. Finding and adding is atomic, so
+        out of near-duplicates visited concurrently only one is kept.
+
+        Parameters:
+            row_id(int): Id of row of webpage.
+            fingerprint(int): A fingerprint of it's webpage.
+
+        Returns:
+            row_id(int): Id of row of near-duplicate webpage, or None if webpage was added.
+        """
+        with self.lock:
+            duplicate_of = self.__find(fingerprint, row_id)
+            if duplicate_of is None:
+                self.__add(row_id, fingerprint)
+            return duplicate_of
+
+
+class NearDuplicateDetector:
+    """ Fingerprints downloaded webpages and detects near-duplicates of recently stored ones. """
+    def __init__(self, max_distance=3, index_size=100000, min_features=50):
+        """
+        Initializer for NearDuplicateDetector object.
+
+        Parameters:
+            max_distance(int): Maximum count of differing bits of fingerprints of near-duplicate webpages.
+            index_size(int): Count of recent fingerprints compared with a new webpage.
+            min_features(int): Webpages with fewer pairs of words aren't fingerprinted, as short webpages Eg. error
+                               pages of a site are too similar to tell apart.
+        """
+        self.min_features = min_features
+        self.index = SimHashIndex(max_distance, index_size)
+
+    @classmethod
+    def from_config(cls):
+        """ Creates detector configured from configuration file. """
+        config = read_config()
+        return cls(
+            max_distance=config["max_distance"],
+            index_size=config["index_size"],
+            min_features=config["min_features"]
+        )
+
+    def fingerprint(self, html):
+        """
+        Returns SimHash of a html webpage, or None if it's too short to be fingerprinted.
+        """
+        page_features = features(html)
+        if len(page_features) < self.min_features:
+            return None
+        return simhash(page_features)
+
+    def check(self, row_id, html):
+        """
+        Fingerprints a webpage and finds a near-duplicate of it among recently stored webpages. A webpage without a
+        near-duplicate is added into index.
+
+        Parameters:
+            row_id(int): Id of row of webpage, a refreshed webpage isn't a near-duplicate of it's previous version.
+            html(str): A html webpage.
+
+        Returns:
+            duplicate_of(int): Id of row of near-duplicate webpage, or None if there's none or webpage is too short.
+        """
+        fingerprint = self.fingerprint(html)
+        if fingerprint is None:
+            return None
+        return self.index.check(row_id, fingerprint)
+
+
+_detector = None
+_detector_lock = Lock()
+
+
+def get_detector():
+    """
+    Returns near-duplicate detector configured from configuration file, which is shared by whole process, or None if
+    it's disabled.
+    """
+    global _detector
+    with _detector_lock:
+        if _detector is None and read_config()["enabled"]:
+            _detector = NearDuplicateDetector.from_config()
+        return _detector
+
+
+def benchmark(count=500, page_kb=20, variants=4):
+    """
+    Micro-benchmark of fingerprinting and lookup of generated webpages, every one of which has a few variants differing
+    in a few words.
+
+    Parameters:
+        count(int): Count of distinct webpages.
+        page_kb(int): Approximate size of every webpage in KB.
+        variants(int): Count of near-duplicate variants of every webpage, besides itself.
+    """
+    import random
+    generator = random.Random(0)
+    vocabulary = [f"word{number}" for number in range(5000)]
+    detector = NearDuplicateDetector()
+    pages = list()
+    for number in range(count):
+        words = [generator.choice(vocabulary) for _ in range(page_kb * 1024 // 9)]
+        pages.append(f"<html><body><h1>Page {number}</h1><p>{' '.join(words)}</p></body></html>")
+        for variant in range(variants):
+            words[generator.randrange(len(words))] = f"session{variant}"
+            pages.append(f"<html><body><h1>Page {number}</h1><p>{' '.join(words)}</p></body></html>")
+    start = time.perf_counter()
+    duplicates = sum(detector.check(row_id, page) is not None for row_id, page in enumerate(pages))
+    seconds = time.perf_counter() - start
+    print(f"{seconds / len(pages) * 1e3:.3f} ms per {page_kb} KB webpage, near-duplicates found: {duplicates} "
+          f"of {count * variants}")
+
+
+if __name__ == "__main__":
+    benchmark()
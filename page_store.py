@@ -0,0 +1,251 @@
+# standard python package
+import configparser
+import gzip
+import hashlib
+import os
+import tempfile
+from threading import Lock
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def compress(content, compression):
+    """
+    Compresses content of a webpage.
+
+    Parameters:
+        content(bytes): A content of webpage.
+        compression(str): Compression algorithm. Options: gzip, zstd or none.
+
+    Returns:
+        content(bytes): A compressed content.
+    """
+    if compression == "gzip":
+        return gzip.compress(content, compresslevel=6)
+    elif compression == "zstd":
+        return zstandard.ZstdCompressor().compress(content)
+    return content
+
+
+def decompress(content, compression):
+    """ Decompresses content compressed by compress function. """
+    if compression == "gzip":
+        return gzip.decompress(content)
+    elif compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(content)
+    return content
+
+
+class PageStore:
+    """
+    Interface of storage backends for downloaded webpages. Webpages are addressed by hash of their content, so a
+    webpage which is downloaded many times or from many links is stored once.
+    """
+    EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+    def __init__(self, root, compression):
+        """
+        Initializer for PageStore object.
+
+        Parameters:
+            root(str): A path of directory where webpages are stored.
+            compression(str): Compression algorithm. Options: gzip, zstd or none.
+        """
+        if compression == "zstd" and zstandard is None:
+            print("zstandard package is not installed - using gzip compression")
+            compression = "gzip"
+        self.root = root
+        self.compression = compression
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, file_path):
+        """
+        Reads a stored webpage.
+
+        Parameters:
+            file_path(str): A location of webpage returned by put method.
+
+        Returns:
+            content(bytes): A content of webpage.
+        """
+        raise NotImplementedError
+
+    def iter_contents(self):
+        """ Yields contents of all stored webpages. """
+        raise NotImplementedError
+
+    def put(self, content, content_hash=None):
+        """
+        Stores a webpage unless identical content is already stored.
+
+        Parameters:
+            content(bytes): A content of webpage.
+            content_hash(str): SHA-256 hex digest of content if it's already computed.
+
+        Returns:
+            file_path(str): A location of webpage. For storing it in the database.
+        """
+        raise NotImplementedError
+
+
+class ShardedFileStore(PageStore):
+    """
+    Stores each webpage in it's own compressed file named by it's hash, inside two levels of sharded directories so
+    that no directory grows too large. Eg. html_pgs/ab/cd/abcd...ef.gz
+    """
+    def __get_path(self, content_hash):
+        """ Returns relative path of a webpage file. """
+        extension = PageStore.EXTENSIONS[self.compression]
+        return os.path.join(content_hash[:2], content_hash[2:4], content_hash + extension)
+
+    def get(self, file_path):
+        with open(os.path.join(self.root, file_path), "rb") as page_file:
+            content = page_file.read()
+        for compression, extension in PageStore.EXTENSIONS.items():
+            if extension and file_path.endswith(extension):
+                return decompress(content, compression)
+        return content
+
+    def iter_contents(self):
+        for directory, _, file_names in os.walk(self.root):
+            for file_name in sorted(file_names):
+                yield self.get(os.path.relpath(os.path.join(directory, file_name), self.root))
+
+    def put(self, content, content_hash=None):
+        if content_hash is None:
+            content_hash = hashlib.sha256(content).hexdigest()
+        file_path = self.__get_path(content_hash)
+        full_path = os.path.join(self.root, file_path)
+        if os.path.exists(full_path):
+            return file_path
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # writes into a temporary file first, so that a partially written webpage is never visible
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(full_path))
+        with os.fdopen(descriptor, "wb") as page_file:
+            page_file.write(compress(content, self.compression))
+        os.replace(temp_path, full_path)
+        return file_path
+
+
+class SegmentStore(PageStore):
+    """
+    Appends webpages into large segment files, similar to WARC files, so that hundreds of thousands of webpages don't
+    need as many files. Every record is compressed separately and has a header line with it's hash, length and
+    compression. Location of a webpage is kept as "{segment name}:{offset of record}:{length of compressed content}".
+    """
+    HEADER = b"PAGE %s %d %s\n"
+
+    def __init__(self, root, compression, max_segment_bytes):
+        """
+        Initializer for SegmentStore object. It indexes records of existing segments for detecting duplicates.
+
+        Parameters:
+            root(str): A path of directory where segment files are stored.
+            compression(str): Compression algorithm. Options: gzip, zstd or none.
+            max_segment_bytes(int): Size after which a new segment file is started.
+        """
+        super().__init__(root, compression)
+        self.max_segment_bytes = max_segment_bytes
+        self.index = dict()
+        self.lock = Lock()
+        self.segment_number = 0
+        for segment_name in self.__segment_names():
+            self.segment_number = int(segment_name.split("-")[1].split(".")[0])
+            for content_hash, file_path, _ in self.__iter_records(segment_name):
+                self.index[content_hash] = file_path
+        if self.segment_number == 0:
+            self.segment_number = 1
+
+    def __iter_records(self, segment_name):
+        """ Yields hash, location and compression of every record in a segment file. """
+        with open(os.path.join(self.root, segment_name), "rb") as segment:
+            while True:
+                offset = segment.tell()
+                header = segment.readline()
+                if not header.startswith(b"PAGE "):
+                    break
+                _, content_hash, length, compression = header.split()
+                length = int(length)
+                segment.seek(length, os.SEEK_CUR)
+                yield content_hash.decode(), f"{segment_name}:{offset}:{length}", compression.decode()
+
+    def __segment_names(self):
+        """ Returns names of segment files in order of their creation. """
+        return sorted(name for name in os.listdir(self.root) if name.startswith("segment-"))
+
+    def get(self, file_path):
+        segment_name, offset, length = file_path.rsplit(":", 2)
+        with open(os.path.join(self.root, segment_name), "rb") as segment:
+            segment.seek(int(offset))
+            compression = segment.readline().split()[-1].decode()
+            content = segment.read(int(length))
+        return decompress(content, compression)
+
+    def iter_contents(self):
+        for segment_name in self.__segment_names():
+            for _, file_path, _ in self.__iter_records(segment_name):
+                yield self.get(file_path)
+
+    def put(self, content, content_hash=None):
+        if content_hash is None:
+            content_hash = hashlib.sha256(content).hexdigest()
+        record = compress(content, self.compression)
+        with self.lock:
+            if content_hash in self.index:
+                return self.index[content_hash]
+            segment_name = f"segment-{self.segment_number:06d}.pgs"
+            segment_path = os.path.join(self.root, segment_name)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.max_segment_bytes:
+                self.segment_number += 1
+                segment_name = f"segment-{self.segment_number:06d}.pgs"
+                segment_path = os.path.join(self.root, segment_name)
+            with open(segment_path, "ab") as segment:
+                offset = segment.tell()
+                segment.write(SegmentStore.HEADER % (content_hash.encode(), len(record), self.compression.encode()))
+                segment.write(record)
+            file_path = f"{segment_name}:{offset}:{len(record)}"
+            self.index[content_hash] = file_path
+            return file_path
+
+
+_stores = dict()
+_stores_lock = Lock()
+
+
+def read_config():
+    """
+    Reads configuration of page store.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    return dict(config_parser.items("store"))
+
+
+def create_store(root):
+    """
+    Creates page store configured from configuration file.
+
+    Parameters:
+        root(str): A path of directory where webpages are stored.
+
+    Returns:
+        store(PageStore): A page store.
+    """
+    config = read_config()
+    if config["backend"] == "segment":
+        return SegmentStore(root, config["compression"], int(config["segment_max_mb"]) * 2 ** 20)
+    return ShardedFileStore(root, config["compression"])
+
+
+def get_store(root):
+    """ Returns page store of a directory, which is shared by whole process. """
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = create_store(root)
+        return _stores[root]
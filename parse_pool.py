@@ -0,0 +1,62 @@
+# standard python package
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# local packages
+from crawler import WebCrawler
+
+
+def parse_page(webpage, src_link):
+    """
+    Extracts links from a webpage inside a worker process.
+
+    Parameters:
+        webpage(str): A text content of downloaded html page.
+        src_link(str): A text of hyperlink from which a webpage is download.
+
+    Returns:
+        links(list): A list of valid scraped links from the passed webpage.
+        metadata(dict): Details of parsing. Eg. time taken by parsing, without waiting for a worker and transfer of
+                        webpage between processes.
+    """
+    start = time.perf_counter()
+    links = WebCrawler.scrape(webpage, src_link)
+    metadata = {
+        "parse_secs": time.perf_counter() - start,
+    }
+    return links, metadata
+
+
+class ParsePool:
+    """
+    Parsing stage which fans webpages out to a pool of processes, so that parsing isn't limited to a single core by
+    GIL. Every caller waits for parsing of it's webpage, so count of webpages waiting for a free worker is bounded by
+    count of calling threads Eg. crawling threads of thread engine or executor threads of async engine, and callers
+    are slowed down when the pool falls behind.
+    """
+    def __init__(self, worker_count):
+        """
+        Initializer for ParsePool object.
+
+        Parameters:
+            worker_count(int): Count of parsing processes.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=worker_count)
+
+    def close(self):
+        """ Stops all parsing processes after pending webpages are parsed. """
+        self.executor.shutdown(wait=True)
+
+    def scrape(self, webpage, src_link):
+        """
+        Scrapes list of valid links from provided webpage in a worker process and returns it, once it's parsed.
+
+        Parameters:
+            webpage(str): A text content of downloaded html page.
+            src_link(str): A text of hyperlink from which a webpage is download.
+
+        Returns:
+            links(list): A list of valid scraped links from the passed webpage.
+            metadata(dict): Details of parsing returned by worker.
+        """
+        return self.executor.submit(parse_page, webpage, src_link).result()
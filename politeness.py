@@ -0,0 +1,433 @@
+# standard python package
+import configparser
+import heapq
+import itertools
+import time
+from collections import Counter, OrderedDict
+from email.utils import parsedate_to_datetime
+from threading import Condition, Event, Lock
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+# global imports
+import requests
+
+
+def get_host(link):
+    """
+    Returns host of a link along with it's port, which identifies a server for politeness.
+
+    Parameters:
+        link(str): A hyperlink.
+
+    Returns:
+        host(str): Host of hyperlink Eg. example.com:8080
+    """
+    try:
+        return urlsplit(link).netloc.lower()
+    except ValueError:
+        return ""
+
+
+def parse_retry_after(value):
+    """
+    Parses Retry-After header of a response.
+
+    Parameters:
+        value(str): Value of header, either seconds or a HTTP date.
+
+    Returns:
+        seconds(float): Seconds to wait before next request, or None if value is invalid.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None or retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def read_config():
+    """
+    Reads configuration of politeness.
+
+    Returns:
+        config(dict): A configuration name as key and it's values.
+    """
+    config = dict()
+    config_parser = configparser.ConfigParser()
+    config_parser.read("config.cfg")
+    for key, val in config_parser.items("politeness"):
+        try:
+            config.update({key: int(val)})
+        except ValueError:
+            config.update({key: val})
+    return config
+
+
+class TokenBucket:
+    """
+    Limits rate of requests to a host. Tokens are refilled continuously at rate per second up to burst. A rate of 0 or
+    below doesn't limit requests.
+    """
+    def __init__(self, rate, burst):
+        """
+        Initializer for TokenBucket object.
+
+        Parameters:
+            rate(float): Tokens added per second, 0 is unlimited.
+            burst(int): Maximum count of tokens.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def __refill(self):
+        """ Adds tokens for time passed since last refill. """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def has_token(self):
+        """ Checks whether a token is available without taking it. """
+        if self.rate <= 0:
+            return True
+        self.__refill()
+        return self.tokens >= 1
+
+    def consume(self):
+        """ Takes a token if available. Returns False if bucket is empty. """
+        if self.rate <= 0:
+            return True
+        self.__refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        """ Returns seconds until next token is available. """
+        if self.rate <= 0:
+            return 0.0
+        self.__refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RobotsCache:
+    """
+    Cache of parsed robots.txt files of hosts with expiry. A robots.txt file is downloaded on first check of a link of
+    it's host and again after ttl, or after retry_ttl if it couldn't be downloaded or server failed. Concurrent checks
+    of a same origin wait for a single download, and least recently used origins are dropped first once max_entries
+    are cached.
+    """
+    def __init__(self, user_agent, ttl, timeout, fetch=None, max_entries=10000, retry_ttl=300):
+        """
+        Initializer for RobotsCache object.
+
+        Parameters:
+            user_agent(str): User agent of crawler matched against robots.txt rules.
+            ttl(int): Seconds for which a robots.txt file is cached.
+            timeout(int): Seconds to wait for download of a robots.txt file.
+            fetch(function): Downloads a robots.txt, takes it's url and returns status code and text. By default, it
+                             downloads with requests. Eg. a stub can be passed for testing.
+            max_entries(int): Count of origins whose robots.txt is kept in cache.
+            retry_ttl(int): Seconds for which a failed download or a server error of robots.txt is cached.
+        """
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fetch = fetch if fetch is not None else self.__fetch
+        self.max_entries = max_entries
+        self.retry_ttl = retry_ttl
+        # origin as key and (expiry, parser) as value, in order of use
+        self.parsers = OrderedDict()
+        # origins being downloaded with an event which is set when download is done
+        self.pending = dict()
+        self.lock = Lock()
+
+    def __fetch(self, robots_url):
+        """ Downloads a robots.txt file with requests. """
+        response = requests.get(robots_url, timeout=self.timeout, headers={"User-Agent": self.user_agent})
+        return response.status_code, response.text
+
+    @staticmethod
+    def __get_origin(link):
+        """ Returns scheme and host of a link, whose robots.txt applies to it. """
+        parts = urlsplit(link)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def __get_cached(self, origin):
+        """ Returns parser of an origin if it's cached and not expired, while lock is held. """
+        cached = self.parsers.get(origin)
+        if cached is None or cached[0] <= time.monotonic():
+            return None
+        self.parsers.move_to_end(origin)
+        return cached[1]
+
+    def __get_parser(self, link):
+        """
+        Returns parsed robots.txt of host of link, downloads it if not cached or expired. Only one thread downloads
+        robots.txt of an origin at once, others wait for it.
+        """
+        origin = RobotsCache.__get_origin(link)
+        while True:
+            with self.lock:
+                parser = self.__get_cached(origin)
+                if parser is not None:
+                    return parser
+                event = self.pending.get(origin)
+                if event is None:
+                    event = self.pending[origin] = Event()
+                    break
+            event.wait()
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            try:
+                status_code, text = self.fetch(origin + "/robots.txt")
+            except requests.exceptions.RequestException:
+                status_code, text = 503, ""
+            ttl = self.ttl
+            if status_code >= 500:
+                # server is failing or unreachable, so nothing is crawled until it's checked again shortly
+                parser.disallow_all = True
+                ttl = self.retry_ttl
+            elif status_code in (401, 403):
+                # access to robots.txt is denied
+                parser.disallow_all = True
+            elif status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(text.splitlines())
+            parser.modified()
+            with self.lock:
+                self.parsers[origin] = (time.monotonic() + ttl, parser)
+                self.parsers.move_to_end(origin)
+                while len(self.parsers) > self.max_entries:
+                    self.parsers.popitem(last=False)
+        finally:
+            with self.lock:
+                self.pending.pop(origin).set()
+        return parser
+
+    def allowed(self, link):
+        """ Checks whether robots.txt of host allows crawling of a link. """
+        return self.__get_parser(link).can_fetch(self.user_agent, link)
+
+    def cached_allowed(self, link):
+        """
+        Checks whether robots.txt of host allows crawling of a link, if it's robots.txt is already cached. It never
+        downloads robots.txt, so it can be called without blocking Eg. from an event loop.
+
+        Parameters:
+            link(str): A hyperlink.
+
+        Returns:
+            allowed(bool): True if link is allowed, False if it's disallowed or None if robots.txt isn't cached.
+        """
+        with self.lock:
+            parser = self.__get_cached(RobotsCache.__get_origin(link))
+        return parser.can_fetch(self.user_agent, link) if parser is not None else None
+
+    def cached_delay(self, host):
+        """
+        Returns Crawl-delay of a host if it's robots.txt is already cached. It never downloads robots.txt.
+
+        Parameters:
+            host(str): Host of a link.
+
+        Returns:
+            delay(float): Seconds to wait between requests or None if unknown.
+        """
+        with self.lock:
+            for scheme in ("https", "http"):
+                cached = self.parsers.get(f"{scheme}://{host}")
+                if cached is not None:
+                    delay = cached[1].crawl_delay(self.user_agent)
+                    return float(delay) if delay is not None else None
+        return None
+
+
+class HostFrontier:
+    """
+    Priority queue of links with a heap per host. Among hosts which are within their count of concurrent requests and
+    rate limit (or Crawl-delay), the link with best (lowest) priority is dispatched. Hosts with equal priority are
+    taken in rotation, and a host which can't be requested now is skipped, so one slow host doesn't starve others.
+    """
+    def __init__(self, maxsize, max_concurrency, rate, burst, robots=None):
+        """
+        Initializer for HostFrontier object.
+
+        Parameters:
+            maxsize(int): Maximum count of links kept in frontier.
+            max_concurrency(int): Maximum count of concurrent requests to a host.
+            rate(float): Maximum requests per second to a host.
+            burst(int): Count of requests to a host which can be made at once after it was idle.
+            robots(RobotsCache): A cache of robots.txt files for Crawl-delay of hosts.
+        """
+        self.maxsize = maxsize
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.robots = robots
+        self.queues = OrderedDict()
+        self.buckets = dict()
+        self.active = Counter()
+        self.queued_ids = set()
+        # host as key and monotonic time until which it isn't requested as value Eg. after Retry-After of a response
+        self.deferred = dict()
+        self.size = 0
+        self.condition = Condition()
+        # insertion order breaks ties of priority within a host
+        self.counter = itertools.count()
+
+    def qsize(self):
+        """ Returns count of links waiting in frontier. """
+        return self.size
+
+    def queued(self):
+        """ Returns ids of rows waiting in frontier. """
+        with self.condition:
+            return list(self.queued_ids)
+
+    def put(self, link_row):
+        """
+        Adds a link into heap of it's host by it's priority. A link already waiting in frontier is ignored.
+
+        Parameters:
+            link_row(dict): A row from table links with column name as keys.
+        """
+        host = get_host(link_row['link'])
+        with self.condition:
+            if link_row['id'] in self.queued_ids:
+                return
+            self.queued_ids.add(link_row['id'])
+            entry = (link_row.get('priority') or 0, next(self.counter), link_row)
+            heapq.heappush(self.queues.setdefault(host, list()), entry)
+            self.size += 1
+            self.condition.notify()
+
+    def __get_bucket(self, host):
+        """ Returns token bucket of a host, rate of which follows Crawl-delay of host once it's known. """
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self.buckets[host] = bucket
+        delay = self.robots.cached_delay(host) if self.robots is not None else None
+        if delay:
+            bucket.rate = min(self.rate, 1 / delay) if self.rate > 0 else 1 / delay
+            bucket.burst = 1
+        return bucket
+
+    def __next_ready(self):
+        """
+        Pops the link with best priority among hosts which can be requested now, else returns wait time in seconds.
+        """
+        wait = None
+        best_host = None
+        now = time.monotonic()
+        for host, links in self.queues.items():
+            if self.active[host] >= self.max_concurrency:
+                continue
+            deferred = self.deferred.get(host)
+            if deferred is not None:
+                if deferred > now:
+                    wait = deferred - now if wait is None else min(wait, deferred - now)
+                    continue
+                del self.deferred[host]
+            bucket = self.__get_bucket(host)
+            if not bucket.has_token():
+                wait = bucket.wait_time() if wait is None else min(wait, bucket.wait_time())
+                continue
+            if best_host is None or links[0][0] < self.queues[best_host][0][0]:
+                best_host = host
+        if best_host is None:
+            return None, wait
+        self.buckets[best_host].consume()
+        links = self.queues[best_host]
+        link_row = heapq.heappop(links)[2]
+        if len(links) == 0:
+            del self.queues[best_host]
+        else:
+            self.queues.move_to_end(best_host)                  # rotation among hosts of equal priority
+        self.active[best_host] += 1
+        self.size -= 1
+        self.queued_ids.discard(link_row['id'])
+        return link_row, None
+
+    def drain(self):
+        """
+        Removes all links waiting in frontier.
+
+        Returns:
+            link_rows(list): Removed rows in order of their priority.
+        """
+        with self.condition:
+            entries = sorted(entry for links in self.queues.values() for entry in links)
+            self.queues.clear()
+            self.queued_ids.clear()
+            self.size = 0
+        return [entry[2] for entry in entries]
+
+    def get(self, timeout=None):
+        """
+        Returns next link which can be requested now.
+
+        Parameters:
+            timeout(float): Seconds to wait for a link. If None, it doesn't wait.
+
+        Returns:
+            link_row(dict): A row from table links with column name as keys or None if no link can be requested.
+        """
+        deadline = time.monotonic() + (timeout or 0)
+        with self.condition:
+            while True:
+                link_row, wait = self.__next_ready()
+                remaining = deadline - time.monotonic()
+                if link_row is not None or remaining <= 0:
+                    return link_row
+                self.condition.wait(remaining if wait is None else min(remaining, wait))
+
+    def defer(self, host, seconds):
+        """
+        Stops dispatching links of a host for a while Eg. when it asked to retry later, without blocking a crawler.
+
+        Parameters:
+            host(str): Host of a link.
+            seconds(float): Seconds for which host isn't requested.
+        """
+        with self.condition:
+            self.deferred[host] = max(self.deferred.get(host, 0), time.monotonic() + seconds)
+
+    def done(self, link_row):
+        """
+        Marks request of a link as completed, so another link of it's host can be dispatched.
+
+        Parameters:
+            link_row(dict): A row returned by get method.
+        """
+        host = get_host(link_row['link'])
+        with self.condition:
+            self.active[host] -= 1
+            if self.active[host] <= 0:
+                del self.active[host]
+            self.condition.notify()
+
+
+_robots = None
+_robots_lock = Lock()
+
+
+def get_robots_cache():
+    """ Returns robots.txt cache configured from configuration file, which is shared by whole process. """
+    global _robots
+    with _robots_lock:
+        if _robots is None:
+            config = read_config()
+            _robots = RobotsCache(config["user_agent"], config["robots_ttl_secs"], config["robots_timeout"],
+                                  max_entries=config["robots_cache_size"], retry_ttl=config["robots_retry_secs"])
+        return _robots
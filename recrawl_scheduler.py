@@ -0,0 +1,75 @@
+# standard python package
+import configparser
+
+
+class RecrawlScheduler:
+    """
+    Estimates after how long each link should be crawled again from it's observed change history. Interval of a link
+    is shortened whenever it's webpage has changed since previous visit and lengthened whenever it hasn't, within
+    configured bounds.
+    """
+    def __init__(self, initial_secs, min_secs, max_secs, backoff, tighten):
+        """
+        Initializer for RecrawlScheduler object.
+
+        Parameters:
+            initial_secs(int): Interval of a link after it's first visit.
+            min_secs(int): Lower bound of an interval.
+            max_secs(int): Upper bound of an interval.
+            backoff(float): Multiplier of interval when webpage hasn't changed.
+            tighten(float): Multiplier of interval when webpage has changed.
+        """
+        self.initial_secs = initial_secs
+        self.min_secs = min_secs
+        self.max_secs = max_secs
+        self.backoff = backoff
+        self.tighten = tighten
+
+    @staticmethod
+    def read_config():
+        """
+        Reads configuration of recrawl scheduler.
+
+        Returns:
+            config(dict): A configuration name as key and it's values.
+        """
+        config = dict()
+        config_parser = configparser.ConfigParser()
+        config_parser.read("config.cfg")
+        for key, val in config_parser.items("fetcher"):
+            try:
+                config.update({key: int(val)})
+            except ValueError:
+                config.update({key: val})
+        return config
+
+    @classmethod
+    def from_config(cls):
+        """ Creates recrawl scheduler with values from configuration file. """
+        config = cls.read_config()
+        return cls(
+            initial_secs=config["link_refresh_after_hrs"] * 3600,
+            min_secs=config["min_refresh_after_hrs"] * 3600,
+            max_secs=config["max_refresh_after_hrs"] * 3600,
+            backoff=float(config["refresh_backoff"]),
+            tighten=float(config["refresh_tighten"])
+        )
+
+    def next_interval(self, interval, changed):
+        """
+        Estimates interval until next visit of a link.
+
+        Parameters:
+            interval(int): Current interval of link in seconds, None if link wasn't scheduled yet.
+            changed(bool): Has webpage changed since previous visit?. None if it's unknown Eg. on failed download.
+
+        Returns:
+            interval(int): Seconds after which link should be visited again.
+        """
+        if interval is None:
+            return self.initial_secs
+        if changed is True:
+            interval = interval * self.tighten
+        elif changed is False:
+            interval = interval * self.backoff
+        return int(min(max(interval, self.min_secs), self.max_secs))
@@ -0,0 +1,229 @@
+# standard python package
+import hashlib
+import math
+import sys
+from threading import Lock
+
+
+def url_digest(url):
+    """
+    Hashes an url into a 128 bit digest. It's also the key of links in the database, so a filter can be warmed from
+    the database without reading links.
+
+    Parameters:
+        url(str): A hyperlink to hash.
+
+    Returns:
+        digest(bytes): 16 bytes digest of url.
+    """
+    return hashlib.blake2b(url.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+def url_hashes(url, digest=None):
+    """
+    Hashes an url into two independent 64 bit integers.
+
+    Parameters:
+        url(str): A hyperlink to hash.
+        digest(bytes): Digest of url returned by url_digest, if it's already known.
+
+    Returns:
+        hashes(tuple): Two 64 bit integer hashes of url.
+    """
+    digest = digest or url_digest(url)
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class BloomFilter:
+    """
+    A fixed size bloom filter. It never misses an added url, but may report an unseen url as seen with a probability
+    of error_rate once capacity urls are added.
+    """
+    def __init__(self, capacity, error_rate):
+        """
+        Initializer for BloomFilter object.
+
+        Parameters:
+            capacity(int): Count of urls which can be added before error rate is exceeded.
+            error_rate(float): Probability of false positive at full capacity.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.bit_count / capacity * math.log(2))))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def __positions(self, hashes):
+        """ Generates bit positions of a url by double hashing. """
+        first, second = hashes
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.bit_count
+
+    def add(self, hashes):
+        """ Adds hashes of an url into filter. """
+        for position in self.__positions(hashes):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains(self, hashes):
+        """ Checks whether hashes of an url were added into filter. """
+        for position in self.__positions(hashes):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def false_positive_rate(self):
+        """ Returns estimated probability of false positive for current count of urls. """
+        return (1 - math.exp(-self.hash_count * self.count / self.bit_count)) ** self.hash_count
+
+    def is_full(self):
+        """ Checks whether capacity of filter is reached. """
+        return self.count >= self.capacity
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter which grows by adding new filters of larger capacity and tighter error rate when the current one is
+    full, so overall false positive rate stays bounded by error_rate.
+    """
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity, error_rate):
+        """
+        Initializer for ScalableBloomFilter object.
+
+        Parameters:
+            capacity(int): Count of urls for the first filter.
+            error_rate(float): Upper bound of false positive probability.
+        """
+        self.error_rate = error_rate
+        self.filters = [BloomFilter(capacity, error_rate * (1 - ScalableBloomFilter.TIGHTENING))]
+        self.lock = Lock()
+
+    def __getstate__(self):
+        """ Returns state of filter without it's lock, so it can be pickled into a checkpoint. """
+        with self.lock:
+            state = self.__dict__.copy()
+            state.pop("lock")
+            state["filters"] = list(self.filters)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def __contains__(self, url):
+        hashes = url_hashes(url)
+        return any(bloom.contains(hashes) for bloom in reversed(self.filters))
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, url, digest=None):
+        """
+        Adds an url into filter.
+
+        Parameters:
+            url(str): A hyperlink to add. It can be None if digest is given.
+            digest(bytes): Digest of url returned by url_digest, if it's already known Eg. read from the database.
+
+        Returns:
+            is_new(bool): False if url was (probably) already added, else True.
+        """
+        hashes = url_hashes(url, digest)
+        with self.lock:
+            if any(bloom.contains(hashes) for bloom in reversed(self.filters)):
+                return False
+            current = self.filters[-1]
+            if current.is_full():
+                current = BloomFilter(
+                    current.capacity * ScalableBloomFilter.GROWTH,
+                    current.error_rate * ScalableBloomFilter.TIGHTENING
+                )
+                self.filters.append(current)
+            current.add(hashes)
+            return True
+
+    def false_positive_rate(self):
+        """ Returns estimated probability of false positive for current count of urls. """
+        not_false_positive = 1.0
+        for bloom in self.filters:
+            not_false_positive *= 1 - bloom.false_positive_rate()
+        return 1 - not_false_positive
+
+    def memory_bytes(self):
+        """ Returns approximate memory used by filter in bytes. """
+        return sum(sys.getsizeof(bloom.bits) for bloom in self.filters)
+
+
+class HashSetFilter:
+    """
+    Exact set of 64 bit url hashes. It uses more memory than a bloom filter, but false positives only occur on
+    hash collision.
+    """
+    def __init__(self, capacity=0, error_rate=None):
+        """ Initializer for HashSetFilter object. Parameters are accepted for interchangeability with bloom filter. """
+        self.hashes = set()
+        self.lock = Lock()
+
+    def __getstate__(self):
+        """ Returns state of filter without it's lock, so it can be pickled into a checkpoint. """
+        with self.lock:
+            state = self.__dict__.copy()
+            state.pop("lock")
+            state["hashes"] = set(self.hashes)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def __contains__(self, url):
+        return url_hashes(url)[0] in self.hashes
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, url, digest=None):
+        """
+        Adds an url into filter. Parameters are same as of ScalableBloomFilter.add.
+
+        Returns:
+            is_new(bool): False if url was already added, else True.
+        """
+        url_hash = url_hashes(url, digest)[0]
+        with self.lock:
+            if url_hash in self.hashes:
+                return False
+            self.hashes.add(url_hash)
+            return True
+
+    def false_positive_rate(self):
+        """ Returns estimated probability of hash collision for current count of urls. """
+        return len(self.hashes) / 2 ** 64
+
+    def memory_bytes(self):
+        """ Returns approximate memory used by filter in bytes. """
+        # every stored hash is an int object of 36 bytes on 64 bit builds
+        return sys.getsizeof(self.hashes) + len(self.hashes) * 36
+
+
+def create_filter(kind, capacity, error_rate):
+    """
+    Creates url seen filter of specified kind.
+
+    Parameters:
+        kind(str): Kind of filter. Options: bloom or set.
+        capacity(int): Expected count of urls.
+        error_rate(float): Upper bound of false positive probability for bloom filter.
+
+    Returns:
+        seen_filter(ScalableBloomFilter/HashSetFilter): A new empty filter.
+    """
+    if kind == "bloom":
+        return ScalableBloomFilter(capacity, error_rate)
+    elif kind == "set":
+        return HashSetFilter(capacity, error_rate)
+    raise ValueError(f"Unknown seen filter: {kind}")
@@ -0,0 +1,35 @@
+import configparser
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules of crawler aren't a package, they're imported from root of repository like main.py does
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """
+    Runs a test in a temporary directory with a copy of configuration file, as modules read config.cfg from working
+    directory. sqlite backend is configured, with database file in temporary directory.
+
+    Returns:
+        set_config(function): Sets a value of a section of configuration file, takes section, key and value.
+    """
+    config_path = tmp_path / "config.cfg"
+    shutil.copy(os.path.join(ROOT, "config.cfg"), config_path)
+    monkeypatch.chdir(tmp_path)
+
+    def set_config(section, key, value):
+        config_parser = configparser.ConfigParser()
+        config_parser.optionxform = str
+        config_parser.read(config_path)
+        config_parser.set(section, key, str(value))
+        with open(config_path, "w") as config_file:
+            config_parser.write(config_file)
+
+    set_config("database", "BACKEND", "sqlite")
+    return set_config
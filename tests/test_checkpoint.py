@@ -0,0 +1,39 @@
+import pytest
+
+import checkpoint
+import db
+
+
+@pytest.fixture
+def handler(config_dir, monkeypatch):
+    config_dir("manager", "CHECKPOINT_FILE", "crawl.ckpt")
+    monkeypatch.setattr(checkpoint, "_state", None)
+    monkeypatch.setattr(checkpoint, "_loaded", False)
+    db_handler = db.create_handler()
+    db_handler.create_table()
+    db_handler.insert_unvisited_many(["http://a.com/1", "http://a.com/2"])
+    yield db_handler
+    db_handler.close()
+
+
+def test_checkpoint_of_same_table_is_loaded(handler):
+    checkpoint.save({"frontier": [1, 2]}, handler)
+    # rows added by other crawling processes meanwhile don't invalidate checkpoint
+    handler.insert_unvisited_many(["http://a.com/3"])
+    assert checkpoint.load(handler)["frontier"] == [1, 2]
+
+
+def test_checkpoint_of_another_table_is_discarded(handler, config_dir, capsys):
+    checkpoint.save({"frontier": [1, 2]}, handler)
+    config_dir("database", "TABLE_NAME", "other_links")
+    other_handler = db.create_handler()
+    other_handler.create_table()
+    assert checkpoint.load(other_handler) is None
+    assert "table_name was links, now other_links" in capsys.readouterr().out
+
+
+def test_checkpoint_of_replaced_table_is_discarded(handler, capsys):
+    checkpoint.save({"frontier": [1, 2]}, handler)
+    handler.execute(f"DELETE FROM {handler.TABLE_NAME};")
+    assert checkpoint.load(handler) is None
+    assert "row_count was 2, now 0" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def handler(config_dir, monkeypatch):
+    monkeypatch.setattr(db.CrawlerDBHandler, "seen_filter", None)
+    db_handler = db.create_handler()
+    assert isinstance(db_handler, db.SQLiteHandler)
+    db_handler.create_table()
+    yield db_handler
+    db_handler.flush_visits()
+    db_handler.close()
+
+
+def later(seconds=60):
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+def select_row(handler, row_id):
+    rows = handler.execute(f"SELECT * FROM {handler.TABLE_NAME} WHERE id=%s;", values=(row_id,), fetch=True)
+    return rows[0]
+
+
+def test_insert_unvisited_many_skips_present_links(handler):
+    row_count, inserted = handler.insert_unvisited_many(["http://a.com/1", "http://a.com/2", "http://a.com/1"])
+    assert row_count == 2
+    assert inserted == ["http://a.com/1", "http://a.com/2"]
+    row_count, inserted = handler.insert_unvisited_many(["http://a.com/2", "http://a.com/3"], depth=1)
+    assert row_count == 1
+    assert inserted == ["http://a.com/3"]
+    assert handler.row_count() == 3
+
+
+def test_claim_takes_rows_by_priority_once(handler):
+    links = ["http://a.com/1", "http://a.com/2", "http://a.com/3"]
+    handler.insert_unvisited_many(links, priorities={"http://a.com/3": -1})
+    first = handler.claim_unvisited(later(), "worker-1", limit=2)
+    assert [row["link"] for row in first] == ["http://a.com/3", "http://a.com/1"]
+    second = handler.claim_unvisited(later(), "worker-2")
+    assert [row["link"] for row in second] == ["http://a.com/2"]
+    assert handler.claim_unvisited(later(), "worker-3") == []
+
+
+def test_expired_lease_is_claimed_again(handler):
+    handler.insert_unvisited_many(["http://a.com/1"])
+    assert len(handler.claim_unvisited(later(1), "worker-1")) == 1
+    assert handler.claim_unvisited(later(), "worker-2") == []
+    time.sleep(1.1)
+    assert len(handler.claim_unvisited(later(), "worker-2")) == 1
+
+
+def test_renew_extends_own_leases(handler):
+    handler.insert_unvisited_many(["http://a.com/1"])
+    row_ids = [row["id"] for row in handler.claim_unvisited(later(1), "worker-1")]
+    assert handler.renew(row_ids, later(), "worker-2") == 0
+    assert handler.renew(row_ids, later(), "worker-1") == 1
+    time.sleep(1.1)
+    assert handler.claim_unvisited(later(), "worker-2") == []
+
+
+def test_release_frees_own_leases(handler):
+    handler.insert_unvisited_many(["http://a.com/1", "http://a.com/2"])
+    row_ids = [row["id"] for row in handler.claim_unvisited(later(), "worker-1")]
+    assert handler.release(row_ids, "worker-2") == 0
+    assert handler.release(row_ids[:1], "worker-1") == 1
+    assert [row["id"] for row in handler.claim_unvisited(later(), "worker-2")] == row_ids[:1]
+
+
+def test_claim_ids_skips_leased_and_visited_rows(handler):
+    handler.insert_unvisited_many(["http://a.com/1", "http://a.com/2", "http://a.com/3"])
+    rows = handler.claim_unvisited(later(), "worker-1", limit=2)
+    handler.write_visits([{"id": rows[1]["id"], "response_status": 200, "last_crawl_dt": datetime.now()}])
+    handler.release([rows[1]["id"]], "worker-1")
+    claimed = handler.claim_ids([1, 2, 3], later(), "worker-2")
+    assert [row["id"] for row in claimed] == [3]
+
+
+def test_write_visits_marks_crawled_and_releases_lease(handler):
+    handler.insert_unvisited_many(["http://a.com/1", "http://a.com/2"])
+    first, second = handler.claim_unvisited(later(), "worker-1")
+    now = datetime.now()
+    handler.write_visits([
+        {"id": first["id"], "response_status": 200, "last_crawl_dt": now, "etag": '"v1"'},
+        {"id": second["id"], "response_status": 404, "last_crawl_dt": now},
+    ])
+    row = select_row(handler, first["id"])
+    assert (row["is_crawled"], str(row["response_status"]), row["etag"]) == (1, "200", '"v1"')
+    assert (row["lease_expiry"], row["lease_owner"], row["lease_token"]) == (None, None, None)
+    assert str(select_row(handler, second["id"])["response_status"]) == "404"
+    assert handler.claim_unvisited(later(), "worker-2") == []
+
+
+def test_buffered_visits_are_written_on_flush(handler):
+    handler.insert_unvisited_many(["http://a.com/1"])
+    row = handler.claim_unvisited(later(), "worker-1")[0]
+    handler.update_visit(row["id"], 200, content_type="text/html", file_path="pages/1.html", recrawl_interval=60)
+    assert select_row(handler, row["id"])["is_crawled"] == 0
+    handler.flush_visits()
+    stored = select_row(handler, row["id"])
+    assert (stored["is_crawled"], stored["file_path"], stored["recrawl_interval"]) == (1, "pages/1.html", 60)
+    handler.update_unchanged(row["id"], 304)
+    handler.flush_visits()
+    stored = select_row(handler, row["id"])
+    assert (str(stored["response_status"]), stored["file_path"]) == ("304", "pages/1.html")
+
+
+def test_duplicate_visit_keeps_stored_file_and_validators(handler):
+    handler.insert_unvisited_many(["http://a.com/1"])
+    row = handler.claim_unvisited(later(), "worker-1")[0]
+    handler.update_visit(row["id"], 200, file_path="pages/1.html", etag='"v1"', content_hash="old")
+    handler.flush_visits()
+    handler.update_duplicate(row["id"], 200, content_hash="new", duplicate_of=7, recrawl_interval=60)
+    handler.flush_visits()
+    stored = select_row(handler, row["id"])
+    assert (stored["file_path"], stored["etag"]) == ("pages/1.html", '"v1"')
+    assert (stored["content_hash"], stored["duplicate_of"], stored["recrawl_interval"]) == ("new", 7, 60)
@@ -0,0 +1,71 @@
+import socket
+import time
+
+import pytest
+
+import dns_cache
+
+
+class StubResolver:
+    """ Stub of socket.getaddrinfo which resolves hosts from a dictionary and counts lookups of each host. """
+    def __init__(self, addresses, errors=None):
+        self.addresses = addresses
+        self.errors = errors or dict()
+        self.calls = list()
+
+    def __call__(self, host, port, family=0, type=0, proto=0, flags=0):
+        self.calls.append(host)
+        if host in self.errors:
+            raise socket.gaierror(self.errors[host], "stub lookup failed")
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (self.addresses[host], 0))]
+
+
+@pytest.fixture
+def resolver(config_dir):
+    return StubResolver({"example.com": "192.0.2.1"},
+                        errors={"missing.test": socket.EAI_NONAME, "flaky.test": socket.EAI_AGAIN})
+
+
+def test_addresses_are_cached(resolver):
+    dns = dns_cache.DNSCache(resolver=resolver)
+    first = dns.getaddrinfo("example.com", 80, type=socket.SOCK_STREAM)
+    second = dns.getaddrinfo("Example.com", "443")
+    assert first[0][4] == ("192.0.2.1", 80)
+    assert second[0][4] == ("192.0.2.1", 443)
+    assert resolver.calls == ["example.com"]
+
+
+def test_addresses_expire_after_ttl(resolver):
+    dns = dns_cache.DNSCache(resolver=resolver, ttl_secs=0)
+    dns.getaddrinfo("example.com", 80)
+    dns.getaddrinfo("example.com", 80)
+    assert resolver.calls == ["example.com", "example.com"]
+
+
+def test_missing_host_is_cached_negatively(resolver):
+    dns = dns_cache.DNSCache(resolver=resolver, negative_ttl_secs=60)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            dns.getaddrinfo("missing.test", 80)
+    assert resolver.calls == ["missing.test"]
+    assert dns.is_unresolvable("http://missing.test/page")
+    assert not dns.is_unresolvable("http://example.com/page")
+
+
+def test_temporary_failure_is_not_cached(resolver):
+    dns = dns_cache.DNSCache(resolver=resolver)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            dns.getaddrinfo("flaky.test", 80)
+    assert resolver.calls == ["flaky.test", "flaky.test"]
+    assert not dns.is_unresolvable("http://flaky.test/page")
+
+
+def test_prefetch_resolves_in_background(resolver):
+    dns = dns_cache.DNSCache(resolver=resolver)
+    dns.prefetch(["http://example.com/a", "http://example.com/b"])
+    deadline = time.monotonic() + 2
+    while "example.com" not in dns.entries and time.monotonic() < deadline:
+        time.sleep(0.01)
+    dns.getaddrinfo("example.com", 80)
+    assert resolver.calls == ["example.com"]
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import requests
+
+import politeness
+
+
+class StubFetch:
+    """ Stub download of robots.txt files which returns a fixed response and counts downloads. """
+    def __init__(self, status_code, text="", delay=0):
+        self.status_code = status_code
+        self.text = text
+        self.delay = delay
+        self.calls = list()
+        self.lock = threading.Lock()
+
+    def __call__(self, robots_url):
+        with self.lock:
+            self.calls.append(robots_url)
+        time.sleep(self.delay)
+        if isinstance(self.status_code, Exception):
+            raise self.status_code
+        return self.status_code, self.text
+
+
+def create_cache(fetch, **kwargs):
+    return politeness.RobotsCache("test-crawler", ttl=3600, timeout=1, fetch=fetch, **kwargs)
+
+
+def test_robots_rules_are_applied_and_cached():
+    fetch = StubFetch(200, "User-agent: *\nDisallow: /private\nCrawl-delay: 2\n")
+    robots = create_cache(fetch)
+    assert robots.allowed("http://example.com/public")
+    assert not robots.allowed("http://example.com/private/page")
+    assert robots.cached_delay("example.com") == 2.0
+    assert fetch.calls == ["http://example.com/robots.txt"]
+
+
+def test_missing_robots_allows_all():
+    robots = create_cache(StubFetch(404))
+    assert robots.allowed("http://example.com/private/page")
+
+
+def test_server_error_disallows_until_retry_ttl():
+    fetch = StubFetch(503)
+    robots = create_cache(fetch, retry_ttl=0.2)
+    assert not robots.allowed("http://example.com/page")
+    assert robots.cached_allowed("http://example.com/page") is False
+    time.sleep(0.25)
+    assert robots.cached_allowed("http://example.com/page") is None
+    fetch.status_code, fetch.text = 200, ""
+    assert robots.allowed("http://example.com/page")
+    assert len(fetch.calls) == 2
+
+
+def test_failed_download_is_cached_as_server_error():
+    fetch = StubFetch(requests.exceptions.ConnectionError())
+    robots = create_cache(fetch, retry_ttl=0)
+    assert not robots.allowed("http://example.com/page")
+    assert not robots.allowed("http://example.com/page")
+    assert len(fetch.calls) == 2
+
+
+def test_concurrent_first_lookups_download_once():
+    fetch = StubFetch(200, "User-agent: *\nDisallow: /private\n", delay=0.1)
+    robots = create_cache(fetch)
+    results = list()
+    threads = [threading.Thread(target=lambda: results.append(robots.allowed("http://example.com/page")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 8
+    assert len(fetch.calls) == 1
+
+
+def test_least_recently_used_origin_is_evicted():
+    robots = create_cache(StubFetch(404), max_entries=2)
+    robots.allowed("http://a.com/")
+    robots.allowed("http://b.com/")
+    robots.allowed("http://a.com/")
+    robots.allowed("http://c.com/")
+    assert robots.cached_allowed("http://a.com/") is True
+    assert robots.cached_allowed("http://b.com/") is None
+    assert robots.cached_allowed("http://c.com/") is True
+
+
+def create_frontier(max_concurrency=8, rate=0, burst=1):
+    return politeness.HostFrontier(maxsize=100, max_concurrency=max_concurrency, rate=rate, burst=burst)
+
+
+def link_row(row_id, link, priority=0):
+    return {"id": row_id, "link": link, "priority": priority}
+
+
+def test_frontier_limits_concurrent_requests_of_host():
+    frontier = create_frontier(max_concurrency=1)
+    frontier.put(link_row(1, "http://a.com/1"))
+    frontier.put(link_row(2, "http://a.com/2"))
+    frontier.put(link_row(3, "http://b.com/1"))
+    first = frontier.get()
+    assert first["id"] == 1
+    assert frontier.get()["id"] == 3
+    assert frontier.get() is None
+    frontier.done(first)
+    assert frontier.get()["id"] == 2
+
+
+def test_frontier_limits_rate_of_host():
+    frontier = create_frontier(rate=10, burst=1)
+    frontier.put(link_row(1, "http://a.com/1"))
+    frontier.put(link_row(2, "http://a.com/2"))
+    frontier.done(frontier.get())
+    assert frontier.get() is None
+    start = time.monotonic()
+    assert frontier.get(timeout=1)["id"] == 2
+    assert 0.05 <= time.monotonic() - start < 0.5
+
+
+def test_frontier_rotates_hosts_of_equal_priority():
+    frontier = create_frontier()
+    for row_id, link in enumerate(["http://a.com/1", "http://a.com/2", "http://b.com/1", "http://b.com/2"]):
+        frontier.put(link_row(row_id, link))
+    hosts = [politeness.get_host(frontier.get()["link"]) for _ in range(4)]
+    assert hosts == ["a.com", "b.com", "a.com", "b.com"]
+
+
+def test_frontier_prefers_best_priority():
+    frontier = create_frontier()
+    frontier.put(link_row(1, "http://a.com/1", priority=5))
+    frontier.put(link_row(2, "http://b.com/1", priority=1))
+    assert frontier.get()["id"] == 2
+
+
+def test_frontier_ignores_duplicate_ids():
+    frontier = create_frontier()
+    frontier.put(link_row(1, "http://a.com/1"))
+    frontier.put(link_row(1, "http://a.com/1"))
+    assert frontier.qsize() == 1
+    assert frontier.get()["id"] == 1
+    assert frontier.get() is None
+
+
+def test_frontier_defers_host():
+    frontier = create_frontier()
+    frontier.put(link_row(1, "http://a.com/1"))
+    frontier.put(link_row(2, "http://b.com/1"))
+    frontier.defer("a.com", 0.2)
+    assert frontier.get()["id"] == 2
+    assert frontier.get() is None
+    assert frontier.get(timeout=1)["id"] == 1
@@ -1,11 +1,15 @@
 # standard python package
 import configparser
+import signal
 import threading
 import time
 
 # local packages
+import concurrency_controller
+import metrics
 from crawler import WebCrawler
 from fetcher import LinkFetcher
+from parse_pool import ParsePool
 
 
 class ThreadManager:
@@ -13,9 +17,17 @@ class ThreadManager:
         """ Constructor for Thread Manager of Web Crawler. """
         self.config = ThreadManager.__read_config()
         self.crawler_list = list()
+        self.thread_list = list()
         self.fetcher = LinkFetcher()
-        self.thread_count = self.config["parallel_thread_count"] + 1             # extra thread is main thread
+        self.thread_count = self.config["parallel_thread_count"]
         self.sleep_interval = self.config["sleep_interval"]
+        self.parse_workers = self.config["parse_workers"]
+        self.drain_secs = self.config["drain_secs"]
+        self.metrics = metrics.get_metrics()
+        self.stopping = threading.Event()
+        self.previous_handlers = dict()
+        # count of working threads is adapted at runtime, if adaptive concurrency is enabled
+        self.controller = concurrency_controller.create_controller("thread", self.thread_count)
 
     @staticmethod
     def __read_config():
@@ -31,32 +43,98 @@ class ThreadManager:
         return config
 
     def execute(self):
-        """ Main method for execution of thread management. """
-        for count in range(self.thread_count):
+        """
+        Main method for execution of thread management. Crawling goes on until SIGINT or SIGTERM is received, then
+        crawlers finish their current visits within DRAIN_SECS and state of crawl is saved before exit.
+        """
+        WebCrawler.fetcher = self.fetcher
+        if self.parse_workers > 0:
+            WebCrawler.parse_pool = ParsePool(self.parse_workers)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.previous_handlers[signum] = signal.signal(signum, self.stop)
+        self.fetcher.start(self.sleep_interval)
+        self.metrics.gauge("queue_depth", self.fetcher.count)
+        metrics.start()
+        try:
+            if self.controller is None:
+                self.scale(self.thread_count)
+            else:
+                self.scale(self.controller.limit)
+                self.controller.start(demand=self.fetcher.count)
+            while not self.stopping.wait(1):
+                if self.controller is not None:
+                    self.scale(self.controller.limit)
+            deadline = time.monotonic() + self.drain_secs
+            for thread in self.thread_list:
+                thread.join(max(deadline - time.monotonic(), 0))
+        finally:
+            self.stopping.set()
+            self.shutdown()
+
+    def scale(self, count):
+        """
+        Starts crawling threads until count of them is running. Threads aren't stopped when count is lowered, threads
+        beyond count wait until it's raised again.
+
+        Parameters:
+            count(int): Count of threads which should be crawling.
+        """
+        while len(self.thread_list) < count:
             crawler = WebCrawler()
             self.crawler_list.append(crawler)
-        # print(len(self.crawler_list))
-        curr_index = 0                                              # index for crawler objects
-        while True:
-            while threading.active_count() < self.thread_count and self.fetcher.count() != 0:
-                crawler = self.crawler_list[curr_index]             # selects one of the crawler
-                link = self.fetcher.pop()                           # takes one link from fetcher
-                self.fetcher.release_lock()                         # release lock of fetcher
-                if link is not None:
-                    # print(threading.active_count(), link['id'], link['link'])
-                    thread = threading.Thread(target=crawler.visit, kwargs=link)
-                    thread.start()
-                    curr_index += 1                                 # for selection of next crawler
-                    if curr_index >= self.thread_count:
-                        curr_index = 0
-            if threading.active_count() == self.thread_count:
-                time.sleep(0.005)
-            if self.fetcher.count() == 0:
-                # to stop repeated visit of same link by many threads
-                while threading.active_count() != 1:    # waits until all links popped by fetcher are visited
-                    time.sleep(1)                       # by all threads to avoid repeated visit of same link.
-                # after execution of previous link is done, fetch new links from database into fetcheer
-                self.fetcher.refresh()
-                if self.fetcher.count() == 0:
-                    print("All links crawled.")
-                    time.sleep(self.sleep_interval)
+            # a thread stuck in a visit after drain time doesn't keep process alive
+            thread = threading.Thread(target=self.work, args=(crawler, len(self.thread_list)), daemon=True)
+            self.thread_list.append(thread)
+            thread.start()
+
+    def shutdown(self):
+        """
+        Stops fetcher and saves state of crawl. Buffered visits are written, a checkpoint is saved and leases of links
+        which weren't visited are released for other crawling processes.
+        """
+        if self.controller is not None:
+            self.controller.stop()
+        self.fetcher.stop()
+        for crawler in self.crawler_list:
+            crawler.db_handler.flush_visits()
+        link_rows = self.fetcher.drain()
+        WebCrawler.save_checkpoint(link_rows, self.fetcher.db_handler)
+        self.fetcher.release(link_rows)
+        self.metrics.stop()
+        if WebCrawler.parse_pool is not None:
+            WebCrawler.parse_pool.close()
+
+    def stop(self, signum, frame):
+        """
+        Handler of SIGINT and SIGTERM which stops crawling gracefully. Previous handlers are restored, so that a second
+        signal terminates process right away.
+        """
+        print(f"Stopping crawl on signal {signal.Signals(signum).name}, a second signal terminates right away")
+        for previous_signum, handler in self.previous_handlers.items():
+            signal.signal(previous_signum, handler)
+        self.stopping.set()
+
+    def work(self, crawler, index):
+        """
+        Worker loop of a crawling thread which continuously visits links from fetcher's queue.
+
+        Parameters:
+            crawler(WebCrawler): A crawler owned by this worker thread.
+            index(int): Position of thread, threads at or beyond limit of adaptive concurrency wait.
+        """
+        while not self.stopping.is_set():
+            if self.controller is not None and index >= self.controller.limit:
+                self.stopping.wait(0.5)
+                continue
+            link = self.fetcher.get(timeout=1)                      # takes one link from fetcher
+            if link is not None:
+                self.metrics.add_gauge("active_workers", 1)
+                try:
+                    crawler.visit(**link)
+                except Exception as err:
+                    # row stays leased and is handed out again after lease expires
+                    self.metrics.inc("visit_errors_total")
+                    print("Error while visiting:", link['link'], err)
+                finally:
+                    self.metrics.add_gauge("active_workers", -1)
+                    self.fetcher.done(link)
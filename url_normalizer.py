@@ -0,0 +1,210 @@
+# standard python package
+import configparser
+import fnmatch
+import re
+import timeit
+from functools import lru_cache
+from urllib.parse import quote, unquote, urljoin, urlsplit, urlunsplit
+
+
+class URLNormalizer:
+    """
+    Converts links into a canonical absolute form, so that different spellings of a same resource are stored once.
+    It resolves relative links as per RFC 3986, lowercases scheme and host, converts international domain names into
+    punycode, drops default ports, dot segments, fragments and configured query parameters, and normalizes
+    percent-encoding. Results are cached.
+    """
+    ALLOWED_SCHEMES = ("http", "https")
+    DEFAULT_PORTS = {"http": 80, "https": 443}
+    # characters which are removed anywhere inside a link by browsers
+    REMOVED_CHARS = re.compile(r"[\t\n\r]")
+    PERCENT_ENCODED = re.compile(r"%([0-9a-fA-F]{2})")
+    UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+    PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+    QUERY_SAFE = PATH_SAFE + "?"
+
+    def __init__(self, strip_params=(), sort_query=False, cache_size=65536):
+        """
+        Initializer for URLNormalizer object.
+
+        Parameters:
+            strip_params(iterable): Names or glob patterns of query parameters to be removed. Eg. utm_*
+            sort_query(bool): Sort query parameters by name?.
+            cache_size(int): Count of recently normalized links to be cached.
+        """
+        patterns = [fnmatch.translate(param.strip().lower()) for param in strip_params if param.strip()]
+        self.strip_pattern = re.compile("|".join(patterns)) if patterns else None
+        self.sort_query = sort_query
+        self.normalize = lru_cache(maxsize=cache_size)(self.__normalize)
+
+    @staticmethod
+    def read_config():
+        """
+        Reads configuration of url normalizer.
+
+        Returns:
+            config(dict): A configuration name as key and it's values.
+        """
+        config = dict()
+        config_parser = configparser.ConfigParser()
+        config_parser.read("config.cfg")
+        for key, val in config_parser.items("normalizer"):
+            try:
+                config.update({key: int(val)})
+            except ValueError:
+                config.update({key: val})
+        return config
+
+    @classmethod
+    def from_config(cls):
+        """ Creates url normalizer with values from configuration file. """
+        config = cls.read_config()
+        return cls(
+            strip_params=config["strip_query_params"].split(","),
+            sort_query=bool(config["sort_query_params"]),
+            cache_size=config["cache_size"]
+        )
+
+    def __normalize(self, link, src_link=None):
+        """
+        Converts a link into canonical absolute form.
+
+        Parameters:
+            link(str): A link which may be relative.
+            src_link(str): A hyperlink of webpage from which above link was extracted.
+
+        Returns:
+            link(str): A canonical link or None if link isn't a valid http(s) link.
+        """
+        link = URLNormalizer.REMOVED_CHARS.sub("", link.strip())
+        try:
+            if src_link is not None:
+                link = urljoin(src_link, link)
+            parts = urlsplit(link)
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        host = parts.hostname
+        if scheme not in URLNormalizer.ALLOWED_SCHEMES or not host:
+            return None
+        host = URLNormalizer.__normalize_host(host)
+        if host is None:
+            return None
+        netloc = host
+        if port is not None and port != URLNormalizer.DEFAULT_PORTS[scheme]:
+            netloc = f"{host}:{port}"
+        if "@" in parts.netloc:
+            netloc = parts.netloc.rsplit("@", 1)[0] + "@" + netloc
+        path = URLNormalizer.__remove_dot_segments(parts.path) or "/"
+        path = URLNormalizer.__normalize_encoding(path, URLNormalizer.PATH_SAFE)
+        query = self.__normalize_query(parts.query)
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+    @staticmethod
+    def __normalize_host(host):
+        """ Converts an international domain name into punycode. Returns None for invalid domain. """
+        host = host.rstrip(".")
+        if not host.isascii():
+            try:
+                host = host.encode("idna").decode("ascii")
+            except UnicodeError:
+                return None
+        if ":" in host:
+            # IPv6 address
+            host = f"[{host}]"
+        return host
+
+    @staticmethod
+    def __normalize_encoding(component, safe):
+        """ Decodes percent-encoded unreserved characters, uppercases other escapes and encodes unsafe characters. """
+        def normalize_escape(match):
+            char = chr(int(match.group(1), 16))
+            if char in URLNormalizer.UNRESERVED:
+                return char
+            return match.group(0).upper()
+        component = URLNormalizer.PERCENT_ENCODED.sub(normalize_escape, component)
+        return quote(component, safe=safe)
+
+    def __normalize_query(self, query):
+        """ Removes configured query parameters and sorts remaining parameters if configured. """
+        if not query:
+            return ""
+        params = list()
+        for param in query.split("&"):
+            if not param:
+                continue
+            name = unquote(param.split("=", 1)[0]).lower()
+            if self.strip_pattern is not None and self.strip_pattern.match(name):
+                continue
+            params.append(URLNormalizer.__normalize_encoding(param, URLNormalizer.QUERY_SAFE))
+        if self.sort_query:
+            params.sort()
+        return "&".join(params)
+
+    @staticmethod
+    def __remove_dot_segments(path):
+        """ Removes "." and ".." segments from path as per RFC 3986 section 5.2.4. """
+        if "." not in path:
+            return path
+        output = list()
+        segments = path.split("/")
+        for segment in segments:
+            if segment == ".":
+                continue
+            elif segment == "..":
+                if len(output) > 1:
+                    output.pop()
+            else:
+                output.append(segment)
+        if segments[-1] in (".", ".."):
+            output.append("")
+        return "/".join(output)
+
+
+_normalizer = None
+
+
+def get_normalizer():
+    """ Returns url normalizer configured from configuration file, which is shared by whole process. """
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = URLNormalizer.from_config()
+    return _normalizer
+
+
+def benchmark(count=100000):
+    """
+    Micro-benchmark of link normalization with and without cache.
+
+    Parameters:
+        count(int): Count of normalizations for each measurement.
+    """
+    samples = [
+        ("page.html", "https://example.com/dir/index.html"),
+        ("../about/#team", "https://example.com/dir/sub/"),
+        ("HTTPS://Example.COM:443/a/./b/../c?utm_source=x&id=1", None),
+        ("/search?q=caf%c3%a9&sort=asc", "http://example.com/"),
+        ("http://münchen.de/straße", None),
+        ("mailto:info@example.com", "https://example.com/"),
+    ]
+    normalizer = URLNormalizer(strip_params=["utm_*", "gclid", "fbclid"], sort_query=True)
+    links = [(f"{link}#{index}", src_link) for index in range(count // len(samples)) for link, src_link in samples]
+
+    def uncached():
+        normalizer.normalize.cache_clear()
+        for link, src_link in links:
+            normalizer.normalize(link, src_link)
+
+    def cached():
+        for link, src_link in samples:
+            for index in range(count // len(samples)):
+                normalizer.normalize(link, src_link)
+
+    for name, function in (("uncached", uncached), ("cached", cached)):
+        seconds = min(timeit.repeat(function, number=1, repeat=3))
+        print(f"{name}: {seconds / len(links) * 1e6:.2f} us per link")
+
+
+if __name__ == "__main__":
+    benchmark()